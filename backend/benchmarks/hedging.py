@@ -0,0 +1,89 @@
+"""
+Tail-latency benchmark for hedged model calls.
+
+Sends the same requests through the API twice against the offline fake backend with a
+heavy-tailed latency distribution: once without hedging and once with it. Reports the
+p50/p95/p99 latency of each run and what hedging cost in extra model calls.
+
+    cd backend
+    python benchmarks/hedging.py
+    python benchmarks/hedging.py --method simple --problems 400 --percentile 95 --budget 0.1
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+os.environ.setdefault("GEMINI_BACKEND", "fake")
+os.environ.setdefault("FAKE_LATENCY", "lognormal:100:0.8")
+os.environ.setdefault("GEMINI_CACHE_DISABLED", "1")
+os.environ.setdefault("GEMINI_REQUESTS_PER_MINUTE", "0")
+os.environ.setdefault("GEMINI_TOKENS_PER_MINUTE", "0")
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.throughput import METHODS, percentile, make_statements
+
+def bench_hedging(method, hedging, statements, concurrency):
+    import httpx
+    import main as api
+    from model.gemini import get_model_client
+
+    client = get_model_client()
+    client.hedging = hedging
+    # Both runs see the same latency for each original call; only the hedges differ.
+    client.model._calls.clear()
+    path = METHODS[method][3]
+    latencies = []
+
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as http:
+            async def one(statement):
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await http.post(path, json={"statement": statement})
+                    latencies.append(time.perf_counter() - start)
+                    response.raise_for_status()
+            await asyncio.gather(*(one(statement) for statement in statements))
+
+    asyncio.run(run())
+    return {
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "model_calls": sum(client.model._calls.values()),
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark tail latency with and without hedged model calls.")
+    parser.add_argument("--method", default="cot-verification", choices=list(METHODS))
+    parser.add_argument("--problems", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--percentile", type=float, default=90, help="Hedge calls slower than this percentile")
+    parser.add_argument("--budget", type=float, default=0.1, help="Extra calls allowed, as a fraction of all calls")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    from model.hedging import HedgePolicy
+    statements = make_statements(args.problems)
+    policy = HedgePolicy(percentile=args.percentile, budget=args.budget)
+    print(f"Backend: {os.environ['GEMINI_BACKEND']}  latency: {os.environ.get('FAKE_LATENCY')}  "
+          f"method: {args.method}  hedge after p{args.percentile:g}, budget {args.budget:.0%}")
+    print(f"{'run':<12}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'calls':>8}{'hedges':>8}{'won':>6}")
+    baseline = bench_hedging(args.method, None, statements, args.concurrency)
+    print(f"{'no hedging':<12}{baseline['p50_ms']:>9.0f}{baseline['p95_ms']:>9.0f}{baseline['p99_ms']:>9.0f}"
+          f"{baseline['model_calls']:>8}{0:>8}{0:>6}")
+    hedged = bench_hedging(args.method, policy, statements, args.concurrency)
+    stats = policy.stats()
+    print(f"{'hedging':<12}{hedged['p50_ms']:>9.0f}{hedged['p95_ms']:>9.0f}{hedged['p99_ms']:>9.0f}"
+          f"{hedged['model_calls']:>8}{stats['hedges']:>8}{stats['wins']:>6}")
+    extra = hedged["model_calls"] / baseline["model_calls"] - 1 if baseline["model_calls"] else 0.0
+    print(f"\np99 {baseline['p99_ms']:.0f} -> {hedged['p99_ms']:.0f} ms for {extra:.1%} more model calls")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Overload benchmark for the API's admission control.
+
+Offers more requests per second than the backend can serve, against the offline fake backend
+limited to a fixed number of concurrent model calls, once with admission control and once
+with it effectively off. Reports the latency of accepted requests, how many were rejected
+with 429/503 and how quickly the rejections came back.
+
+    cd backend
+    python benchmarks/overload.py
+    python benchmarks/overload.py --rate 300 --seconds 5 --backend-capacity 8 --limit 8 --queue 16
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+os.environ.setdefault("GEMINI_BACKEND", "fake")
+os.environ.setdefault("FAKE_LATENCY", "lognormal:100:0.3")
+os.environ.setdefault("GEMINI_CACHE_DISABLED", "1")
+os.environ.setdefault("GEMINI_REQUESTS_PER_MINUTE", "0")
+os.environ.setdefault("GEMINI_TOKENS_PER_MINUTE", "0")
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.throughput import METHODS, percentile, make_statements
+
+def limit_backend_capacity(capacity):
+    """Let at most `capacity` fake model calls run at once, like a backend with that many workers."""
+    from model.fake import FakeGenerativeModel
+    semaphore = asyncio.Semaphore(capacity)
+    generate = FakeGenerativeModel.generate_content_async
+
+    async def limited(self, *args, **kwargs):
+        async with semaphore:
+            return await generate(self, *args, **kwargs)
+    FakeGenerativeModel.generate_content_async = limited
+
+def bench_overload(method, controller, rate, seconds):
+    import httpx
+    import main as api
+
+    api.admission = controller
+    path = METHODS[method][3]
+    statements = make_statements(int(rate * seconds))
+    accepted, rejected, errors = [], {}, 0
+    rejected_latencies = []
+
+    async def run():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            async def one(statement):
+                nonlocal errors
+                start = time.perf_counter()
+                response = await client.post(path, json={"statement": statement})
+                elapsed = time.perf_counter() - start
+                if response.status_code == 200:
+                    accepted.append(elapsed)
+                elif response.status_code in (429, 503):
+                    rejected[response.status_code] = rejected.get(response.status_code, 0) + 1
+                    rejected_latencies.append(elapsed)
+                else:
+                    errors += 1
+
+            # Open-loop arrivals: requests keep coming at the offered rate however slow the server gets.
+            tasks = []
+            for statement in statements:
+                tasks.append(asyncio.create_task(one(statement)))
+                await asyncio.sleep(1 / rate)
+            await asyncio.gather(*tasks)
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    return {
+        "offered": len(statements),
+        "accepted": len(accepted),
+        "goodput": len(accepted) / elapsed,
+        "p50_ms": percentile(accepted, 50) * 1000,
+        "p99_ms": percentile(accepted, 99) * 1000,
+        "rejected_429": rejected.get(429, 0),
+        "rejected_503": rejected.get(503, 0),
+        "reject_p99_ms": percentile(rejected_latencies, 99) * 1000,
+        "errors": errors,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the API under more load than it can serve.")
+    parser.add_argument("--method", default="simple", choices=["simple", "cot-verification", "auto"])
+    parser.add_argument("--rate", type=float, default=200, help="Offered requests per second")
+    parser.add_argument("--seconds", type=float, default=3, help="How long requests keep arriving")
+    parser.add_argument("--backend-capacity", type=int, default=8, help="Concurrent model calls the backend serves")
+    parser.add_argument("--limit", type=int, default=8, help="Admission concurrency limit per method")
+    parser.add_argument("--queue", type=int, default=16, help="Admission queue size per method")
+    parser.add_argument("--max-queue-seconds", type=float, default=1.0)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    import main as api
+    limit_backend_capacity(args.backend_capacity)
+    runs = {
+        "admission": api.AdmissionController(args.limit, {}, args.queue, args.max_queue_seconds),
+        "unlimited": api.AdmissionController(10 ** 6, {}, 10 ** 6, float("inf")),
+    }
+    print(f"Backend: {os.environ['GEMINI_BACKEND']}  latency: {os.environ.get('FAKE_LATENCY')}  "
+          f"capacity: {args.backend_capacity}  offered: {args.rate:g}/s for {args.seconds:g}s")
+    print(f"{'run':<12}{'accepted':>10}{'goodput/s':>11}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'429':>6}{'503':>6}{'reject p99':>12}{'errors':>8}")
+    for name, controller in runs.items():
+        s = bench_overload(args.method, controller, args.rate, args.seconds)
+        print(f"{name:<12}{s['accepted']:>10}{s['goodput']:>11.1f}{s['p50_ms']:>9.0f}{s['p99_ms']:>9.0f}"
+              f"{s['rejected_429']:>6}{s['rejected_503']:>6}{s['reject_p99_ms']:>10.0f}ms{s['errors']:>8}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Cold-start benchmark for the API.
+
+Measures, in fresh processes, how long `import main` takes and how long a new uvicorn worker
+takes to answer its first /health request. It also checks that modules the API should not load
+(pandas, the Gemini SDK) stay out of the import path. Results can be compared against a stored
+baseline to flag regressions.
+
+    cd backend
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 10 --update-baseline
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "startup_baseline.json")
+# Heavy modules that should only be imported when they are actually used.
+LAZY_MODULES = ["pandas", "google.generativeai", "evaluator.base_evaluator"]
+
+IMPORT_SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+def measure_import():
+    """Seconds to import main in a new interpreter, and which lazy modules it loaded."""
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    return result["seconds"], result["loaded"]
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def measure_first_health(timeout=60):
+    """Seconds from launching a uvicorn worker until /health first answers 200."""
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"/health did not answer within {timeout} seconds")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Return human-readable regressions: any timing above the baseline beyond tolerance."""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous and current > previous * (1 + tolerance):
+            regressions.append(f"{key}: {current:.0f} ms vs baseline {previous:.0f} ms")
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark API import time and time to first /health.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per measurement (the median is reported)")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed relative regression")
+    parser.add_argument("--update-baseline", action="store_true", help="Write these results as the new baseline")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    import_times, loaded = [], set()
+    for _ in range(args.runs):
+        seconds, modules = measure_import()
+        import_times.append(seconds)
+        loaded.update(modules)
+    health_times = [measure_first_health() for _ in range(args.runs)]
+    results = {
+        "import_main_ms": statistics.median(import_times) * 1000,
+        "first_health_ms": statistics.median(health_times) * 1000,
+    }
+    print(f"import main:        {results['import_main_ms']:.0f} ms (median of {args.runs})")
+    print(f"first /health:      {results['first_health_ms']:.0f} ms (median of {args.runs})")
+
+    failed = False
+    if loaded:
+        print(f"\nLoaded at import time but should be lazy: {', '.join(sorted(loaded))}")
+        failed = True
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.baseline}")
+        return 1 if failed else 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for regression in regressions:
+                print(f"- {regression}")
+            failed = True
+        else:
+            print("\nNo regressions against baseline.")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
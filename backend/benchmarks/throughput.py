@@ -0,0 +1,199 @@
+"""
+Throughput and latency benchmark for the reasoning services.
+
+Drives BaseEvaluator and the FastAPI endpoints at fixed concurrency levels against the
+offline fake backend (or a replay cassette) and reports throughput and p50/p95/p99 latency
+per method. Results can be compared against a stored baseline to flag regressions.
+
+    cd backend
+    python benchmarks/throughput.py
+    python benchmarks/throughput.py --methods simple --concurrency 1 4 16 --problems 100
+    python benchmarks/throughput.py --update-baseline
+"""
+import os
+import sys
+import io
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import contextlib
+
+# Benchmarks run offline and must measure the services, not the cache or the API quota.
+os.environ.setdefault("GEMINI_BACKEND", "fake")
+os.environ.setdefault("FAKE_LATENCY", "lognormal:100:0.5")
+os.environ.setdefault("GEMINI_CACHE_DISABLED", "1")
+os.environ.setdefault("GEMINI_REQUESTS_PER_MINUTE", "0")
+os.environ.setdefault("GEMINI_TOKENS_PER_MINUTE", "0")
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+METHODS = {
+    "simple": ("research.simple_prompt", "SimplePromptReasoningService", "evaluate_reasoning_with_explanation", "/reasoning/simple"),
+    "cot-verification": ("research.cot_prompt_verification", "CotAndVerificationReasoningService", "evaluate_with_cot_and_verification", "/reasoning/cot-verification"),
+    "program-aided": ("research.pal", "PalReasoningService", "evaluate_with_program_aided", "/reasoning/program-aided"),
+    "auto": ("research.auto", "AutoReasoningService", "evaluate_auto", "/reasoning/auto"),
+}
+
+def percentile(values, q):
+    """Linear-interpolated percentile of a list of numbers (q in 0-100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def summarize(latencies, elapsed):
+    return {
+        "problems": len(latencies),
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+def make_statements(count):
+    from research.dataset import problems
+    return [
+        f"{problems[i % len(problems)]['statement']} (variant {i})"
+        for i in range(count)
+    ]
+
+def load_service(method):
+    import importlib
+    module_name, class_name, eval_method, _ = METHODS[method]
+    service = getattr(importlib.import_module(module_name), class_name)()
+    if method in ("program-aided", "auto"):
+        # Start the sandbox workers up front so their startup is not timed.
+        from research.sandbox import get_sandbox_pool
+        get_sandbox_pool()
+    return service, eval_method
+
+class TimedService:
+    """Proxy that records the latency of each evaluation call."""
+
+    def __init__(self, service, eval_method):
+        self.service = service
+        self.eval_method = eval_method
+        self.latencies = []
+
+    def __getattr__(self, name):
+        func = getattr(self.service, name)
+        if name != self.eval_method:
+            return func
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.latencies.append(time.perf_counter() - start)
+        return timed
+
+def bench_evaluator(method, concurrency, problem_count):
+    import pandas as pd
+    from evaluator.base_evaluator import BaseEvaluator
+
+    service, eval_method = load_service(method)
+    timed = TimedService(service, eval_method)
+    evaluator = BaseEvaluator(timed, eval_method, concurrency=concurrency)
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset_file = os.path.join(tmp, "problems.csv")
+        pd.DataFrame({"statement": make_statements(problem_count), "answer": "7"}).to_csv(dataset_file, index=False)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            evaluator.evaluate_to_checkpoint(dataset_file, checkpoint_file=os.path.join(tmp, "checkpoint.jsonl"))
+        elapsed = time.perf_counter() - start
+    return summarize(timed.latencies, elapsed)
+
+def bench_api(method, concurrency, problem_count):
+    import httpx
+    import main as api
+
+    path = METHODS[method][3]
+    latencies = []
+
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            async def one(statement):
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await client.post(path, json={"statement": statement, "ground_truth": "7"})
+                    latencies.append(time.perf_counter() - start)
+                    response.raise_for_status()
+            await asyncio.gather(*(one(statement) for statement in make_statements(problem_count)))
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    return summarize(latencies, time.perf_counter() - start)
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Return human-readable regressions: lower throughput or higher p95 beyond tolerance."""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        if current["throughput"] < previous["throughput"] * (1 - tolerance):
+            regressions.append(f"{key}: throughput {current['throughput']:.2f}/s vs baseline {previous['throughput']:.2f}/s")
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {current['p95_ms']:.0f} ms vs baseline {previous['p95_ms']:.0f} ms")
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark reasoning throughput and latency.")
+    parser.add_argument("--methods", nargs="+", default=list(METHODS), choices=list(METHODS))
+    parser.add_argument("--targets", nargs="+", default=["evaluator", "api"], choices=["evaluator", "api"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8])
+    parser.add_argument("--problems", type=int, default=24, help="Problems per run")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    parser.add_argument("--update-baseline", action="store_true", help="Write these results as the new baseline")
+    parser.add_argument("--output", help="Also write results as JSON to this file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    runners = {"evaluator": bench_evaluator, "api": bench_api}
+    results = {}
+    print(f"Backend: {os.environ['GEMINI_BACKEND']}  latency: {os.environ.get('FAKE_LATENCY')}")
+    print(f"{'run':<40}{'problems/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for target in args.targets:
+        for method in args.methods:
+            for concurrency in args.concurrency:
+                key = f"{target}/{method}/c{concurrency}"
+                summary = runners[target](method, concurrency, args.problems)
+                results[key] = summary
+                print(f"{key:<40}{summary['throughput']:>12.2f}{summary['p50_ms']:>10.0f}{summary['p95_ms']:>10.0f}{summary['p99_ms']:>10.0f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for regression in regressions:
+                print(f"- {regression}")
+            return 1
+        print("\nNo regressions against baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
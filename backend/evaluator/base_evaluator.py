@@ -1,104 +1,659 @@
+import os
+import sys
+import json
+import heapq
+import hashlib
+import argparse
+import tempfile
+import importlib
+import contextlib
+import subprocess
 import pandas as pd
+from telemetry.tracing import last_trace
+from model.cache import response_cache_stats
+from evaluator.grading import grade_frame
+from evaluator.results_store import RESULTS_DB, ResultsStore, write_readable_entry
+from evaluator.sequential import category_of, stratified_order, accuracy_interval, difference_interval, format_interval
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# Default number of problems kept in flight; override per evaluator with concurrency=N.
+DEFAULT_CONCURRENCY = int(os.getenv("EVAL_CONCURRENCY", "1"))
+# Rows read from the dataset at a time, so large datasets never sit in memory all at once.
+DATASET_CHUNK_SIZE = 1000
+# Sequential evaluation never stops before this many problems, however narrow the interval looks.
+SEQUENTIAL_MIN_PROBLEMS = int(os.getenv("EVAL_SEQUENTIAL_MIN_PROBLEMS", "30"))
+
+RESULT_COLUMNS = [
+    "problem", "ground_answer", "ai_answer", "ground_explanation", "ai_explanation", "correct", "problem_hash",
+    "latency_ms", "prompt_tokens", "output_tokens", "cached_tokens", "model_calls", "prompt_version",
+]
+
+# Methods the CLI can evaluate (--method) or compare against (--compare-with):
+# module, service class, evaluation method.
+EVALUATION_METHODS = {
+    "simple": ("research.simple_prompt", "SimplePromptReasoningService", "evaluate_reasoning_with_explanation"),
+    "cot-verification": ("research.cot_prompt_verification", "CotAndVerificationReasoningService", "evaluate_with_cot_and_verification"),
+    "cot-self-consistency": ("research.cot_prompt_verification", "CotAndVerificationReasoningService", "evaluate_with_self_consistency"),
+    "program-aided": ("research.pal", "PalReasoningService", "evaluate_with_program_aided"),
+    "pal-self-consistency": ("research.pal", "PalReasoningService", "evaluate_with_self_consistency"),
+    "auto": ("research.auto", "AutoReasoningService", "evaluate_auto"),
+}
+
+def problem_hash(statement, ground_answer=None, occurrence=0):
+    """
+    Stable identifier for a dataset problem, used to resume runs, merge shards and compare runs.
+    It covers the statement and the ground truth; a row repeating an earlier one exactly also
+    gets its occurrence number, so duplicates are evaluated and stored separately.
+    """
+    key = f"{str(statement).strip()}\0{'' if ground_answer is None else str(ground_answer).strip()}"
+    if occurrence:
+        key += f"\0{occurrence}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+def checkpoint_path_for(results_file):
+    return results_file.replace(".csv", "") + "_checkpoint.jsonl"
+
+def shard_checkpoint_path(results_file, shard):
+    index, count = shard
+    return results_file.replace(".csv", "") + f"_shard{index}of{count}_checkpoint.jsonl"
+
+def in_shard(statement, shard):
+    """True if the problem belongs to shard (index, count); assignment depends only on the statement."""
+    if shard is None:
+        return True
+    index, count = shard
+    return int(hashlib.sha256(str(statement).strip().encode("utf-8")).hexdigest()[:16], 16) % count == index
+
+def parse_shard(value):
+    """Parse "i/N" (0 <= i < N) into (i, N)."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Shard must look like i/N, got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"Shard index must be between 0 and {count - 1}, got {value!r}")
+    return index, count
+
+def _json_default(value):
+    # numpy scalars from pandas rows
+    return value.item() if hasattr(value, "item") else str(value)
+
+def read_dataset(dataset_file, chunksize=DATASET_CHUNK_SIZE):
+    """Yield the dataset in DataFrame chunks, falling back to CP1252 if it is not UTF-8."""
+    try:
+        for chunk in pd.read_csv(dataset_file, encoding="utf-8", chunksize=chunksize):
+            yield chunk
+    except UnicodeDecodeError:
+        print("Failed to decode file as UTF-8. Trying CP1252...")
+        for chunk in pd.read_csv(dataset_file, encoding="cp1252", chunksize=chunksize):
+            yield chunk
+
+def iter_problems(dataset_file):
+    """
+    Yield (index, problem_hash, row) for every dataset row, in order. index counts every row,
+    so shard results merge back into dataset order. Only the hashes seen so far are kept, to
+    number exact duplicates.
+    """
+    seen = {}
+    index = 0
+    for chunk in read_dataset(dataset_file):
+        for _, row in chunk.iterrows():
+            digest = problem_hash(row["statement"], row["answer"])
+            occurrence = seen.get(digest, 0)
+            seen[digest] = occurrence + 1
+            yield index, problem_hash(row["statement"], row["answer"], occurrence) if occurrence else digest, row
+            index += 1
+
+def iter_checkpoint(checkpoint_file):
+    """
+    Yield checkpoint records in dataset order, one at a time.
+    Only (index, byte offset) pairs are held in memory; a record written twice for the same
+    problem (e.g. after a resume) keeps its latest copy, and a truncated last line is ignored.
+    """
+    if not os.path.exists(checkpoint_file):
+        return
+    offsets = {}
+    with open(checkpoint_file, "rb") as f:
+        while True:
+            offset = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            offsets[record["problem_hash"]] = (record.get("index", 0), offset)
+    with open(checkpoint_file, "rb") as f:
+        for index, offset in sorted(offsets.values()):
+            f.seek(offset)
+            yield json.loads(f.readline())
+
+def grade_records(records, batch_size=DATASET_CHUNK_SIZE):
+    """Re-grade checkpoint records with the vectorised grader, a batch at a time, and yield them in order."""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield from _graded(batch)
+            batch = []
+    yield from _graded(batch)
+
+def _graded(batch):
+    if not batch:
+        return
+    correct = grade_frame(pd.DataFrame(batch, columns=["ai_answer", "ground_answer"]))
+    for record, is_correct in zip(batch, correct):
+        record["correct"] = bool(is_correct)
+        yield record
+
+def merge_checkpoints(checkpoint_files, output_file):
+    """
+    Merge shard checkpoints into one checkpoint in dataset order, grading every record again
+    in vectorised batches. Records are streamed (each shard is already in order, so this is a
+    k-way merge) and the result is written to a temporary file first, so output_file is never
+    half-written.
+    """
+    missing = [path for path in checkpoint_files if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(f"Missing shard checkpoints: {', '.join(missing)}")
+    merged = grade_records(heapq.merge(
+        *(iter_checkpoint(path) for path in checkpoint_files), key=lambda record: record.get("index", 0)
+    ))
+    temp_file = output_file + ".tmp"
+    count = 0
+    with open(temp_file, "w", encoding="utf-8") as f:
+        for record in merged:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    os.replace(temp_file, output_file)
+    print(f"Merged {count} results from {len(checkpoint_files)} shards into {output_file}")
+    return output_file
+
+def stratum_sizes(dataset_file):
+    """Number of dataset problems in each category."""
+    sizes = {}
+    for chunk in read_dataset(dataset_file):
+        for _, row in chunk.iterrows():
+            category = category_of(row)
+            sizes[category] = sizes.get(category, 0) + 1
+    return sizes
+
+def load_results(checkpoint_file):
+    """Load a checkpoint into a DataFrame (for small runs and interactive use)."""
+    return pd.DataFrame(list(iter_checkpoint(checkpoint_file)), columns=RESULT_COLUMNS)
 
 class BaseEvaluator:
-    def __init__(self, reasoning_service, eval_method):
+    def __init__(self, reasoning_service, eval_method, concurrency=DEFAULT_CONCURRENCY, method_name=None):
         """
         :param reasoning_service: An instance of a reasoning service.
         :param eval_method: The name of the method to call on reasoning_service for evaluation.
                             This method should accept (statement, ground_answer) and return a tuple
                             (ai_answer, ai_explanation, is_correct).
+        :param concurrency: Number of problems kept in flight at once. 1 solves them sequentially.
+        :param method_name: Method recorded with each result; defaults to the one the service traces.
         """
         self.reasoning_service = reasoning_service
         self.eval_method = eval_method
+        self.concurrency = max(1, int(concurrency))
+        self.method_name = method_name
 
-    def evaluate_dataset(self, dataset_file="reasoning_problems.csv"):
-        """Evaluate the model's performance on a dataset of reasoning problems."""
+    def evaluate_dataset(self, dataset_file="reasoning_problems.csv", concurrency=None, checkpoint_file=None,
+                         resume=False, shard=None, results_file="results.csv"):
+        """
+        Evaluate the model's performance on a dataset of reasoning problems and return the
+        results as a DataFrame, graded in one vectorised pass. See evaluate_to_checkpoint for
+        the arguments; large runs should use that directly instead of loading every result
+        into memory. Without checkpoint_file (and resume), results are streamed to a temporary
+        checkpoint that is removed afterwards, so no file in the working directory is touched.
+        """
+        temporary = checkpoint_file is None and not resume
+        if temporary:
+            handle, checkpoint_file = tempfile.mkstemp(prefix="evaluation_", suffix="_checkpoint.jsonl")
+            os.close(handle)
         try:
-            df = pd.read_csv(dataset_file, encoding="utf-8")
-        except UnicodeDecodeError:
-            print("Failed to decode file as UTF-8. Trying CP1252...")
-            df = pd.read_csv(dataset_file, encoding="cp1252")
+            results = load_results(self.evaluate_to_checkpoint(
+                dataset_file, concurrency, checkpoint_file, resume, shard, results_file
+            ))
+        finally:
+            if temporary and os.path.exists(checkpoint_file):
+                os.remove(checkpoint_file)
+        results["correct"] = grade_frame(results)
+        return results
+
+    def evaluate_to_checkpoint(self, dataset_file="reasoning_problems.csv", concurrency=None, checkpoint_file=None,
+                               resume=False, shard=None, results_file="results.csv"):
+        """
+        Evaluate a dataset, streaming results to a checkpoint, and return the checkpoint path.
+
+        Each result is appended to checkpoint_file (JSONL, by default named after results_file)
+        as soon as it finishes. With resume=True, problems already in the checkpoint are
+        skipped; otherwise the checkpoint is started fresh. shard=(i, N) evaluates only the
+        problems whose statement hash falls in shard i of N.
+        """
+        checkpoint_file = checkpoint_file or checkpoint_path_for(results_file)
+        concurrency = max(1, int(concurrency or self.concurrency))
+        done = set()
+        if resume and os.path.exists(checkpoint_file):
+            done = {record["problem_hash"] for record in iter_checkpoint(checkpoint_file)}
+            print(f"Resuming: {len(done)} problems already in {checkpoint_file}")
+        elif os.path.exists(checkpoint_file):
+            os.remove(checkpoint_file)
         
-        results = []
-        print("\nStarting evaluation...\n")
+        shard_note = f", shard {shard[0]}/{shard[1]}" if shard else ""
+        print(f"\nStarting evaluation (concurrency={concurrency}{shard_note})...\n")
+        with open(checkpoint_file, "a", encoding="utf-8") as checkpoint:
+            # Keep at most `concurrency` problems in flight and only a bounded window of
+            # pending rows, so memory does not grow with the dataset.
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                pending = set()
+                completed = 0
+                for index, digest, row in self._iter_pending_rows(dataset_file, done, shard):
+                    if len(pending) >= concurrency:
+                        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        completed += self._record_finished(finished, checkpoint)
+                    print(f"Processing problem {index + 1}")
+                    pending.add(executor.submit(self._solve_problem, index, row, digest))
+                while pending:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    completed += self._record_finished(finished, checkpoint)
+        print(f"Evaluated {completed} problems ({len(done)} resumed from checkpoint)")
         
-        for index, row in df.iterrows():
-            print(f"Processing problem {index + 1}/{len(df)}")
-            statement = row["statement"]
-            ground_answer = row["answer"]
-            ground_explanation = row.get("explanation", "No ground explanation provided")
-            
-            # Call the evaluation method on the reasoning service.
-            eval_func = getattr(self.reasoning_service, self.eval_method)
+        return checkpoint_file
+
+    def _iter_pending_rows(self, dataset_file, done, shard=None):
+        for index, digest, row in iter_problems(dataset_file):
+            if digest not in done and in_shard(row["statement"], shard):
+                yield index, digest, row
+
+    def evaluate_sequential(self, dataset_file="reasoning_problems.csv", checkpoint_file=None,
+                            half_width=0.02, confidence=0.95, seed=0, min_problems=SEQUENTIAL_MIN_PROBLEMS,
+                            max_problems=None, concurrency=None, resume=False, compare_with=None,
+                            compare_checkpoint=None, results_file="results.csv"):
+        """
+        Evaluate a sample of the dataset, stopping once accuracy is known well enough.
+
+        Problems are drawn in a stratified random order (see stratified_order) and the run stops
+        once the confidence interval for accuracy on the whole dataset is at most ±half_width,
+        or after max_problems. With compare_with (another BaseEvaluator), both solve the same
+        problems, the second into compare_checkpoint, and the run stops on the interval of the
+        accuracy difference instead. Problems still in flight at that point are recorded too.
+        The dataset is held in memory to draw from it. Checkpoints default to names derived
+        from results_file. Returns the final interval with the dataset's stratum_sizes.
+        """
+        checkpoint_file = checkpoint_file or checkpoint_path_for(results_file)
+        compare_checkpoint = compare_checkpoint or checkpoint_path_for(results_file.replace(".csv", "") + "_compared.csv")
+        concurrency = max(1, int(concurrency or self.concurrency))
+        rows, hashes, categories, sizes = {}, {}, {}, {}
+        for index, digest, row in iter_problems(dataset_file):
+            rows[index] = row
+            hashes[index] = digest
+            categories[index] = category_of(row)
+            sizes[categories[index]] = sizes.get(categories[index], 0) + 1
+        order = stratified_order([(index, hashes[index], categories[index]) for index in rows], seed)
+        evaluators = [self] if compare_with is None else [self, compare_with]
+        checkpoints = [checkpoint_file] if compare_with is None else [checkpoint_file, compare_checkpoint]
+        # Whether each evaluator got each problem right, by problem hash.
+        outcomes = [{} for _ in evaluators]
+        for outcome, path in zip(outcomes, checkpoints):
+            if resume and os.path.exists(path):
+                outcome.update((record["problem_hash"], record["correct"]) for record in iter_checkpoint(path))
+                print(f"Resuming: {len(outcome)} problems already in {path}")
+            elif os.path.exists(path):
+                os.remove(path)
+
+        def estimate():
+            solved = [index for index in order if all(hashes[index] in outcome for outcome in outcomes)]
+            if compare_with is None:
+                return accuracy_interval(((categories[i], outcomes[0][hashes[i]]) for i in solved), sizes, confidence)
+            return difference_interval(
+                ((categories[i], outcomes[0][hashes[i]], outcomes[1][hashes[i]]) for i in solved), sizes, confidence
+            )
+
+        def tight_enough(result):
+            return (result["problems"] >= min(min_problems, len(order)) and result["complete"]
+                    and result["half_width"] <= half_width)
+
+        def collect(pending, files, previous):
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                slot = pending.pop(future)
+                evaluators[slot]._record_finished([future], files[slot])
+                record = future.result()
+                outcomes[slot][record["problem_hash"]] = record["correct"]
+            result = estimate()
+            if result["problems"] > previous["problems"]:
+                print(f"Estimate after {result['problems']} problems: {format_interval(result)}")
+            return result
+
+        print(f"\nStarting sequential evaluation (target ±{half_width:.1%} at {confidence:.0%} confidence, "
+              f"{len(order)} problems in {len(sizes)} categories, concurrency={concurrency})...\n")
+        result = estimate()
+        drawn = 0
+        with contextlib.ExitStack() as stack:
+            files = [stack.enter_context(open(path, "a", encoding="utf-8")) for path in checkpoints]
+            with ThreadPoolExecutor(max_workers=concurrency * len(evaluators)) as executor:
+                pending = {}
+                for index in order:
+                    if tight_enough(result) or (max_problems and drawn >= max_problems):
+                        break
+                    drawn += 1
+                    for slot, evaluator in enumerate(evaluators):
+                        if hashes[index] not in outcomes[slot]:
+                            if slot == 0:
+                                print(f"Processing problem {index + 1}")
+                            pending[executor.submit(evaluator._solve_problem, index, rows[index], hashes[index])] = slot
+                    while len(pending) >= concurrency * len(evaluators):
+                        result = collect(pending, files, result)
+                while pending:
+                    result = collect(pending, files, result)
+        print(f"Sampled {result['problems']} of {len(order)} problems: {format_interval(result)}")
+        result.update(stratum_sizes=sizes, dataset_problems=len(order))
+        return result
+
+    def _record_finished(self, finished, checkpoint):
+        for future in finished:
+            result = future.result()
+            checkpoint.write(json.dumps(result, default=_json_default, ensure_ascii=False) + "\n")
+            checkpoint.flush()
+            self._print_result(result)
+        return len(finished)
+
+    def _solve_problem(self, index, row, digest=None):
+        """Solve one dataset row. A failing problem is recorded as an error instead of aborting the run."""
+        statement = row["statement"]
+        ground_answer = row["answer"]
+        ground_explanation = row.get("explanation", "No ground explanation provided")
+        
+        # Call the evaluation method on the reasoning service.
+        eval_func = getattr(self.reasoning_service, self.eval_method)
+        try:
             ai_answer, ai_explanation, is_correct = eval_func(statement, ground_answer)
-            
-            # Store results.
-            results.append({
-                "problem": statement,
-                "ground_answer": ground_answer,
-                "ai_answer": ai_answer,
-                "ground_explanation": ground_explanation,
-                "ai_explanation": ai_explanation,
-                "correct": is_correct
-            })
-            
-            # Display current problem details.
-            print(f"\nProblem: {statement}")
-            print(f"Ground Truth: {ground_answer}")
-            print(f"AI Answer: {ai_answer}")
-            print(f"Correct: {is_correct}")
-            
-            print("\n--- AI Explanation ---")
-            if len(ai_explanation) > 500:
-                print(ai_explanation[:500] + "... (truncated, full explanation in results file)")
-            else:
-                print(ai_explanation)
-                
-            print("\n--- Ground Truth Explanation ---")
-            print(ground_explanation)
-            print("-" * 80 + "\n")
+        except Exception as e:
+            ai_answer, ai_explanation, is_correct = f"Error: {str(e)}", "Error: Evaluation failed for this problem", False
+        trace = last_trace()
+        timing = trace.as_dict() if trace is not None else {}
         
-        return pd.DataFrame(results)
+        return {
+            "index": index,
+            "method": self.method_name or timing.get("method"),
+            "problem_hash": digest or problem_hash(statement, ground_answer),
+            "problem": statement,
+            "ground_answer": ground_answer,
+            "ai_answer": ai_answer,
+            "ground_explanation": ground_explanation,
+            "ai_explanation": ai_explanation,
+            "correct": bool(is_correct),
+            "category": category_of(row),
+            "latency_ms": timing.get("latency_ms"),
+            "prompt_tokens": timing.get("prompt_tokens"),
+            "output_tokens": timing.get("output_tokens"),
+            "cached_tokens": timing.get("cached_tokens"),
+            "model_calls": timing.get("model_calls"),
+            # Templates (name@version) of every prompt sent for this problem.
+            "prompt_version": ";".join(timing.get("prompt_templates", [])),
+            "stage_ms": timing.get("stage_ms", {}),
+        }
 
-    def save_results(self, results, output_file="results.csv"):
-        """Save evaluation results to a CSV file and also to a readable text file."""
-        results.to_csv(output_file, index=False, encoding="utf-8-sig")
-        print(f"\nResults saved to {output_file}")
+    def _print_result(self, result):
+        """Display current problem details."""
+        ai_explanation = str(result["ai_explanation"])
+        print(f"\nProblem {result['index'] + 1}: {result['problem']}")
+        print(f"Ground Truth: {result['ground_answer']}")
+        print(f"AI Answer: {result['ai_answer']}")
+        print(f"Correct: {result['correct']}")
+        
+        print("\n--- AI Explanation ---")
+        if len(ai_explanation) > 500:
+            print(ai_explanation[:500] + "... (truncated, full explanation in results file)")
+        else:
+            print(ai_explanation)
+            
+        print("\n--- Ground Truth Explanation ---")
+        print(result["ground_explanation"])
+        print("-" * 80 + "\n")
+
+    def save_results(self, results, output_file="results.csv", batch_size=500):
+        """
+        Save evaluation results to a CSV file and also to a readable text file.
+        results is either a checkpoint path (streamed in dataset order) or a DataFrame.
+        """
+        records = iter_checkpoint(results) if isinstance(results, str) else (
+            row.to_dict() for _, row in results.iterrows()
+        )
         readable_output = output_file.replace(".csv", "_readable.txt")
-        with open(readable_output, "w", encoding="utf-8") as f:
-            for idx, row in results.iterrows():
-                f.write(f"Problem {idx+1}: {row['problem']}\n")
-                f.write(f"Ground Truth: {row['ground_answer']}\n")
-                f.write(f"AI Answer: {row['ai_answer']}\n")
-                f.write(f"Correct: {row['correct']}\n\n")
-                f.write("--- AI Explanation ---\n")
-                f.write(f"{row['ai_explanation']}\n\n")
-                f.write("--- Ground Truth Explanation ---\n")
-                f.write(f"{row['ground_explanation']}\n\n")
-                f.write("=" * 80 + "\n\n")
+        with open(output_file, "w", encoding="utf-8-sig", newline="") as csv_file, \
+                open(readable_output, "w", encoding="utf-8") as f:
+            batch = []
+            header = True
+            for idx, row in enumerate(records):
+                batch.append(row)
+                write_readable_entry(f, idx + 1, row)
+                if len(batch) >= batch_size:
+                    pd.DataFrame(batch).reindex(columns=RESULT_COLUMNS).to_csv(csv_file, index=False, header=header)
+                    batch, header = [], False
+            if batch or header:
+                pd.DataFrame(batch).reindex(columns=RESULT_COLUMNS).to_csv(csv_file, index=False, header=header)
+        print(f"\nResults saved to {output_file}")
         print(f"Readable results with full explanations saved to {readable_output}")
 
-def main(evaluator, dataset_file, results_file):
-    try:
-        results = evaluator.evaluate_dataset(dataset_file)
-        evaluator.save_results(results, results_file)
-        
-        # Print summary statistics.
-        print("\nEvaluation Summary:")
-        accuracy = results["correct"].mean()
-        print(f"Accuracy: {accuracy:.2%}")
-        
-        print("\nCorrectly solved problems:")
-        for idx, row in results[results["correct"]].iterrows():
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round((len(ordered) - 1) * q / 100)))]
+
+def print_timing_summary(records):
+    """Print latency percentiles, token usage and average time per stage for checkpoint records."""
+    latencies, prompt_tokens, output_tokens, cached_tokens, model_calls, stages = [], 0, 0, 0, 0, {}
+    for row in records:
+        if row.get("latency_ms") is None:
+            continue
+        latencies.append(row["latency_ms"])
+        prompt_tokens += row.get("prompt_tokens") or 0
+        output_tokens += row.get("output_tokens") or 0
+        cached_tokens += row.get("cached_tokens") or 0
+        model_calls += row.get("model_calls") or 0
+        for name, ms in (row.get("stage_ms") or {}).items():
+            stages[name] = stages.get(name, 0.0) + ms
+    if not latencies:
+        return
+    count = len(latencies)
+    print(f"Latency (ms): mean {sum(latencies) / count:.0f}, p50 {_percentile(latencies, 50):.0f}, "
+          f"p95 {_percentile(latencies, 95):.0f}")
+    print(f"Tokens: {prompt_tokens} prompt + {output_tokens} output over {model_calls} model calls "
+          f"({(prompt_tokens + output_tokens) / count:.0f} per problem), {cached_tokens} more from cached prompt prefixes")
+    print("Average time per stage (ms):")
+    for name, total_ms in sorted(stages.items(), key=lambda item: -item[1]):
+        print(f"  {name:<22}{total_ms / count:>10.1f}")
+
+def print_cache_summary():
+    """Print the response cache's hit and miss counters for this process, if it used the cache."""
+    stats = response_cache_stats()
+    if stats is None:
+        return
+    print(f"Response cache: {stats['memory_hits']} memory hits, {stats['disk_hits']} disk hits, "
+          f"{stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
+
+def print_summary(checkpoint_file, sizes=None, confidence=0.95):
+    """
+    Print accuracy, timing and the correctly/incorrectly solved problems of a checkpoint.
+    The accuracy interval is for the dataset's problems when sizes (problems per category) is
+    given, as after a sequential run; otherwise the problems are treated as a sample of the kind
+    of problem the dataset stands for.
+    """
+    print("\nEvaluation Summary:")
+    outcomes = [(category_of(row), row["correct"]) for row in iter_checkpoint(checkpoint_file)]
+    if outcomes:
+        print(f"Accuracy: {format_interval(accuracy_interval(outcomes, sizes, confidence))}")
+    else:
+        print("Accuracy: no problems evaluated")
+    print_timing_summary(iter_checkpoint(checkpoint_file))
+    
+    print("\nCorrectly solved problems:")
+    for row in iter_checkpoint(checkpoint_file):
+        if row["correct"]:
             print(f"- {row['problem']}")
-        
-        print("\nIncorrectly solved problems:")
-        for idx, row in results[~results["correct"]].iterrows():
+    
+    print("\nIncorrectly solved problems:")
+    for row in iter_checkpoint(checkpoint_file):
+        if not row["correct"]:
             print(f"- {row['problem']}")
             print(f"  Ground truth: {row['ground_answer']}")
             print(f"  AI answer: {row['ai_answer']}\n")
+
+def print_paired_summary(first_checkpoint, second_checkpoint, first_name, second_name, sizes=None, confidence=0.95):
+    """Print the accuracy difference of two runs on the problems both solved, with McNemar's test."""
+    second = {record["problem_hash"]: record["correct"] for record in iter_checkpoint(second_checkpoint)}
+    result = difference_interval(
+        ((category_of(record), record["correct"], second[record["problem_hash"]])
+         for record in iter_checkpoint(first_checkpoint) if record["problem_hash"] in second),
+        sizes, confidence,
+    )
+    print(f"\nPaired comparison on the same {result['problems']} problems:")
+    print(f"Accuracy of {first_name} minus {second_name}: {format_interval(result)}")
+    print(f"Only {first_name} right: {result['only_first']}, only {second_name} right: {result['only_second']}, "
+          f"McNemar p = {result['p_value']:.3g}")
+
+def load_evaluator(method, concurrency=None):
+    """Build a BaseEvaluator for one of EVALUATION_METHODS."""
+    module, class_name, eval_method = EVALUATION_METHODS[method]
+    reasoning_service = getattr(importlib.import_module(module), class_name)()
+    return BaseEvaluator(reasoning_service, eval_method=eval_method, concurrency=concurrency or DEFAULT_CONCURRENCY,
+                         method_name=method)
+
+def run_worker_processes(args, dataset_file, results_file, shard):
+    """
+    Split a run (or one shard of it) over args.workers processes on this machine.
+    Worker w of shard i/N re-runs this script on shard i+N*w of N*workers, which holds exactly
+    the problems of shard i split K ways. Each worker logs to its own file. Returns the
+    workers' checkpoint files.
+    """
+    index, count = shard or (0, 1)
+    subshards = [(index + count * worker, count * args.workers) for worker in range(args.workers)]
+    processes = []
+    for subshard in subshards:
+        command = [sys.executable, sys.argv[0], "--dataset", dataset_file, "--results", results_file,
+                   "--shard", f"{subshard[0]}/{subshard[1]}"]
+        if args.method:
+            command += ["--method", args.method]
+        if args.concurrency:
+            command += ["--concurrency", str(args.concurrency)]
+        if args.resume:
+            command += ["--resume"]
+        log_file = shard_checkpoint_path(results_file, subshard).replace("_checkpoint.jsonl", ".log")
+        with open(log_file, "w", encoding="utf-8") as log:
+            processes.append(subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT))
+        print(f"Started worker for shard {subshard[0]}/{subshard[1]} (log: {log_file})")
+    failed = [subshard for subshard, process in zip(subshards, processes) if process.wait() != 0]
+    if failed:
+        raise RuntimeError(f"Workers for shards {', '.join(f'{i}/{n}' for i, n in failed)} failed; see their logs")
+    return [shard_checkpoint_path(results_file, subshard) for subshard in subshards]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate a reasoning method on a dataset.")
+    parser.add_argument("--method", choices=list(EVALUATION_METHODS),
+                        help="Evaluate this method instead of the script's own, e.g. cot-self-consistency")
+    parser.add_argument("--dataset", help="Dataset CSV with statement, answer and explanation columns")
+    parser.add_argument("--results", help="Output CSV file")
+    parser.add_argument("--concurrency", type=int, help="Problems kept in flight at once")
+    parser.add_argument("--resume", action="store_true", help="Skip problems already in the checkpoint")
+    parser.add_argument("--shard", type=parse_shard, help="Evaluate only shard i/N (0-based), e.g. 0/4")
+    parser.add_argument("--workers", type=int, default=1, help="Processes to split the run (or shard) over")
+    parser.add_argument("--merge", type=int, metavar="N",
+                        help="Merge the checkpoints of shards 0/N .. N-1/N and store the combined run")
+    parser.add_argument("--db", default=RESULTS_DB, help="Results database the finished run is added to")
+    parser.add_argument("--run-id", help="Run id in the results database (default: <method>-<timestamp>-<random>)")
+    parser.add_argument("--write-files", action="store_true",
+                        help="Also write the results CSV and _readable.txt report for this run")
+    parser.add_argument("--sequential", type=float, metavar="HALF_WIDTH",
+                        help="Sample problems in stratified random order and stop once the accuracy interval "
+                             "is at most ±HALF_WIDTH, e.g. 0.02")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level of reported intervals")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the sequential sampling order")
+    parser.add_argument("--max-problems", type=int, help="Stop a sequential run after this many problems")
+    parser.add_argument("--compare-with", choices=list(EVALUATION_METHODS),
+                        help="Also solve the sampled problems with this method and stop on the accuracy difference")
+    args = parser.parse_args(argv)
+    if args.sequential is not None and (args.shard or args.merge or args.workers > 1):
+        parser.error("--sequential runs in one process and cannot be combined with --shard, --workers or --merge")
+    if args.compare_with and args.sequential is None:
+        parser.error("--compare-with needs --sequential")
+    return args
+
+def main(evaluator, dataset_file, results_file, argv=None):
+    """
+    Evaluation CLI. Without sharding this evaluates the whole dataset, adds the run to the
+    results database and prints the summary (--write-files also writes results_file and its
+    _readable.txt report). With --shard i/N only a shard checkpoint is written; --merge N then
+    combines all N shards and stores them as one run, exactly like a single-process run.
+    --sequential evaluates only as many problems as the requested accuracy interval needs,
+    optionally paired with a second method (--compare-with).
+    """
+    args = parse_args(argv)
+    if args.method:
+        evaluator = load_evaluator(args.method, args.concurrency)
+        results_file = results_file if args.results else args.method.replace("-", "_") + "_results.csv"
+    dataset_file = args.dataset or dataset_file
+    results_file = args.results or results_file
+    sharded = args.shard is not None and not args.merge
+    checkpoint_file = shard_checkpoint_path(results_file, args.shard) if sharded else checkpoint_path_for(results_file)
+    if args.run_id and not sharded and ResultsStore(args.db).has_run(args.run_id):
+        # Checked up front, so a taken run id does not surface only after the whole evaluation.
+        print(f"Run {args.run_id} already exists in {args.db}; choose another --run-id")
+        return
+    compare_checkpoint = checkpoint_path_for(results_file.replace(".csv", "") + f"_{args.compare_with}.csv")
+    sequential = None
+    try:
+        if args.merge:
+            shards = [shard_checkpoint_path(results_file, (index, args.merge)) for index in range(args.merge)]
+            merge_checkpoints(shards, checkpoint_file)
+        elif args.workers > 1:
+            merge_checkpoints(run_worker_processes(args, dataset_file, results_file, args.shard), checkpoint_file)
+        elif args.sequential is not None:
+            sequential = evaluator.evaluate_sequential(
+                dataset_file,
+                checkpoint_file=checkpoint_file,
+                half_width=args.sequential,
+                confidence=args.confidence,
+                seed=args.seed,
+                max_problems=args.max_problems,
+                concurrency=args.concurrency,
+                resume=args.resume,
+                compare_with=load_evaluator(args.compare_with, args.concurrency) if args.compare_with else None,
+                compare_checkpoint=compare_checkpoint,
+            )
+        else:
+            evaluator.evaluate_to_checkpoint(
+                dataset_file,
+                concurrency=args.concurrency,
+                checkpoint_file=checkpoint_file,
+                resume=args.resume,
+                shard=args.shard,
+            )
+        
+        if sharded:
+            print(f"\nShard {args.shard[0]}/{args.shard[1]} results saved to {checkpoint_file}")
+            print(f"Combine all shards with --merge {args.shard[1]}")
+        else:
+            store = ResultsStore(args.db)
+            run_id = store.import_checkpoint(checkpoint_file, dataset=dataset_file, run_id=args.run_id)
+            print(f"\nResults stored as run {run_id} in {store.path}")
+            print(f"Readable report: python evaluator/results_store.py report {run_id}")
+            if args.compare_with:
+                compare_run_id = store.import_checkpoint(compare_checkpoint, dataset=dataset_file)
+                print(f"{args.compare_with} results stored as run {compare_run_id}")
+            if args.write_files:
+                evaluator.save_results(checkpoint_file, results_file)
+        sizes = sequential["stratum_sizes"] if sequential else None
+        print_summary(checkpoint_file, sizes, args.confidence)
+        print_cache_summary()
+        if sequential:
+            print(f"Sequential run: {sequential['problems']} of {sequential['dataset_problems']} problems evaluated")
+        if args.compare_with:
+            method = next(iter_checkpoint(checkpoint_file), {}).get("method") or "this method"
+            print_paired_summary(checkpoint_file, compare_checkpoint, method, args.compare_with, sizes, args.confidence)
     except KeyboardInterrupt:
         print("\nEvaluation interrupted by user")
+        print(f"Finished problems are kept in {checkpoint_file}; re-run with --resume to continue")
     except Exception as e:
         print(f"\nAn error occurred: {str(e)}")
     finally:
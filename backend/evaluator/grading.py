@@ -0,0 +1,169 @@
+"""
+Deterministic answer grading shared by all reasoning services and the evaluator.
+
+Answers are normalised before comparison: case, punctuation, quotes and markdown are
+ignored, "the answer is"-style prefixes are dropped, number words become digits
+("seven" -> 7), thousands separators, currency symbols and trailing units are removed
+("7 horses" -> 7), and yes/no synonyms are folded ("True" -> yes). Numbers are then
+compared by value, everything else by normalised text.
+
+    cd backend
+    python evaluator/grading.py reasoning_results.csv
+"""
+import re
+import math
+import argparse
+
+REL_TOLERANCE = 1e-6
+ABS_TOLERANCE = 1e-9
+
+YES_WORDS = {"yes", "y", "true", "correct", "right", "yep", "yeah", "affirmative"}
+NO_WORDS = {"no", "n", "false", "incorrect", "wrong", "nope", "negative"}
+
+_UNITS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13,
+    "fourteen": 14, "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19,
+}
+_TENS = {
+    "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70,
+    "eighty": 80, "ninety": 90,
+}
+_SCALES = {"hundred": 100, "thousand": 1000, "million": 1000000, "billion": 1000000000}
+_NUMBER_WORD = "|".join(sorted(list(_UNITS) + list(_TENS) + list(_SCALES), key=len, reverse=True))
+_NUMBER_WORDS_RE = re.compile(rf"\b(?:{_NUMBER_WORD})(?:(?:\s+|\s+and\s+)(?:{_NUMBER_WORD}))*\b")
+
+_PREFIX_RE = re.compile(
+    r"^(?:(?:the\s+)?(?:final\s+|verified\s+|correct\s+)*answer\s*(?:is|:|=)\s*|result\s*(?::|=)\s*|[a-z]\s*=\s*)"
+)
+_MARKDOWN_RE = re.compile(r"[*_`]+")
+_WRAPPING = "\"'()[]{}<> "
+_TRAILING_PUNCTUATION = ".!?;:,"
+_THOUSANDS_RE = re.compile(r"(?<=\d),(?=\d{3}\b)")
+_CURRENCY_RE = re.compile(r"[$€£¥]")
+# Words that make a trailing phrase a statement about the number rather than its unit
+# ("4 is not correct", "4 or 5"), so "7 horses" grades as 7 but those do not.
+_NON_UNIT_WORDS = (
+    "is", "isn't", "isnt", "are", "aren't", "arent", "was", "wasn't", "wasnt", "were", "not", "no", "or",
+    "and", "but", "if",
+    "maybe", "probably", "possibly", "perhaps", "correct", "incorrect", "wrong", "right", "true",
+    "false", "because", "since", "than", "more", "less", "fewer", "at", "least", "most", "either",
+    "neither", "nor",
+)
+_UNIT_WORD = rf"(?!(?:{'|'.join(re.escape(word) for word in _NON_UNIT_WORDS)})(?![a-z'-]))[a-z][a-z.'-]*"
+_NUMBER_RE = re.compile(
+    rf"^([-+]?(?:\d+\.?\d*|\.\d+))(?:\s*/\s*(\d+(?:\.\d+)?))?\s*%?(?:\s+{_UNIT_WORD}){{0,3}}$"
+)
+_YES_NO_RE = re.compile(r"^([a-z]+)(?:$|[,.;:!]\s|[,.;:!]$)")
+
+def _words_to_number(text):
+    total = current = 0
+    for word in text.split():
+        if word == "and":
+            continue
+        if word in _UNITS:
+            current += _UNITS[word]
+        elif word in _TENS:
+            current += _TENS[word]
+        elif word == "hundred":
+            current = max(current, 1) * 100
+        else:
+            total += max(current, 1) * _SCALES[word]
+            current = 0
+    return str(total + current)
+
+def _format_number(value):
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(round(value, 9))
+
+def normalize_answer(answer):
+    """Return the canonical form of an answer used for grading ("" for a missing answer)."""
+    if answer is None or (isinstance(answer, float) and math.isnan(answer)):
+        return ""
+    text = _MARKDOWN_RE.sub("", str(answer)).strip().lower()
+    text = _PREFIX_RE.sub("", text).strip(_WRAPPING)
+    text = text.rstrip(_TRAILING_PUNCTUATION).strip(_WRAPPING)
+    text = " ".join(text.replace("-", " ").split()) if not text.startswith("-") else " ".join(text.split())
+
+    yes_no = _YES_NO_RE.match(text)
+    if yes_no:
+        word = yes_no.group(1)
+        if word in YES_WORDS:
+            return "yes"
+        if word in NO_WORDS:
+            return "no"
+
+    text = _THOUSANDS_RE.sub("", _CURRENCY_RE.sub("", text)).strip()
+    text = _NUMBER_WORDS_RE.sub(lambda m: _words_to_number(m.group(0)), text)
+    number = _NUMBER_RE.match(text)
+    if number:
+        value = float(number.group(1))
+        if number.group(2):
+            denominator = float(number.group(2))
+            if denominator == 0:
+                return text
+            value /= denominator
+        return _format_number(value)
+    return text
+
+def _as_number(normalized):
+    try:
+        value = float(normalized)
+    except ValueError:
+        return None
+    return value if math.isfinite(value) else None
+
+def _numbers_close(a, b):
+    # Same test as numpy.isclose, so scalar and vectorised grading always agree.
+    return abs(a - b) <= ABS_TOLERANCE + REL_TOLERANCE * abs(b)
+
+def answers_match(model_answer, ground_answer):
+    """True if the model's answer is equivalent to the ground truth after normalisation."""
+    model_norm = normalize_answer(model_answer)
+    ground_norm = normalize_answer(ground_answer)
+    if not model_norm or not ground_norm:
+        return False
+    model_number, ground_number = _as_number(model_norm), _as_number(ground_norm)
+    if model_number is not None and ground_number is not None:
+        return _numbers_close(model_number, ground_number)
+    return model_norm == ground_norm
+
+def _normalize_column(column):
+    # Normalise each distinct value once; result columns repeat the same answers a lot.
+    import pandas as pd
+    values = column.astype(object).where(column.notna(), None)
+    uniques = pd.unique(values)
+    return values.map(dict(zip(uniques, (normalize_answer(value) for value in uniques))))
+
+def grade_frame(frame, answer_column="ai_answer", ground_column="ground_answer"):
+    """Grade every row of a results DataFrame at once. Returns a boolean Series aligned with frame."""
+    import numpy as np
+    import pandas as pd
+    answers = _normalize_column(frame[answer_column])
+    grounds = _normalize_column(frame[ground_column])
+    answer_numbers = pd.to_numeric(answers, errors="coerce")
+    ground_numbers = pd.to_numeric(grounds, errors="coerce")
+    numeric = answer_numbers.notna() & ground_numbers.notna()
+    close = np.isclose(answer_numbers.fillna(0), ground_numbers.fillna(0), rtol=REL_TOLERANCE, atol=ABS_TOLERANCE)
+    matches = np.where(numeric, close, answers == grounds)
+    return pd.Series(matches, index=frame.index, dtype=bool) & (answers != "") & (grounds != "")
+
+def regrade_results(results_file, output_file=None):
+    """Re-grade the correct column of a results CSV and return the accuracy."""
+    import pandas as pd
+    frame = pd.read_csv(results_file, encoding="utf-8-sig", keep_default_na=False, na_values=[""])
+    frame["correct"] = grade_frame(frame)
+    frame.to_csv(output_file or results_file, index=False, encoding="utf-8-sig")
+    return frame["correct"].mean() if len(frame) else 0.0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Re-grade a results CSV with the shared grading rules.")
+    parser.add_argument("results", help="Results CSV written by the evaluator")
+    parser.add_argument("--output", help="Write the re-graded CSV here instead of in place")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    accuracy = regrade_results(args.results, args.output)
+    print(f"Accuracy: {accuracy:.2%}")
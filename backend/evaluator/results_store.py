@@ -0,0 +1,301 @@
+"""
+Append-only store of evaluation results, one SQLite row per (run_id, method, problem_hash).
+
+Explanations are stored zlib-compressed, so comparing runs only reads the small columns. Reports
+and CSV exports are generated from the store on demand:
+
+    cd backend
+    python evaluator/results_store.py runs
+    python evaluator/results_store.py accuracy
+    python evaluator/results_store.py regressions RUN_A RUN_B
+    python evaluator/results_store.py report RUN [--output report.txt]
+    python evaluator/results_store.py export RUN --output results.csv
+"""
+import os
+import sys
+import csv
+import json
+import time
+import zlib
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+
+RESULTS_DB = os.getenv(
+    "EVAL_RESULTS_DB",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "results", "results.sqlite3"))
+)
+# Rows inserted per transaction when importing a checkpoint.
+IMPORT_BATCH_SIZE = 500
+# Rows fetched at a time when reading a run back for a report or export.
+FETCH_BATCH_SIZE = 500
+
+EXPORT_COLUMNS = [
+    "problem", "ground_answer", "ai_answer", "ground_explanation", "ai_explanation", "correct", "problem_hash",
+    "latency_ms", "prompt_tokens", "output_tokens", "cached_tokens", "model_calls", "prompt_version",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    method TEXT NOT NULL,
+    dataset TEXT,
+    created_at REAL NOT NULL,
+    problems INTEGER NOT NULL DEFAULT 0,
+    correct INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id TEXT NOT NULL,
+    method TEXT NOT NULL,
+    problem_hash TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    problem TEXT NOT NULL,
+    ground_answer TEXT,
+    ai_answer TEXT,
+    correct INTEGER NOT NULL,
+    latency_ms REAL,
+    prompt_tokens INTEGER,
+    output_tokens INTEGER,
+    cached_tokens INTEGER,
+    model_calls INTEGER,
+    prompt_version TEXT,
+    stage_ms TEXT,
+    ground_explanation BLOB,
+    ai_explanation BLOB,
+    PRIMARY KEY (run_id, method, problem_hash)
+);
+CREATE INDEX IF NOT EXISTS results_by_method ON results (method, run_id, correct);
+CREATE INDEX IF NOT EXISTS results_by_problem ON results (problem_hash, method);
+CREATE INDEX IF NOT EXISTS runs_by_method ON runs (method, created_at);
+"""
+
+def compress(text):
+    return zlib.compress(str(text).encode("utf-8")) if text is not None else None
+
+def decompress(blob):
+    return zlib.decompress(blob).decode("utf-8") if blob is not None else None
+
+def new_run_id(method):
+    return f"{method}-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.urandom(2).hex()}"
+
+def write_readable_entry(f, number, row):
+    """Write one problem of a readable report: problem, answers, and both explanations."""
+    f.write(f"Problem {number}: {row['problem']}\n")
+    f.write(f"Ground Truth: {row['ground_answer']}\n")
+    f.write(f"AI Answer: {row['ai_answer']}\n")
+    f.write(f"Correct: {row['correct']}\n\n")
+    f.write("--- AI Explanation ---\n")
+    f.write(f"{row['ai_explanation']}\n\n")
+    f.write("--- Ground Truth Explanation ---\n")
+    f.write(f"{row['ground_explanation']}\n\n")
+    f.write("=" * 80 + "\n\n")
+
+class RunExistsError(ValueError):
+    """Raised when importing a run under a run_id that is already in the store."""
+
+class ResultsStore:
+    """SQLite results store. Runs are only ever added, never overwritten by later runs."""
+
+    def __init__(self, path=RESULTS_DB):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def import_checkpoint(self, checkpoint_file, method=None, dataset=None, run_id=None):
+        """
+        Add the records of an evaluator checkpoint as a new run and return its run_id.
+        method defaults to the method recorded on the first result. Records are streamed in
+        batches, so large runs never sit in memory. Raises RunExistsError if run_id is taken.
+        """
+        from evaluator.base_evaluator import iter_checkpoint
+        records = iter_checkpoint(checkpoint_file)
+        first = next(records, None)
+        method = method or (first or {}).get("method") or "unknown"
+        run_id = run_id or new_run_id(method)
+        with self._lock, self._conn:
+            try:
+                self._conn.execute(
+                    "INSERT INTO runs (run_id, method, dataset, created_at) VALUES (?, ?, ?, ?)",
+                    (run_id, method, dataset, time.time()),
+                )
+            except sqlite3.IntegrityError:
+                raise RunExistsError(f"Run {run_id} already exists in {self.path}; runs are never overwritten")
+            batch = [self._row(run_id, method, first)] if first is not None else []
+            for record in records:
+                batch.append(self._row(run_id, method, record))
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    self._insert(batch)
+                    batch = []
+            self._insert(batch)
+            self._conn.execute(
+                "UPDATE runs SET problems = (SELECT COUNT(*) FROM results WHERE run_id = ?), "
+                "correct = (SELECT COALESCE(SUM(correct), 0) FROM results WHERE run_id = ?) WHERE run_id = ?",
+                (run_id, run_id, run_id),
+            )
+        return run_id
+
+    def _row(self, run_id, method, record):
+        return (
+            run_id, record.get("method") or method, record["problem_hash"], record.get("index", 0),
+            str(record["problem"]), _text(record.get("ground_answer")), _text(record.get("ai_answer")),
+            int(bool(record.get("correct"))), record.get("latency_ms"), record.get("prompt_tokens"),
+            record.get("output_tokens"), record.get("cached_tokens"), record.get("model_calls"),
+            record.get("prompt_version"), json.dumps(record.get("stage_ms") or {}),
+            compress(record.get("ground_explanation")), compress(record.get("ai_explanation")),
+        )
+
+    def _insert(self, rows):
+        if rows:
+            self._conn.executemany(
+                "INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+
+    def has_run(self, run_id):
+        return bool(self._query("SELECT 1 FROM runs WHERE run_id = ?", (run_id,)))
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def runs(self, method=None):
+        """Every run, newest first, with its accuracy, mean latency and token totals."""
+        return self._query(
+            "SELECT runs.run_id, runs.method, runs.dataset, runs.created_at, runs.problems, runs.correct, "
+            "CAST(runs.correct AS REAL) / MAX(runs.problems, 1) AS accuracy, "
+            "AVG(results.latency_ms) AS mean_latency_ms, "
+            "SUM(results.prompt_tokens) AS prompt_tokens, SUM(results.output_tokens) AS output_tokens "
+            "FROM runs LEFT JOIN results ON results.run_id = runs.run_id "
+            "WHERE ? IS NULL OR runs.method = ? "
+            "GROUP BY runs.run_id ORDER BY runs.created_at DESC",
+            (method, method),
+        )
+
+    def accuracy_by_method(self):
+        """Accuracy per (method, run), oldest run first within each method."""
+        return self._query(
+            "SELECT results.method, results.run_id, COUNT(*) AS problems, SUM(results.correct) AS correct, "
+            "AVG(results.correct) AS accuracy "
+            "FROM results JOIN runs ON runs.run_id = results.run_id "
+            "GROUP BY results.method, results.run_id ORDER BY results.method, runs.created_at"
+        )
+
+    def regressions(self, base_run, new_run, method=None):
+        """Problems answered correctly in base_run but not in new_run (matched on problem and method)."""
+        return self._query(
+            "SELECT new.method, new.problem_hash, new.problem, new.ground_answer, "
+            "base.ai_answer AS base_answer, new.ai_answer AS new_answer "
+            "FROM results AS base JOIN results AS new "
+            "ON new.problem_hash = base.problem_hash AND new.method = base.method "
+            "WHERE base.run_id = ? AND new.run_id = ? AND base.correct = 1 AND new.correct = 0 "
+            "AND (? IS NULL OR new.method = ?) ORDER BY new.position",
+            (base_run, new_run, method, method),
+        )
+
+    def iter_run(self, run_id):
+        """
+        Yield a run's results in dataset order with explanations decompressed. Rows are read
+        from the cursor a batch at a time as they are consumed, so reports and exports of large
+        runs use constant memory.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT * FROM results WHERE run_id = ? ORDER BY position, method", (run_id,)
+            )
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+            if not rows:
+                return
+            for row in rows:
+                record = dict(row)
+                record["correct"] = bool(record["correct"])
+                record["ai_explanation"] = decompress(record["ai_explanation"])
+                record["ground_explanation"] = decompress(record["ground_explanation"])
+                yield record
+
+    def write_report(self, run_id, output_file):
+        """Write the readable report (every explanation in full) for one run."""
+        count = 0
+        with open(output_file, "w", encoding="utf-8") as f:
+            for count, row in enumerate(self.iter_run(run_id), start=1):
+                write_readable_entry(f, count, row)
+        return count
+
+    def export_csv(self, run_id, output_file):
+        """Export one run in the evaluator's results CSV layout."""
+        count = 0
+        with open(output_file, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=EXPORT_COLUMNS, extrasaction="ignore")
+            writer.writeheader()
+            for count, row in enumerate(self.iter_run(run_id), start=1):
+                writer.writerow(row)
+        return count
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def _text(value):
+    return None if value is None else str(value)
+
+def _format_runs(rows):
+    print(f"{'run_id':<40}{'method':<18}{'problems':>9}{'accuracy':>10}{'latency':>10}{'tokens':>10}")
+    for row in rows:
+        tokens = (row["prompt_tokens"] or 0) + (row["output_tokens"] or 0)
+        latency = f"{row['mean_latency_ms']:.0f}ms" if row["mean_latency_ms"] is not None else "-"
+        print(f"{row['run_id']:<40}{row['method']:<18}{row['problems']:>9}{row['accuracy']:>10.2%}"
+              f"{latency:>10}{tokens:>10}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Query the evaluation results store.")
+    parser.add_argument("--db", default=RESULTS_DB, help="Results database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    runs = commands.add_parser("runs", help="List runs with their accuracy")
+    runs.add_argument("--method")
+    commands.add_parser("accuracy", help="Accuracy by method across runs")
+    regressions = commands.add_parser("regressions", help="Problems right in BASE_RUN but wrong in NEW_RUN")
+    regressions.add_argument("base_run")
+    regressions.add_argument("new_run")
+    regressions.add_argument("--method")
+    report = commands.add_parser("report", help="Write the readable report of a run")
+    report.add_argument("run_id")
+    report.add_argument("--output", help="Defaults to <run_id>_readable.txt")
+    export = commands.add_parser("export", help="Export a run as a results CSV")
+    export.add_argument("run_id")
+    export.add_argument("--output", help="Defaults to <run_id>.csv")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    store = ResultsStore(args.db)
+    if args.command == "runs":
+        _format_runs(store.runs(args.method))
+    elif args.command == "accuracy":
+        current = None
+        for row in store.accuracy_by_method():
+            if row["method"] != current:
+                current = row["method"]
+                print(f"\n{current}")
+            print(f"  {row['run_id']:<40}{row['correct']:>6}/{row['problems']:<6}{row['accuracy']:>8.2%}")
+    elif args.command == "regressions":
+        rows = store.regressions(args.base_run, args.new_run, args.method)
+        print(f"{len(rows)} problems regressed from {args.base_run} to {args.new_run}")
+        for row in rows:
+            print(f"- [{row['method']}] {row['problem']}")
+            print(f"  Ground truth: {row['ground_answer']}; was {row['base_answer']}, now {row['new_answer']}")
+    elif args.command == "report":
+        output = args.output or f"{args.run_id}_readable.txt"
+        print(f"Wrote {store.write_report(args.run_id, output)} problems to {output}")
+    elif args.command == "export":
+        output = args.output or f"{args.run_id}.csv"
+        print(f"Exported {store.export_csv(args.run_id, output)} problems to {output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
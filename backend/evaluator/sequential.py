@@ -0,0 +1,133 @@
+"""
+Statistics for sequential (early-stopping) evaluation.
+
+Problems are drawn in a stratified random order, so every category is represented in
+proportion to its size at any point of a run. Accuracy, or the accuracy difference between
+two methods on the same problems, is estimated per category and combined with the category
+weights. A run can stop as soon as the confidence interval is narrow enough.
+"""
+import math
+import hashlib
+from statistics import NormalDist
+
+UNCATEGORIZED = "uncategorized"
+
+def category_of(row):
+    """A dataset row's category, or UNCATEGORIZED when the dataset has none."""
+    value = row.get("category")
+    return value.strip() if isinstance(value, str) and value.strip() else UNCATEGORIZED
+
+def z_value(confidence):
+    return NormalDist().inv_cdf((1 + confidence) / 2)
+
+def stratified_order(problems, seed=0):
+    """
+    Order (index, problem_hash, category) tuples for drawing and return their indices.
+    Within a category the order is a seeded shuffle keyed by problem hash, so it does not depend
+    on the row order and every method run with the same seed draws the same problems.
+    Across categories each draw goes to the category furthest behind its share.
+    """
+    strata = {}
+    for index, digest, category in problems:
+        key = hashlib.sha256(f"{seed}:{digest}".encode("utf-8")).hexdigest()
+        strata.setdefault(category, []).append((key, index))
+    for members in strata.values():
+        members.sort()
+    drawn = dict.fromkeys(strata, 0)
+    order = []
+    for _ in range(len(problems)):
+        category = min(
+            (c for c in strata if drawn[c] < len(strata[c])),
+            key=lambda c: ((drawn[c] + 1) / len(strata[c]), c),
+        )
+        order.append(strata[category][drawn[category]][1])
+        drawn[category] += 1
+    return order
+
+def _accuracy_variance(values):
+    # Smoothed, so a category that has been all right (or all wrong) so far still counts as uncertain.
+    p = (sum(values) + 1) / (len(values) + 2)
+    return p * (1 - p)
+
+def _difference_variance(values):
+    # values are +1 (only the first method right), -1 (only the second) or 0; smoothed like above.
+    n = len(values)
+    plus = (values.count(1) + 0.5) / (n + 1)
+    minus = (values.count(-1) + 0.5) / (n + 1)
+    return plus + minus - (plus - minus) ** 2
+
+def stratified_interval(strata, stratum_sizes=None, confidence=0.95, variance=_accuracy_variance, bounds=(0.0, 1.0)):
+    """
+    Combine per-category samples ({category: [value, ...]}) into an estimate with a confidence
+    interval. With stratum_sizes ({category: problems in the dataset}) categories are weighted
+    by their dataset size and the interval, which is for the whole dataset, narrows to zero as
+    a category is exhausted. Without, each category is weighted by its sample size.
+    The interval is clipped to bounds.
+    """
+    sampled = {category: values for category, values in strata.items() if values}
+    sizes = {category: (stratum_sizes or {}).get(category, len(values)) for category, values in sampled.items()}
+    total = sum(sizes.values())
+    estimate = variance_sum = 0.0
+    for category, values in sampled.items():
+        weight = sizes[category] / total
+        n = len(values)
+        correction = max(0.0, 1 - n / sizes[category]) if stratum_sizes else 1.0
+        estimate += weight * sum(values) / n
+        variance_sum += weight ** 2 * correction * variance(values) / n
+    half_width = z_value(confidence) * math.sqrt(variance_sum) if sampled else float("inf")
+    # Every category needs two problems (or all of its problems) before the interval is trusted.
+    complete = all(
+        len(strata.get(category) or []) >= min(2, size) for category, size in (stratum_sizes or {}).items()
+    )
+    return {
+        "estimate": estimate,
+        "low": max(bounds[0], estimate - half_width),
+        "high": min(bounds[1], estimate + half_width),
+        "half_width": half_width,
+        "confidence": confidence,
+        "problems": sum(len(values) for values in sampled.values()),
+        "complete": complete and bool(sampled),
+    }
+
+def accuracy_interval(outcomes, stratum_sizes=None, confidence=0.95):
+    """Accuracy with a confidence interval from (category, correct) pairs."""
+    strata = {}
+    for category, correct in outcomes:
+        strata.setdefault(category, []).append(1 if correct else 0)
+    return stratified_interval(strata, stratum_sizes, confidence, _accuracy_variance)
+
+def mcnemar_p_value(only_first, only_second):
+    """Exact two-sided McNemar test on the problems exactly one of two methods got right."""
+    discordant = only_first + only_second
+    if discordant == 0:
+        return 1.0
+    tail = sum(math.comb(discordant, k) for k in range(min(only_first, only_second) + 1)) / 2 ** discordant
+    return min(1.0, 2 * tail)
+
+def difference_interval(pairs, stratum_sizes=None, confidence=0.95):
+    """
+    Paired comparison from (category, first_correct, second_correct) on the same problems:
+    accuracy of the first method minus the second with a confidence interval, plus McNemar's test.
+    """
+    strata = {}
+    only_first = only_second = 0
+    for category, first, second in pairs:
+        difference = int(bool(first)) - int(bool(second))
+        strata.setdefault(category, []).append(difference)
+        only_first += difference == 1
+        only_second += difference == -1
+    result = stratified_interval(strata, stratum_sizes, confidence, _difference_variance, bounds=(-1.0, 1.0))
+    result.update(
+        only_first=only_first,
+        only_second=only_second,
+        p_value=mcnemar_p_value(only_first, only_second),
+    )
+    return result
+
+def format_interval(result, percent=True):
+    scale, unit = (100, "%") if percent else (1, "")
+    return (
+        f"{result['estimate'] * scale:.1f}{unit} "
+        f"({result['confidence']:.0%} CI {result['low'] * scale:.1f}{unit} to {result['high'] * scale:.1f}{unit}, "
+        f"±{result['half_width'] * scale:.1f}{unit}, {result['problems']} problems)"
+    )
@@ -1,141 +1,597 @@
-from fastapi import FastAPI, HTTPException
-from typing import Optional
-from pydantic import BaseModel
+import os
+import json
+import math
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Query
+from fastapi.responses import StreamingResponse, Response
+from starlette.background import BackgroundTask
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from typing import List, Optional
+from pydantic import BaseModel, Field
 from urllib.parse import unquote
 from research.simple_prompt import SimplePromptReasoningService
 from research.cot_prompt_verification import CotAndVerificationReasoningService
 from research.pal import PalReasoningService
+from research.auto import AutoReasoningService
+from research.self_consistency import MAX_SELF_CONSISTENCY_SAMPLES
+from research.sandbox import get_sandbox_pool
+from model.deadline import Deadline, deadline_scope
+from telemetry.tracing import (
+    COALESCED, DEADLINE_STOPS, ADMISSION_ACTIVE, ADMISSION_QUEUE_DEPTH, ADMISSION_WAIT_SECONDS, ADMISSION_REJECTED, last_trace
+)
+from evaluator.grading import answers_match
+
+@asynccontextmanager
+async def lifespan(app):
+    # Start the PAL sandbox workers in the background, so the API serves requests right away
+    # and the workers are usually ready before the first program-aided request arrives.
+    warmup = asyncio.create_task(asyncio.to_thread(get_sandbox_pool))
+    yield
+    await warmup
 
 app = FastAPI(
     title="Reasoning Methods API",
     description="API for solving reasoning problems using different methods",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# Initialize the reasoning services
-simple_service = SimplePromptReasoningService()
-cot_service = CotAndVerificationReasoningService()
-pal_service = PalReasoningService()
+# Methods run side by side by /reasoning/compare when the request does not list any.
+COMPARE_METHODS = ["simple", "cot-verification", "program-aided"]
+# Maximum number of batch items solved at the same time, across all batch requests.
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+MAX_BATCH_ITEMS = int(os.getenv("MAX_BATCH_ITEMS", "10000"))
+batch_semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+# Admission control: requests running at once per method, and how many more may wait (and for
+# how long) before new requests are turned away. ADMISSION_METHOD_LIMITS overrides the
+# concurrency limit per method, e.g. "program-aided=4,auto=8".
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "16"))
+ADMISSION_METHOD_LIMITS = os.getenv("ADMISSION_METHOD_LIMITS", "")
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "32"))
+ADMISSION_MAX_QUEUE_SECONDS = float(os.getenv("ADMISSION_MAX_QUEUE_SECONDS", "10"))
+
+# Reasoning services are created on first use, so a new worker can start serving (and
+# answering /health) before any model client exists.
+SERVICE_CLASSES = {
+    "simple": SimplePromptReasoningService,
+    "cot-verification": CotAndVerificationReasoningService,
+    "program-aided": PalReasoningService,
+}
+services = {}
+
+def get_service(method):
+    """Return the service for a method name, creating it on first use."""
+    if method not in services:
+        if method == "auto":
+            services[method] = AutoReasoningService(
+                get_service("simple"), get_service("cot-verification"), get_service("program-aided")
+            )
+        else:
+            services[method] = SERVICE_CLASSES[method]()
+    return services[method]
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one in-flight computation.
+    Every caller awaits the shared task; it is cancelled only when all of its callers have gone.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def do(self, key, func):
+        entry = self._inflight.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(func())
+            entry = self._inflight[key] = {"task": task, "waiters": 0}
+            task.add_done_callback(lambda t: self._forget(key, entry))
+            coalesced = False
+        else:
+            coalesced = True
+        entry["waiters"] += 1
+        try:
+            return await asyncio.shield(entry["task"]), coalesced
+        except asyncio.CancelledError:
+            if entry["task"].done():
+                raise
+            entry["waiters"] -= 1
+            if entry["waiters"] == 0:
+                entry["task"].cancel()
+            raise
+
+    def _forget(self, key, entry):
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+        task = entry["task"]
+        if not task.cancelled():
+            task.exception()  # retrieved here so an error nobody awaited is not logged as unhandled
+
+    def __len__(self):
+        return len(self._inflight)
+
+single_flight = SingleFlight()
+
+def parse_method_limits(spec):
+    """Parse "method=limit,..." into a dict."""
+    limits = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        method, _, limit = part.partition("=")
+        limits[method.strip().lower()] = int(limit)
+    return limits
+
+class AdmissionController:
+    """
+    Per-method concurrency limits with a bounded FIFO wait queue.
+    A request runs straight away when its method has a free slot. Otherwise it waits in the
+    queue, unless the queue is full (429) or the expected wait is longer than max_queue_seconds
+    (503); a request still queued after max_queue_seconds is also rejected with a 503. Each
+    rejection carries a Retry-After estimated from the recent service time, so clients back off
+    instead of piling on, and accepted requests keep their latency under overload.
+    """
+
+    def __init__(self, limit=MAX_CONCURRENT_REQUESTS, method_limits=None,
+                 queue_size=ADMISSION_QUEUE_SIZE, max_queue_seconds=ADMISSION_MAX_QUEUE_SECONDS):
+        self.limit = limit
+        self.method_limits = method_limits if method_limits is not None else parse_method_limits(ADMISSION_METHOD_LIMITS)
+        self.queue_size = queue_size
+        self.max_queue_seconds = max_queue_seconds
+        self._active = {}
+        self._waiters = {}
+        self._service_seconds = {}  # method -> moving average of how long an admitted request runs
+
+    def limit_for(self, method):
+        return self.method_limits.get(method, self.limit)
+
+    def estimated_wait(self, method, position):
+        """Expected seconds until the request at this queue position (1-based) gets a slot."""
+        # Until a request has finished there is no service time to go on, and nothing is rejected for it.
+        return position * self._service_seconds.get(method, 0.0) / max(1, self.limit_for(method))
+
+    def _reject(self, method, status_code, reason, wait):
+        ADMISSION_REJECTED.labels(method, reason).inc()
+        raise HTTPException(
+            status_code=status_code,
+            detail=f"Server busy: too many {method} requests, please retry later.",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))}
+        )
+
+    async def acquire(self, method, max_wait=None):
+        """
+        Wait for a slot for this method and return the function that releases it.
+        max_wait (e.g. the time left before the request's deadline) shortens the allowed queue time.
+        """
+        max_wait = self.max_queue_seconds if max_wait is None else min(max_wait, self.max_queue_seconds)
+        active = self._active.get(method, 0)
+        waiters = self._waiters.setdefault(method, deque())
+        if active < self.limit_for(method) and not waiters:
+            self._grant(method)
+            ADMISSION_WAIT_SECONDS.labels(method).observe(0)
+            return self._releaser(method, time.perf_counter())
+        
+        if len(waiters) >= self.queue_size:
+            self._reject(method, 429, "queue_full", self.estimated_wait(method, len(waiters) + 1))
+        wait = self.estimated_wait(method, len(waiters) + 1)
+        if wait > max_wait:
+            self._reject(method, 503, "expected_wait", wait)
+        
+        future = asyncio.get_running_loop().create_future()
+        waiters.append(future)
+        ADMISSION_QUEUE_DEPTH.labels(method).set(len(waiters))
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the wait ended: give it to the next request.
+                self.release(method)
+            else:
+                future.cancel()
+                waiters.remove(future)
+                ADMISSION_QUEUE_DEPTH.labels(method).set(len(waiters))
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._reject(method, 503, "queue_timeout", self.estimated_wait(method, len(waiters) + 1))
+        now = time.perf_counter()
+        ADMISSION_WAIT_SECONDS.labels(method).observe(now - start)
+        return self._releaser(method, now)
+
+    def _grant(self, method):
+        self._active[method] = self._active.get(method, 0) + 1
+        ADMISSION_ACTIVE.labels(method).set(self._active[method])
+
+    def _releaser(self, method, started):
+        released = False
+        
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                elapsed = time.perf_counter() - started
+                previous = self._service_seconds.get(method)
+                self._service_seconds[method] = elapsed if previous is None else 0.8 * previous + 0.2 * elapsed
+                self.release(method)
+        return release
+
+    def release(self, method):
+        """Free a slot, handing it straight to the longest-waiting request if there is one."""
+        self._active[method] -= 1
+        waiters = self._waiters.get(method)
+        while waiters:
+            future = waiters.popleft()
+            if not future.done():
+                self._grant(method)
+                future.set_result(None)
+                break
+        ADMISSION_QUEUE_DEPTH.labels(method).set(len(waiters or ()))
+        ADMISSION_ACTIVE.labels(method).set(self._active[method])
+
+    @asynccontextmanager
+    async def slot(self, method, max_wait=None):
+        release = await self.acquire(method, max_wait)
+        try:
+            yield
+        finally:
+            release()
+
+admission = AdmissionController()
+
+async def run_admitted(method, deadline_ms, func):
+    """
+    Run func() in an admission slot for the method, under a deadline of deadline_ms from now.
+    The deadline covers the wait for a slot too, and every model call and program run inside func.
+    """
+    deadline = Deadline.after_ms(deadline_ms)
+    async with admission.slot(method, deadline.remaining() if deadline is not None else None):
+        with deadline_scope(deadline):
+            return await func()
+
+async def wait_for_disconnect(http_request):
+    # The body has already been read, so the next message is the client going away.
+    while (await http_request.receive())["type"] != "http.disconnect":
+        pass
+
+async def cancel_on_disconnect(http_request, method, coro):
+    """
+    Await coro, cancelling it if the client disconnects first. Cancellation reaches the model
+    calls and sandbox runs in progress, unless an identical request still waits for the result.
+    """
+    work = asyncio.ensure_future(coro)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(http_request))
+    try:
+        await asyncio.wait({work, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        disconnected.cancel()
+        if not work.done():
+            work.cancel()
+    if not work.done() or work.cancelled():
+        DEADLINE_STOPS.labels(method, "disconnected").inc()
+        raise HTTPException(status_code=499, detail="Client disconnected")
+    return work.result()
+
+def error_status(answer):
+    """Status for an "Error:" answer: 504 when the deadline passed before there was any answer, else 400."""
+    return 504 if str(answer).startswith("Error: Deadline exceeded") else 400
+
+def normalize_statement(statement):
+    return " ".join(str(statement).split())
+
+def model_config_key(service):
+    """Identify the model and generation settings a service's answers depend on."""
+    model = getattr(service.model, "model", service.model)
+    config = getattr(model, "_generation_config", None) or {}
+    return getattr(model, "model_name", ""), json.dumps(config, sort_keys=True, default=str)
 
 class ReasoningRequest(BaseModel):
     statement: str
     ground_truth: Optional[str] = None
+    # More than 1 turns on self-consistency (cot-verification and program-aided only).
+    samples: Optional[int] = None
+    # Time budget for the whole request; stages that cannot finish within it are skipped.
+    deadline_ms: Optional[int] = Field(None, gt=0)
+
+class BatchItem(BaseModel):
+    statement: str
+    ground_truth: Optional[str] = None
+    method: str = "simple"
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+
+class CompareRequest(BaseModel):
+    statement: str
+    ground_truth: Optional[str] = None
+    methods: Optional[List[str]] = None
+    deadline_ms: Optional[int] = Field(None, gt=0)
+
+def get_method_call(method):
+    """Return (service, coroutine function) for a method name, or raise a 400."""
+    method = method.lower()
+    if method == "simple":
+        service = get_service("simple")
+        return service, service.evaluate_reasoning_with_explanation_async
+    elif method == "cot-verification":
+        service = get_service("cot-verification")
+        return service, service.evaluate_with_cot_and_verification_async
+    elif method == "program-aided":
+        service = get_service("program-aided")
+        return service, service.evaluate_with_program_aided_async
+    elif method == "auto":
+        service = get_service("auto")
+        return get_service("simple"), service.evaluate_auto_async
+    raise HTTPException(
+        status_code=400,
+        detail=f"Invalid method: {method}. Please use 'simple', 'cot-verification', 'program-aided', or 'auto'."
+    )
+
+async def evaluate_with_usage(evaluate, statement):
+    """Run a service call and return (result, usage) where usage is its trace as a dict."""
+    result = await evaluate(statement, None)
+    trace = last_trace()
+    return result, trace.as_dict() if trace is not None else None
+
+async def solve_with_usage(method, statement, ground_truth, deadline_ms=None):
+    """
+    Dispatch a problem to the service for the given method name.
+    Identical requests already in flight (same method, statement up to whitespace, deadline and
+    model config) share one computation instead of calling the model again; each caller's answer
+    is graded against its own ground truth. Returns (answer, explanation, is_correct, usage), with
+    the latency, token and model-call counts of the computation (and whether it is partial) in usage.
+    """
+    service, evaluate = get_method_call(method)
+    key = (method.lower(), normalize_statement(statement), deadline_ms, model_config_key(service))
+    # Admission happens inside the shared computation, so requests that join it take no slot.
+    ((answer, explanation, _), usage), coalesced = await single_flight.do(
+        key, lambda: run_admitted(key[0], deadline_ms, lambda: evaluate_with_usage(evaluate, statement))
+    )
+    if coalesced:
+        COALESCED.labels(method.lower()).inc()
+    is_correct = answers_match(answer, ground_truth) if ground_truth else False
+    return answer, explanation, is_correct, usage
+
+async def run_reasoning_method(method, statement, ground_truth, deadline_ms=None):
+    """Like solve_with_usage, without the usage: returns (answer, explanation, is_correct)."""
+    answer, explanation, is_correct, _ = await solve_with_usage(method, statement, ground_truth, deadline_ms)
+    return answer, explanation, is_correct
+
+def check_samples(request):
+    """Reject a samples value outside what self-consistency supports."""
+    if request.samples is not None and not 1 <= request.samples <= MAX_SELF_CONSISTENCY_SAMPLES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"samples must be between 1 and {MAX_SELF_CONSISTENCY_SAMPLES}."
+        )
+
+async def self_consistency_response(method, service, request):
+    """Sample, vote and build the response for a request with samples > 1."""
+    key = (
+        "self-consistency", method, normalize_statement(request.statement), request.samples,
+        request.deadline_ms, model_config_key(service)
+    )
+    result, coalesced = await single_flight.do(key, lambda: run_admitted(
+        method, request.deadline_ms,
+        lambda: service.sample_with_self_consistency_async(request.statement, request.samples)
+    ))
+    if coalesced:
+        COALESCED.labels(method).inc()
+    
+    answer = result["answer"]
+    if answer is None or str(answer).startswith("Error:"):
+        raise HTTPException(status_code=error_status(answer), detail=str(answer))
+    
+    return {
+        "problem": request.statement,
+        "answer": answer,
+        "explanation": result["explanation"],
+        "correct": answers_match(answer, request.ground_truth) if request.ground_truth else None,
+        "confidence": result["confidence"],
+        "votes": result["votes"],
+        "samples": result["samples"]
+    }
 
 # Simple Reasoning endpoint
 @app.post("/reasoning/simple")
-async def simple_reasoning(request: ReasoningRequest):
+async def simple_reasoning(request: ReasoningRequest, http_request: Request):
     """
     Solve a reasoning problem using the simple approach with answer and explanation.
     
     Parameters:
     - statement: The reasoning problem statement
     - ground_truth: Optional ground truth answer for verification
+    - deadline_ms: Optional time budget; the request is answered with a 504 if it runs out
     
     Returns:
     - JSON object containing the problem, answer, explanation, and correctness check
     """
     try:
-        # Get answer and explanation - note the renaming of ground_truth to ground_answer
-        answer, explanation, is_correct = simple_service.evaluate_reasoning_with_explanation(
-            statement=request.statement, 
-            ground_answer=request.ground_truth 
-        )
+        # Get answer and explanation
+        answer, explanation, is_correct, usage = await cancel_on_disconnect(http_request, "simple", solve_with_usage(
+            "simple",
+            request.statement,
+            request.ground_truth,
+            request.deadline_ms
+        ))
         
         # Check for errors
         if answer and answer.startswith("Error:"):
-            raise HTTPException(status_code=400, detail=answer)
+            raise HTTPException(status_code=error_status(answer), detail=answer)
         
         # Return the result
         return {
             "problem": request.statement,
             "answer": answer,
             "explanation": explanation,
-            "correct": is_correct if request.ground_truth else None
+            "correct": is_correct if request.ground_truth else None,
+            "partial": usage["partial"] if usage else None
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # CoT+Verification endpoint
 @app.post("/reasoning/cot-verification")
-async def cot_verification(request: ReasoningRequest):
+async def cot_verification(request: ReasoningRequest, http_request: Request):
     """
     Solve a reasoning problem using Chain-of-Thought with Verification.
     
     Parameters:
     - statement: The reasoning problem statement
     - ground_truth: Optional ground truth answer for verification
+    - samples: Optional number of reasoning chains to sample and vote over (self-consistency)
+    - deadline_ms: Optional time budget; if the reasoning is done but verification does not fit,
+      the unverified answer is returned with partial set
     
     Returns:
-    - JSON object containing the problem, answer, explanation, and correctness check
+    - JSON object containing the problem, answer, explanation, and correctness check; with
+      samples > 1 also the vote distribution and the share of samples that agree (confidence)
     """
+    check_samples(request)
     try:
+        if request.samples and request.samples > 1:
+            return await cancel_on_disconnect(
+                http_request, "cot-verification", self_consistency_response("cot-verification", get_service("cot-verification"), request)
+            )
+        
         # Get answer and explanation with CoT+Verification
-        answer, explanation, is_correct = cot_service.evaluate_with_cot_and_verification(
+        answer, explanation, is_correct, usage = await cancel_on_disconnect(http_request, "cot-verification", solve_with_usage(
+            "cot-verification",
             request.statement,
-            request.ground_truth
-        )
+            request.ground_truth,
+            request.deadline_ms
+        ))
         
         # Check for errors
         if answer and answer.startswith("Error:"):
-            raise HTTPException(status_code=400, detail=answer)
+            raise HTTPException(status_code=error_status(answer), detail=answer)
         
         # Return the result
         return {
             "problem": request.statement,
             "answer": answer,
             "explanation": explanation,
-            "correct": is_correct if request.ground_truth else None
+            "correct": is_correct if request.ground_truth else None,
+            "partial": usage["partial"] if usage else None
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Program-Aided endpoint
 @app.post("/reasoning/program-aided")
-async def program_aided(request: ReasoningRequest):
+async def program_aided(request: ReasoningRequest, http_request: Request):
     """
     Solve a reasoning problem using Program-Aided Language Model approach.
     
     Parameters:
     - statement: The reasoning problem statement
     - ground_truth: Optional ground truth answer for verification
+    - samples: Optional number of programs to sample, run in parallel and vote over (self-consistency)
+    - deadline_ms: Optional time budget; program runs are cut to it and a fix round that does
+      not fit is skipped, with partial set
     
     Returns:
-    - JSON object containing the problem, answer, explanation, and correctness check
+    - JSON object containing the problem, answer, explanation, and correctness check; with
+      samples > 1 also the vote distribution and the share of samples that agree (confidence)
     """
+    check_samples(request)
     try:
+        if request.samples and request.samples > 1:
+            return await cancel_on_disconnect(
+                http_request, "program-aided", self_consistency_response("program-aided", get_service("program-aided"), request)
+            )
+        
         # Get answer and explanation with Program-Aided approach
-        answer, explanation, is_correct = pal_service.evaluate_with_program_aided(
+        answer, explanation, is_correct, usage = await cancel_on_disconnect(http_request, "program-aided", solve_with_usage(
+            "program-aided",
             request.statement,
-            request.ground_truth
-        )
+            request.ground_truth,
+            request.deadline_ms
+        ))
         
         # Check for errors
         if answer and answer.startswith("Error:"):
-            raise HTTPException(status_code=400, detail=answer)
+            raise HTTPException(status_code=error_status(answer), detail=answer)
         
         # Return the result
         return {
             "problem": request.statement,
             "answer": answer,
             "explanation": explanation,
-            "correct": is_correct if request.ground_truth else None
+            "correct": is_correct if request.ground_truth else None,
+            "partial": usage["partial"] if usage else None
         }
     
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Auto (cascading) endpoint
+@app.post("/reasoning/auto")
+async def auto_reasoning(request: ReasoningRequest, http_request: Request):
+    """
+    Solve a reasoning problem with the cheapest method that gives a confident answer,
+    escalating to CoT with verification or program-aided reasoning only when needed.
+    
+    Parameters:
+    - statement: The reasoning problem statement
+    - ground_truth: Optional ground truth answer for verification
+    - deadline_ms: Optional time budget; tiers that cannot start in time are skipped
+    
+    Returns:
+    - JSON object containing the problem, answer, explanation and correctness check, plus the
+      tier that answered, every step of the route with its reason, and the model calls,
+      tokens and latency it cost
+    """
+    try:
+        key = ("auto-route", normalize_statement(request.statement), request.deadline_ms, model_config_key(get_service("simple")))
+        route, coalesced = await cancel_on_disconnect(http_request, "auto", single_flight.do(key, lambda: run_admitted(
+            "auto", request.deadline_ms, lambda: get_service("auto").route_async(request.statement)
+        )))
+        if coalesced:
+            COALESCED.labels("auto").inc()
+        
+        # Check for errors
+        answer = route["answer"]
+        if answer is None or str(answer).startswith("Error:"):
+            raise HTTPException(status_code=error_status(answer), detail=str(answer))
+        
+        return {
+            "problem": request.statement,
+            "answer": answer,
+            "explanation": route["explanation"],
+            "correct": answers_match(answer, request.ground_truth) if request.ground_truth else None,
+            "tier": route["tier"],
+            "route": route["route"],
+            "model_calls": route["model_calls"],
+            "tokens": route["tokens"],
+            "latency_ms": route["latency_ms"],
+            "partial": route["partial"]
+        }
+    
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Generic endpoint that accepts the method as a parameter
 @app.get("/reasoning/{method}/{statement}")
-async def solve_reasoning_problem(method: str, statement: str, ground_truth: Optional[str] = None):
+async def solve_reasoning_problem(method: str, statement: str, http_request: Request,
+                                  ground_truth: Optional[str] = None, deadline_ms: Optional[int] = Query(None, gt=0)):
     """
     Solve a reasoning problem using the specified method.
     
     Parameters:
-    - method: The reasoning method to use (simple, cot-verification, or program-aided)
+    - method: The reasoning method to use (simple, cot-verification, program-aided, or auto)
     - statement: The reasoning problem statement (URL encoded)
     - ground_truth: Optional ground truth answer for verification
+    - deadline_ms: Optional time budget in milliseconds
     
     Returns:
     - JSON object containing the problem, answer, explanation, and correctness check
@@ -145,50 +601,219 @@ async def solve_reasoning_problem(method: str, statement: str, ground_truth: Opt
         decoded_statement = unquote(statement)
         decoded_ground_truth = unquote(ground_truth) if ground_truth else None
         
-        # Choose the appropriate method
-        if method.lower() == "simple":
-            # Use named parameter to match the method signature
-            answer, explanation, is_correct = simple_service.evaluate_reasoning_with_explanation(
-                decoded_statement,
-                ground_answer=decoded_ground_truth 
-            )
-        elif method.lower() == "cot-verification":
-            answer, explanation, is_correct = cot_service.evaluate_with_cot_and_verification(
-                decoded_statement,
-                decoded_ground_truth
-            )
-        elif method.lower() == "program-aided":
-            answer, explanation, is_correct = pal_service.evaluate_with_program_aided(
-                decoded_statement,
-                decoded_ground_truth
-            )
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid method: {method}. Please use 'simple', 'cot-verification', or 'program-aided'."
-            )
+        answer, explanation, is_correct, usage = await cancel_on_disconnect(http_request, method.lower(), solve_with_usage(
+            method,
+            decoded_statement,
+            decoded_ground_truth,
+            deadline_ms
+        ))
         
         # Check for errors
         if answer and answer.startswith("Error:"):
-            raise HTTPException(status_code=400, detail=answer)
+            raise HTTPException(status_code=error_status(answer), detail=answer)
         
         # Return the result
         return {
             "problem": decoded_statement,
             "answer": answer,
             "explanation": explanation,
-            "correct": is_correct if decoded_ground_truth else None
+            "correct": is_correct if decoded_ground_truth else None,
+            "partial": usage["partial"] if usage else None
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def format_sse(event, data):
+    """Encode one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# Streaming endpoint
+@app.post("/reasoning/{method}/stream")
+async def stream_reasoning(method: str, request: ReasoningRequest):
+    """
+    Solve a reasoning problem and stream progress as Server-Sent Events.
+    
+    Parameters:
+    - method: simple or cot-verification
+    - statement: The reasoning problem statement
+    - ground_truth: Optional ground truth answer for verification
+    - deadline_ms: Optional time budget, covering the wait for a slot, every model call and each
+      chunk; when it runs out the stream ends with an "error" event (or, for cot-verification
+      with the reasoning done, a partial unverified "result")
+    
+    Returns:
+    - text/event-stream with "phase" events when a new stage starts, "token" events carrying
+      generated text for that stage, and a final "result" (or "error") event.
+    """
+    if method.lower() == "simple":
+        events = get_service("simple").stream_reasoning_with_explanation(
+            request.statement,
+            ground_answer=request.ground_truth
+        )
+    elif method.lower() == "cot-verification":
+        events = get_service("cot-verification").stream_with_cot_and_verification(
+            request.statement,
+            request.ground_truth
+        )
+    else:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Streaming is not available for method: {method}. Please use 'simple' or 'cot-verification'."
+        )
+    
+    # Admitted before the response starts, so a busy server still answers with a 429/503.
+    deadline = Deadline.after_ms(request.deadline_ms)
+    release = await admission.acquire(method.lower(), deadline.remaining() if deadline is not None else None)
+    
+    async def event_stream():
+        try:
+            yield format_sse("start", {"problem": request.statement, "method": method})
+            with deadline_scope(deadline):
+                async for event in events:
+                    name = event.pop("event")
+                    if name == "result":
+                        event["problem"] = request.statement
+                        if not request.ground_truth:
+                            event["correct"] = None
+                    yield format_sse(name, event)
+        finally:
+            release()
+    
+    # The background task frees the slot if the stream never started (release is idempotent).
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release)
+    )
+
+# Batch endpoint
+@app.post("/reasoning/batch")
+async def batch_reasoning(request: BatchRequest):
+    """
+    Solve many reasoning problems concurrently, each with its own method.
+    
+    Parameters:
+    - items: List of {statement, ground_truth, method} objects
+    
+    Returns:
+    - NDJSON stream with one JSON object per item, in the order items finish. Each object
+      carries the item's input index and either the usual result fields or an error.
+    """
+    if len(request.items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch too large: at most {MAX_BATCH_ITEMS} items are allowed.")
+    
+    async def solve_item(index, item):
+        async with batch_semaphore:
+            try:
+                answer, explanation, is_correct = await run_reasoning_method(
+                    item.method,
+                    item.statement,
+                    item.ground_truth
+                )
+                if answer and answer.startswith("Error:"):
+                    return {"index": index, "method": item.method, "problem": item.statement, "error": answer}
+                return {
+                    "index": index,
+                    "method": item.method,
+                    "problem": item.statement,
+                    "answer": answer,
+                    "explanation": explanation,
+                    "correct": is_correct if item.ground_truth else None
+                }
+            except HTTPException as e:
+                return {"index": index, "method": item.method, "problem": item.statement, "error": e.detail}
+            except Exception as e:
+                return {"index": index, "method": item.method, "problem": item.statement, "error": str(e)}
+    
+    async def stream_results():
+        tasks = [asyncio.create_task(solve_item(index, item)) for index, item in enumerate(request.items)]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield json.dumps(await next_result) + "\n"
+        finally:
+            # Stop outstanding work if the client disconnects mid-stream.
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+# Compare endpoint
+@app.post("/reasoning/compare")
+async def compare_methods(request: CompareRequest):
+    """
+    Solve one problem with several methods concurrently, for a side-by-side comparison.
+    
+    Parameters:
+    - statement: The reasoning problem statement
+    - ground_truth: Optional ground truth answer for verification
+    - methods: Optional list of methods (default: simple, cot-verification, program-aided)
+    - deadline_ms: Optional time budget for each method
+    
+    Returns:
+    - NDJSON stream with one JSON object per method, in the order the methods finish, so the
+      whole comparison takes as long as the slowest method. Each object carries the method and
+      either its answer, explanation, correctness, latency_ms, tokens and model_calls, or an error.
+    """
+    methods = [method.lower() for method in (request.methods or COMPARE_METHODS)]
+    for method in methods:
+        get_method_call(method)  # unknown methods are rejected before anything runs
+    
+    async def solve_method(method):
+        start = time.perf_counter()
+        try:
+            answer, explanation, is_correct, usage = await solve_with_usage(
+                method,
+                request.statement,
+                request.ground_truth,
+                request.deadline_ms
+            )
+        except HTTPException as e:
+            return {"method": method, "problem": request.statement, "error": e.detail}
+        except Exception as e:
+            return {"method": method, "problem": request.statement, "error": str(e)}
+        if answer and answer.startswith("Error:"):
+            return {"method": method, "problem": request.statement, "error": answer}
+        usage = usage or {}
+        return {
+            "method": method,
+            "problem": request.statement,
+            "answer": answer,
+            "explanation": explanation,
+            "correct": is_correct if request.ground_truth else None,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+            "prompt_tokens": usage.get("prompt_tokens"),
+            "output_tokens": usage.get("output_tokens"),
+            "cached_tokens": usage.get("cached_tokens"),
+            "model_calls": usage.get("model_calls"),
+            "partial": usage.get("partial")
+        }
+    
+    async def stream_results():
+        tasks = [asyncio.create_task(solve_method(method)) for method in dict.fromkeys(methods)]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield json.dumps(await next_result) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
     """Health check endpoint to verify the API is running"""
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: request counts and latency, per-stage timings and token usage by method"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
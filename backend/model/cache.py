@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from telemetry.tracing import RESPONSE_CACHE_LOOKUPS
+
+CACHE_PATH = os.getenv(
+    "GEMINI_CACHE_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".cache", "gemini_responses.sqlite3"))
+)
+CACHE_MEMORY_ENTRIES = int(os.getenv("GEMINI_CACHE_MEMORY_ENTRIES", "512"))
+CACHE_DISK_ENTRIES = int(os.getenv("GEMINI_CACHE_DISK_ENTRIES", "20000"))
+CACHE_TTL_SECONDS = float(os.getenv("GEMINI_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Expired and surplus disk entries are trimmed once every this many writes, not on each one.
+CACHE_EVICT_INTERVAL = int(os.getenv("GEMINI_CACHE_EVICT_INTERVAL", "200"))
+CACHE_DISABLED = os.getenv("GEMINI_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+
+class CachedResponse:
+    """Minimal stand-in for a Gemini response served from the cache."""
+
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = None
+        self.cached = True
+
+def make_cache_key(model_name, generation_config, prompt):
+    """Stable content hash of everything that determines a model response."""
+    payload = json.dumps(
+        {"model": model_name, "config": generation_config or {}, "prompt": prompt},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    Two-tier response cache: an in-memory LRU in front of a SQLite table that survives restarts.
+    Entries expire after ttl_seconds and the disk tier is trimmed to max_disk_entries,
+    oldest first, every evict_interval writes (so it can briefly hold up to that many more).
+    The two tiers have separate locks: a memory hit never waits for SQLite. Async callers
+    use get_memory and run get/set, which may touch the disk, in a worker thread.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_memory_entries=CACHE_MEMORY_ENTRIES,
+                 max_disk_entries=CACHE_DISK_ENTRIES, ttl_seconds=CACHE_TTL_SECONDS,
+                 evict_interval=CACHE_EVICT_INTERVAL):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self.evict_interval = max(1, evict_interval)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._writes_since_evict = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._conn = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, text TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_created ON responses (created_at)")
+            self._conn.commit()
+
+    def get_memory(self, key):
+        """Return the text for key from the memory tier only, or None; never touches the disk."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            text, created_at = entry
+            if now - created_at > self.ttl_seconds:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+        RESPONSE_CACHE_LOOKUPS.labels("memory").inc()
+        return text
+
+    def get(self, key):
+        """Return the cached text for key, or None on a miss."""
+        text = self.get_memory(key)
+        if text is not None:
+            return text
+        if self._conn is not None:
+            now = time.time()
+            with self._disk_lock:
+                row = self._conn.execute(
+                    "SELECT text, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] > self.ttl_seconds:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                    row = None
+            if row is not None:
+                text, created_at = row
+                with self._lock:
+                    self._remember(key, text, created_at)
+                    self.disk_hits += 1
+                RESPONSE_CACHE_LOOKUPS.labels("disk").inc()
+                return text
+        with self._lock:
+            self.misses += 1
+        RESPONSE_CACHE_LOOKUPS.labels("miss").inc()
+        return None
+
+    def set(self, key, text):
+        now = time.time()
+        with self._lock:
+            self._remember(key, text, now)
+        if self._conn is not None:
+            with self._disk_lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, text, created_at) VALUES (?, ?, ?)",
+                    (key, text, now),
+                )
+                self._writes_since_evict += 1
+                if self._writes_since_evict >= self.evict_interval:
+                    self._evict_disk(now)
+                    self._writes_since_evict = 0
+                self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self._conn is not None:
+            with self._disk_lock:
+                self._conn.execute("DELETE FROM responses")
+                self._conn.commit()
+
+    def stats(self):
+        """Hit/miss counters for this process."""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+    def _remember(self, key, text, created_at):
+        self._memory[key] = (text, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now):
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_disk_entries:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY created_at ASC LIMIT ?)",
+                (count - self.max_disk_entries,),
+            )
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """Return the process-wide ResponseCache, or None when caching is disabled."""
+    global _response_cache
+    if CACHE_DISABLED:
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
+
+def response_cache_stats():
+    """Counters of the process-wide ResponseCache, or None if this process never created one."""
+    return _response_cache.stats() if _response_cache is not None else None
@@ -0,0 +1,116 @@
+import os
+import time
+import asyncio
+import datetime
+import threading
+from model.rate_limiter import estimate_tokens
+
+# Static prompt prefixes (see research/prompts.py) are cached by the model instead of being
+# sent with every call. Set GEMINI_CONTEXT_CACHE_DISABLED=1 to always send them inline.
+CONTEXT_CACHE_DISABLED = os.getenv("GEMINI_CONTEXT_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+CONTEXT_CACHE_TTL = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))
+# Smallest prefix (estimated tokens) worth asking the API to cache; it rejects anything below
+# its minimum cacheable size (32,768 tokens for gemini-1.5 models). Shorter prefixes go inline.
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS", "32768"))
+
+class ContextCache:
+    """
+    Maps each static prompt prefix to a model that has that prefix cached.
+    Live Gemini models get a cached content entry from the API. The fake backend has a local
+    in-memory stand-in (with_cached_prefix). If a backend cannot cache a prefix, it is sent
+    inline instead and not tried again. That covers the cassette, and the API when a prefix is
+    below min_tokens. The lock is never held while an entry is created: callers asking for a
+    prefix that is being cached send it inline meanwhile.
+    """
+
+    def __init__(self, ttl=CONTEXT_CACHE_TTL, min_tokens=CONTEXT_CACHE_MIN_TOKENS):
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self._models = {}  # (id(model), digest) -> (cached model, renew at, model)
+        # Values hold the base model, so its id is not reused while the entry exists.
+        self._unsupported = {}
+        self._creating = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def model_for(self, model, prefix, digest):
+        """Return a model bound to the cached prefix, or None to send the prefix inline."""
+        # Keyed by model instance: two backends can share a model name but not their caching support.
+        key = (id(model), digest)
+        found, cached_model = self._lookup(key)
+        if found:
+            return cached_model
+        return self._finish(key, model, self._try_create(model, prefix, digest))
+
+    async def model_for_async(self, model, prefix, digest):
+        """model_for for the event loop: a prefix that still has to be cached is created in a worker thread."""
+        key = (id(model), digest)
+        found, cached_model = self._lookup(key)
+        if found:
+            return cached_model
+        return self._finish(key, model, await asyncio.to_thread(self._try_create, model, prefix, digest))
+
+    def _lookup(self, key):
+        """Return (True, model or None) if key is settled; (False, None) if the caller should create it."""
+        with self._lock:
+            if key in self._unsupported or key in self._creating:
+                return True, None
+            entry = self._models.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self.hits += 1
+                return True, entry[0]
+            self._creating.add(key)
+            return False, None
+
+    def _finish(self, key, model, cached_model):
+        with self._lock:
+            self._creating.discard(key)
+            if cached_model is None:
+                self._unsupported[key] = model
+                return None
+            self.misses += 1
+            # Renewed a little before the cached content expires.
+            self._models[key] = (cached_model, time.monotonic() + self.ttl * 0.9, model)
+            return cached_model
+
+    def _try_create(self, model, prefix, digest):
+        try:
+            return self._create(model, prefix)
+        except Exception as e:
+            print(f"Could not cache prompt prefix {digest} ({e}); sending it inline instead.")
+            return None
+
+    def _create(self, model, prefix):
+        if hasattr(model, "with_cached_prefix"):
+            return model.with_cached_prefix(prefix)
+        if not type(model).__module__.startswith("google.generativeai"):
+            return None
+        if estimate_tokens(prefix) < self.min_tokens:
+            return None
+        import google.generativeai as genai
+        from google.generativeai import caching
+        content = caching.CachedContent.create(
+            model=model.model_name,
+            contents=[prefix],
+            ttl=datetime.timedelta(seconds=self.ttl),
+        )
+        return genai.GenerativeModel.from_cached_content(
+            content, generation_config=getattr(model, "_generation_config", None) or None
+        )
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "prefixes": len(self._models)}
+
+_context_cache = None
+_context_cache_lock = threading.Lock()
+
+def get_context_cache():
+    """Return the process-wide ContextCache, or None when context caching is disabled."""
+    global _context_cache
+    if CONTEXT_CACHE_DISABLED:
+        return None
+    with _context_cache_lock:
+        if _context_cache is None:
+            _context_cache = ContextCache()
+        return _context_cache
@@ -0,0 +1,82 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from telemetry.tracing import DEADLINE_STOPS, current_method
+
+class DeadlineExceeded(Exception):
+    """Raised instead of starting (or while running) work that cannot finish before the deadline."""
+
+class Deadline:
+    """An absolute point in time (time.monotonic) by which a request must be answered."""
+
+    def __init__(self, at):
+        self.at = at
+
+    @classmethod
+    def after_ms(cls, milliseconds):
+        return cls(time.monotonic() + milliseconds / 1000) if milliseconds else None
+
+    def remaining(self):
+        return max(0.0, self.at - time.monotonic())
+
+class StageTimes:
+    """Moving average of how long each kind of stage takes, to tell whether it still fits in a deadline."""
+
+    def __init__(self, weight=0.2):
+        self.weight = weight
+        self._seconds = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            previous = self._seconds.get(name)
+            self._seconds[name] = seconds if previous is None else (1 - self.weight) * previous + self.weight * seconds
+
+    def expected(self, name):
+        # A stage that has never run is assumed to fit.
+        return self._seconds.get(name, 0.0)
+
+stage_times = StageTimes()
+
+_current_deadline = contextvars.ContextVar("reasoning_deadline", default=None)
+
+def current_deadline():
+    return _current_deadline.get()
+
+@contextmanager
+def deadline_scope(deadline):
+    """Apply a Deadline (or None for no deadline) to everything run inside the block."""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        try:
+            _current_deadline.reset(token)
+        except ValueError:
+            # A streaming response closed from another context; nothing to restore there.
+            pass
+
+def remaining_seconds(default=None):
+    """Seconds left before the current deadline, capped at default; default when there is no deadline."""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return default
+    remaining = deadline.remaining()
+    return remaining if default is None else min(default, remaining)
+
+def ensure_time_for(stage_name, min_seconds=0.0):
+    """
+    Raise DeadlineExceeded if the current deadline leaves less time than stage_name usually takes,
+    or less than min_seconds.
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return
+    remaining = deadline.remaining()
+    expected = max(stage_times.expected(stage_name), min_seconds)
+    if remaining <= 0 or remaining < expected:
+        DEADLINE_STOPS.labels(current_method(), "skipped").inc()
+        raise DeadlineExceeded(
+            f"Deadline exceeded: {remaining * 1000:.0f} ms left, {stage_name} usually takes {expected * 1000:.0f} ms"
+        )
@@ -0,0 +1,286 @@
+import os
+import json
+import math
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from model.cache import make_cache_key
+
+FAKE_LATENCY = os.getenv("FAKE_LATENCY", "lognormal:800:0.5")
+FAKE_RATE_LIMIT_PROBABILITY = float(os.getenv("FAKE_RATE_LIMIT_PROBABILITY", "0"))
+FAKE_SEED = os.getenv("FAKE_SEED", "0")
+
+class FakeRateLimitError(Exception):
+    """Injected stand-in for the API's 429 ResourceExhausted error."""
+    code = 429
+
+class FakeUsageMetadata:
+    def __init__(self, prompt_token_count, candidates_token_count, cached_content_token_count=0):
+        # Like the API, prompt_token_count includes the tokens served from a cached prefix.
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.cached_content_token_count = cached_content_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+class FakePart:
+    def __init__(self, text):
+        self.text = text
+
+class FakeContent:
+    def __init__(self, text):
+        self.parts = [FakePart(text)]
+
+class FakeCandidate:
+    def __init__(self, text):
+        self.content = FakeContent(text)
+
+class FakeResponse:
+    def __init__(self, text, prompt="", candidates=None, cached_prefix=""):
+        texts = candidates or [text]
+        self.text = texts[0]
+        self.candidates = [FakeCandidate(candidate) for candidate in texts]
+        self.usage_metadata = FakeUsageMetadata(
+            max(1, len(cached_prefix + prompt) // 4),
+            max(1, sum(len(candidate) for candidate in texts) // 4),
+            len(cached_prefix) // 4,
+        )
+
+class FakeStreamResponse:
+    """Async iterable of FakeResponse chunks, like the SDK's streaming response."""
+
+    def __init__(self, text, prompt, chunk_delay, cached_prefix=""):
+        self.text = text
+        self.prompt = prompt
+        self.chunk_delay = chunk_delay
+        self.cached_prefix = cached_prefix
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        words = self.text.split(" ")
+        for i in range(0, len(words), 4):
+            await asyncio.sleep(self.chunk_delay)
+            chunk = " ".join(words[i:i + 4]) + (" " if i + 4 < len(words) else "")
+            last = i + 4 >= len(words)
+            yield FakeResponse(chunk, self.prompt if last else "", cached_prefix=self.cached_prefix if last else "")
+
+def parse_latency_spec(spec):
+    """
+    Parse a latency distribution spec into a sampler taking a random.Random:
+    fixed:MS, uniform:MIN_MS:MAX_MS or lognormal:MEDIAN_MS:SIGMA.
+    """
+    kind, *params = spec.split(":")
+    params = [float(p) for p in params]
+    if kind == "fixed":
+        return lambda rng: params[0] / 1000
+    if kind == "uniform":
+        return lambda rng: rng.uniform(params[0], params[1]) / 1000
+    if kind == "lognormal":
+        mu = math.log(params[0])
+        return lambda rng: rng.lognormvariate(mu, params[1]) / 1000
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+def _fake_answer(prompt, rng=None):
+    # Deterministic per prompt; when sampling, the answer sometimes drifts from the usual one.
+    digest = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+    answer = str(digest % 10)
+    if rng is not None and rng.random() < 0.4:
+        answer = str(rng.randrange(10))
+    return answer
+
+def _fake_program(answer):
+    return (
+        "def solve_problem():\n"
+        "    # Fake program used for offline runs\n"
+        f"    return {answer}\n\n"
+        "print(solve_problem())"
+    )
+
+def fake_structured_text(prompt, schema, rng=None):
+    """JSON response filling each property of a response schema."""
+    answer = _fake_answer(prompt, rng)
+    values = {
+        "answer": answer,
+        "final_answer": answer,
+        "explanation": f"Working through the problem step by step gives {answer}.",
+        "verification": "I re-checked each step and the reasoning holds.",
+        "code": _fake_program(answer),
+    }
+    return json.dumps({name: values.get(name, "") for name in (schema or {}).get("properties", {})})
+
+def fake_response_text(prompt, rng=None):
+    """
+    Well-formed response for each of the services' prompt formats. Deterministic per prompt;
+    with an rng (sampling at temperature > 0) the answer sometimes drifts from the usual one.
+    """
+    answer = _fake_answer(prompt, rng)
+    if "def solve_problem" in prompt or "Python function" in prompt or "Python code" in prompt:
+        return f"```python\n{_fake_program(answer)}\n```"
+    if "FINAL VERIFIED ANSWER:" in prompt:
+        return f"I re-checked each step and the reasoning holds.\nFINAL VERIFIED ANSWER: {answer}"
+    if "ANSWER:" in prompt:
+        return (
+            f"ANSWER: {answer}\n"
+            f"EXPLANATION: Working through the problem step by step gives {answer}."
+        )
+    return (
+        "1. The problem asks for a single value.\n"
+        "2. Listing the given information.\n"
+        "3. Applying each rule in turn.\n"
+        f"4. Combining the results gives {answer}."
+    )
+
+class FakeGenerativeModel:
+    """
+    Offline stand-in for genai.GenerativeModel with configurable latency and injected 429s.
+    Latency and failures are seeded per (prompt, call number), so a run is reproducible
+    regardless of how concurrent calls interleave.
+    """
+
+    def __init__(self, model_name="gemini-1.5-pro", latency=FAKE_LATENCY,
+                 rate_limit_probability=FAKE_RATE_LIMIT_PROBABILITY, seed=FAKE_SEED):
+        self.model_name = "models/" + model_name
+        self._generation_config = {}
+        self.latency = latency
+        self._sample_latency = parse_latency_spec(latency)
+        self.rate_limit_probability = rate_limit_probability
+        self.seed = seed
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _plan(self, prompt):
+        """Return (latency_seconds, rate_limited, call_number) for the next call with this prompt."""
+        with self._lock:
+            count = self._calls.get(prompt, 0)
+            self._calls[prompt] = count + 1
+        rng = random.Random(f"{self.seed}:{count}:{prompt}")
+        return self._sample_latency(rng), rng.random() < self.rate_limit_probability, count
+
+    def _texts(self, prompt, generation_config, call_number):
+        config = generation_config or {}
+        count = int(config.get("candidate_count") or 1)
+        if config.get("response_mime_type") == "application/json":
+            generate = lambda rng: fake_structured_text(prompt, config.get("response_schema"), rng)
+        else:
+            generate = lambda rng: fake_response_text(prompt, rng)
+        if not config.get("temperature"):
+            return [generate(None)] * count
+        # Sampling: seeded per call so every call and candidate differs, reproducibly.
+        rng = random.Random(f"{self.seed}:sample:{call_number}:{prompt}")
+        return [generate(rng) for _ in range(count)]
+
+    def generate_content(self, prompt, stream=False, generation_config=None, cached_prefix="", **kwargs):
+        # A call through a cached prefix answers the whole prompt but only bills the prefix as cached.
+        full_prompt = cached_prefix + prompt
+        latency, rate_limited, call_number = self._plan(full_prompt)
+        time.sleep(latency)
+        if rate_limited:
+            raise FakeRateLimitError("429 Resource has been exhausted (injected by fake backend)")
+        texts = self._texts(full_prompt, generation_config, call_number)
+        return FakeResponse(texts[0], prompt, texts, cached_prefix)
+
+    async def generate_content_async(self, prompt, stream=False, generation_config=None, cached_prefix="", **kwargs):
+        full_prompt = cached_prefix + prompt
+        latency, rate_limited, call_number = self._plan(full_prompt)
+        texts = self._texts(full_prompt, generation_config, call_number)
+        text = texts[0]
+        if stream:
+            # Time to first chunk is a fifth of the total latency.
+            await asyncio.sleep(latency / 5)
+            if rate_limited:
+                raise FakeRateLimitError("429 Resource has been exhausted (injected by fake backend)")
+            chunks = max(1, len(text.split(" ")) // 4)
+            return FakeStreamResponse(text, prompt, latency * 0.8 / chunks, cached_prefix)
+        await asyncio.sleep(latency)
+        if rate_limited:
+            raise FakeRateLimitError("429 Resource has been exhausted (injected by fake backend)")
+        return FakeResponse(text, prompt, texts, cached_prefix)
+
+    def with_cached_prefix(self, prefix):
+        """Local stand-in for a model created from the API's cached content."""
+        return FakeCachedModel(self, prefix)
+
+class FakeCachedModel:
+    """A FakeGenerativeModel bound to a cached prompt prefix; calls send only the rest of the prompt."""
+
+    def __init__(self, model, prefix):
+        self.model = model
+        self.prefix = prefix
+        self.model_name = model.model_name
+        self._generation_config = model._generation_config
+
+    def generate_content(self, prompt, **kwargs):
+        return self.model.generate_content(prompt, cached_prefix=self.prefix, **kwargs)
+
+    async def generate_content_async(self, prompt, **kwargs):
+        return await self.model.generate_content_async(prompt, cached_prefix=self.prefix, **kwargs)
+
+class CassetteModel:
+    """
+    Record/replay wrapper around a generative model.
+    In "record" mode every response from the wrapped model is appended to a JSONL cassette;
+    in "replay" mode responses are served from the cassette only and unknown prompts fail.
+    """
+
+    def __init__(self, path, mode="replay", model=None, model_name="gemini-1.5-pro"):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        if mode == "record" and model is None:
+            raise ValueError("Recording needs a model to record from")
+        self.path = path
+        self.mode = mode
+        self.inner = model
+        self.model_name = getattr(model, "model_name", "models/" + model_name)
+        self._generation_config = getattr(model, "_generation_config", {})
+        self._lock = threading.Lock()
+        self._responses = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._responses[entry["key"]] = entry.get("texts") or [entry["text"]]
+
+    def _key(self, prompt, generation_config=None):
+        config = {**(self._generation_config or {}), **(generation_config or {})}
+        return make_cache_key(self.model_name, config, prompt)
+
+    def _record(self, prompt, response, generation_config=None):
+        from model.gemini import candidate_texts
+        texts = candidate_texts(response)
+        entry = {"key": self._key(prompt, generation_config), "prompt": prompt, "text": texts[0]}
+        if len(texts) > 1:
+            entry["texts"] = texts
+        with self._lock:
+            self._responses[entry["key"]] = texts
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _replay(self, prompt, generation_config=None):
+        texts = self._responses.get(self._key(prompt, generation_config))
+        if texts is None:
+            raise KeyError(f"No recorded response in {self.path} for prompt: {prompt[:80]!r}")
+        return FakeResponse(texts[0], prompt, texts)
+
+    def generate_content(self, prompt, stream=False, generation_config=None, **kwargs):
+        if self.mode == "replay":
+            return self._replay(prompt, generation_config)
+        if generation_config:
+            kwargs["generation_config"] = generation_config
+        response = self.inner.generate_content(prompt, **kwargs)
+        self._record(prompt, response, generation_config)
+        return response
+
+    async def generate_content_async(self, prompt, stream=False, generation_config=None, **kwargs):
+        if self.mode == "replay":
+            response = self._replay(prompt, generation_config)
+            return FakeStreamResponse(response.text, prompt, 0) if stream else response
+        if generation_config:
+            kwargs["generation_config"] = generation_config
+        response = await self.inner.generate_content_async(prompt, **kwargs)
+        self._record(prompt, response, generation_config)
+        return FakeStreamResponse(response.text, prompt, 0) if stream else response
@@ -1,37 +1,503 @@
 import os
+import json
 import time
-import google.generativeai as genai
+import asyncio
+import threading
 from dotenv import load_dotenv
+from model.cache import CachedResponse, make_cache_key, get_response_cache
+from model.context_cache import get_context_cache
+from model.deadline import DeadlineExceeded, stage_times, ensure_time_for, remaining_seconds
+from model.hedging import get_hedge_policy
+from telemetry.tracing import stage, record_usage, map_in_threads, current_method, DEADLINE_STOPS
+from model.rate_limiter import (
+    get_rate_limiter, is_rate_limit_error, parse_retry_after, backoff_delay,
+    estimate_tokens, response_tokens,
+)
 
 # Load environment variables
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-1.5-pro")
+# live (default), fake (offline, synthetic responses), record or replay (JSONL cassette)
+GEMINI_BACKEND = os.getenv("GEMINI_BACKEND", "live").lower()
+GEMINI_CASSETTE = os.getenv("GEMINI_CASSETTE", "gemini_cassette.jsonl")
+# Temperature used when drawing several samples for the same prompt (self-consistency).
+GEMINI_SAMPLING_TEMPERATURE = float(os.getenv("GEMINI_SAMPLING_TEMPERATURE", "0.7"))
+
+def candidate_texts(response):
+    """Text of every candidate in a response (a single-candidate response gives a one-item list)."""
+    texts = []
+    for candidate in getattr(response, "candidates", None) or []:
+        parts = getattr(getattr(candidate, "content", None), "parts", None) or []
+        text = "".join(getattr(part, "text", "") for part in parts)
+        if text:
+            texts.append(text)
+    if not texts:
+        texts.append(response.text)
+    return texts
 
 class GeminiModelWrapper:
-    def __init__(self, model):
+    def __init__(self, model, cache=None, rate_limiter=None, context_cache=None, hedging=None):
         self.model = model
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.context_cache = context_cache
+        # HedgePolicy for the async client; the synchronous path does not hedge.
+        self.hedging = hedging
+        # Cleared the first time the model rejects candidate_count > 1.
+        self.candidate_count_supported = True
 
-    def generate_content(self, prompt, max_retries=3, delay=10):
-        """Generate content with retries if a rate-limit error is encountered."""
+    def generate_content(self, prompt, max_retries=5, delay=2, use_cache=True, generation_config=None):
+        """
+        Generate content with retries if a rate-limit error is encountered.
+        Identical (model, generation config, prompt) requests are served from the response
+        cache unless use_cache is False. Calls are paced by the shared rate limiter and
+        rate-limit errors are retried with exponential backoff (delay is the base, in seconds).
+        generation_config overrides the model's settings for this call only. A prompt rendered
+        from a template sends its static prefix through the context cache. Under a request
+        deadline (model/deadline.py), a call or retry that cannot finish in time is not started.
+        """
+        key = self._cache_key(prompt, generation_config) if use_cache else None
+        cached = self._cache_lookup(key)
+        if cached is not None:
+            return cached
+        model, contents = self._bind_context(prompt)
+        stage_name = self._deadline_stage(prompt)
         attempts = 0
-        while attempts < max_retries:
+        while True:
+            estimated = estimate_tokens(contents)
+            if self.rate_limiter is not None:
+                with stage("rate_limit_wait"):
+                    self.rate_limiter.acquire(estimated)
+            ensure_time_for(stage_name)
             try:
-                return self.model.generate_content(prompt)
+                start = time.perf_counter()
+                with stage("model_call"):
+                    response = model.generate_content(contents, **self._call_kwargs(generation_config))
             except Exception as e:
-                error_msg = str(e).lower()
-                # Check for common rate-limit error indicators
-                if "429" in error_msg or "resource" in error_msg:
-                    attempts += 1
-                    print(f"Rate limit encountered (attempt {attempts}/{max_retries}). Retrying in {delay} seconds...")
-                    time.sleep(delay)
-                else:
-                    raise e
-        raise Exception("Max retries reached due to rate limiting.")
+                attempts += 1
+                wait = self._handle_error(e, attempts, max_retries, delay)
+                if wait:
+                    self._ensure_backoff_fits(wait)
+                    with stage("retry_backoff"):
+                        time.sleep(wait)
+                continue
+            stage_times.record(stage_name, time.perf_counter() - start)
+            self._record_success(estimated, response)
+            self._cache_store(key, response)
+            return response
 
-def init_gemini_model():
+    def generate_candidates(self, prompt, count, temperature=GEMINI_SAMPLING_TEMPERATURE,
+                            max_retries=5, delay=2, use_cache=True, generation_config=None):
+        """
+        Return count sampled completions (texts) for one prompt.
+        All of them are requested in a single call with candidate_count; if the model rejects
+        that or returns fewer candidates, the rest are requested as concurrent single calls.
+        The whole sample set is cached as one entry. generation_config adds settings such as
+        a JSON response schema to every sampling call.
+        """
+        key = self._cache_key(prompt, self._sampling_config(count, temperature, generation_config)) if use_cache else None
+        cached = self._cache_lookup_texts(key)
+        if cached is not None:
+            return cached
+        texts = []
+        if count > 1 and self.candidate_count_supported:
+            try:
+                response = self.generate_content(
+                    prompt, max_retries, delay, use_cache=False,
+                    generation_config=self._sampling_config(count, temperature, generation_config),
+                )
+                texts = candidate_texts(response)[:count]
+            except Exception as e:
+                self._disable_candidate_count(e)
+        single = {**(generation_config or {}), "temperature": temperature}
+        texts += map_in_threads(
+            lambda _: self.generate_content(prompt, max_retries, delay, use_cache=False, generation_config=single).text,
+            range(count - len(texts)),
+        )
+        self._cache_store_texts(key, texts)
+        return texts
+
+    def _sampling_config(self, count, temperature, generation_config=None):
+        return {**(generation_config or {}), "candidate_count": count, "temperature": temperature}
+
+    def _disable_candidate_count(self, error):
+        """Fall back to separate calls for good if the model rejected candidate_count; re-raise any other error."""
+        if not is_candidate_count_rejection(error):
+            raise error
+        print(f"Model did not accept candidate_count ({error}); sampling with separate calls instead.")
+        self.candidate_count_supported = False
+
+    def _bind_context(self, prompt):
+        """
+        Return (model, contents) for a call. For a templated prompt whose prefix is cached, that is
+        the model bound to the cached prefix and just the per-call text; otherwise the full prompt.
+        """
+        prefix = getattr(prompt, "prefix", None)
+        if prefix and self.context_cache is not None:
+            model = self.context_cache.model_for(self.model, prefix, prompt.prefix_digest)
+            if model is not None:
+                return model, prompt.text
+        return self.model, str(prompt)
+
+    async def _bind_context_async(self, prompt):
+        """_bind_context for the event loop: caching a new prefix happens in a worker thread."""
+        prefix = getattr(prompt, "prefix", None)
+        if prefix and self.context_cache is not None:
+            model = await self.context_cache.model_for_async(self.model, prefix, prompt.prefix_digest)
+            if model is not None:
+                return model, prompt.text
+        return self.model, str(prompt)
+
+    def _deadline_stage(self, prompt):
+        """Name a call's duration is tracked under for deadline checks: its prompt template, if it has one."""
+        return getattr(prompt, "template_id", "model_call")
+
+    def _ensure_backoff_fits(self, wait):
+        remaining = remaining_seconds()
+        if remaining is not None and wait >= remaining:
+            raise DeadlineExceeded(f"Deadline exceeded: retrying in {wait:.1f}s would not finish in time")
+
+    def _call_kwargs(self, generation_config):
+        return {"generation_config": generation_config} if generation_config else {}
+
+    def _handle_error(self, error, attempts, max_retries, delay):
+        """
+        Decide how to retry a failed call. Non rate-limit errors are re-raised.
+        Returns how long this caller should sleep; with a shared limiter the pause is
+        applied to every caller through the limiter instead.
+        """
+        if not is_rate_limit_error(error):
+            raise error
+        if attempts >= max_retries:
+            raise Exception("Max retries reached due to rate limiting.")
+        wait = backoff_delay(attempts, base_delay=delay, retry_after=parse_retry_after(error))
+        print(f"Rate limit encountered (attempt {attempts}/{max_retries}). Retrying in {wait:.1f} seconds...")
+        if self.rate_limiter is not None:
+            self.rate_limiter.record_rate_limited(wait)
+            return 0
+        return wait
+
+    def _record_success(self, estimated, response):
+        record_usage(response)
+        if self.rate_limiter is not None:
+            self.rate_limiter.record_success(estimated, response_tokens(response))
+
+    def cache_stats(self):
+        return self.cache.stats() if self.cache is not None else None
+
+    def _cache_key(self, prompt, generation_config=None):
+        if self.cache is None:
+            return None
+        model_name = getattr(self.model, "model_name", None)
+        config = getattr(self.model, "_generation_config", None)
+        if generation_config:
+            config = {**(config or {}), **generation_config}
+        return make_cache_key(model_name, config, prompt)
+
+    def _cache_lookup(self, key):
+        if key is None:
+            return None
+        text = self.cache.get(key)
+        return CachedResponse(text) if text is not None else None
+
+    async def _cache_get_async(self, key):
+        """Cache lookup for the event loop: memory hits inline, the disk tier in a worker thread."""
+        if key is None:
+            return None
+        text = self.cache.get_memory(key)
+        if text is None:
+            text = await asyncio.to_thread(self.cache.get, key)
+        return text
+
+    def _cache_lookup_texts(self, key):
+        if key is None:
+            return None
+        text = self.cache.get(key)
+        return json.loads(text) if text is not None else None
+
+    def _cache_store_texts(self, key, texts):
+        if key is not None and texts and all(texts):
+            self.cache.set(key, json.dumps(texts))
+
+    def _cache_store(self, key, response):
+        text = self._cacheable_text(key, response)
+        if text:
+            self.cache.set(key, text)
+
+    def _cacheable_text(self, key, response):
+        if key is None:
+            return None
+        try:
+            return response.text
+        except Exception:
+            # Blocked or empty responses have no text; never cache them.
+            return None
+
+class AsyncGeminiModelWrapper(GeminiModelWrapper):
+    """
+    GeminiModelWrapper with an awaitable generation path for use inside the API's event loop.
+    The synchronous generate_content is still available for the evaluator scripts.
+    """
+
+    async def generate_content_async(self, prompt, max_retries=5, delay=2, use_cache=True, generation_config=None):
+        """
+        Generate content without blocking the event loop, retrying on rate-limit errors.
+        Under a request deadline, the rate-limit wait and the model call are cancelled when it passes.
+        """
+        key = self._cache_key(prompt, generation_config) if use_cache else None
+        text = await self._cache_get_async(key)
+        if text is not None:
+            return CachedResponse(text)
+        model, contents = await self._bind_context_async(prompt)
+        stage_name = self._deadline_stage(prompt)
+        attempts = 0
+        while True:
+            estimated = estimate_tokens(contents)
+            if self.rate_limiter is not None:
+                with stage("rate_limit_wait"):
+                    await self._within_deadline(self.rate_limiter.acquire_async(estimated))
+            ensure_time_for(stage_name)
+            try:
+                start = time.perf_counter()
+                with stage("model_call"):
+                    response = await self._within_deadline(
+                        self._hedged_call(model, contents, generation_config, stage_name, estimated)
+                    )
+            except Exception as e:
+                attempts += 1
+                wait = self._handle_error(e, attempts, max_retries, delay)
+                if wait:
+                    self._ensure_backoff_fits(wait)
+                    with stage("retry_backoff"):
+                        await asyncio.sleep(wait)
+                continue
+            stage_times.record(stage_name, time.perf_counter() - start)
+            self._record_success(estimated, response)
+            await self._cache_store_async(key, response)
+            return response
+
+    async def _cache_store_async(self, key, response):
+        text = self._cacheable_text(key, response)
+        if text:
+            await asyncio.to_thread(self.cache.set, key, text)
+
+    async def _hedged_call(self, model, contents, generation_config, stage_name, estimated):
+        """
+        Make one model call. With hedging on, a call still running past the usual latency of its
+        method and prompt starts a duplicate (within the hedge budget and the rate limit); the
+        first successful response wins and the other call is cancelled.
+        """
+        call = lambda: model.generate_content_async(contents, **self._call_kwargs(generation_config))
+        if self.hedging is None:
+            return await call()
+        method = current_method()
+        kind = (method, stage_name)
+        delay = self.hedging.hedge_delay(kind)
+        start = time.perf_counter()
+        primary = asyncio.ensure_future(call())
+        try:
+            if delay is not None:
+                await asyncio.wait({primary}, timeout=delay)
+            if delay is None or primary.done() or not self.hedging.try_hedge(method, self.rate_limiter, estimated):
+                response = await primary
+                self.hedging.record(kind, time.perf_counter() - start)
+                return response
+            hedge = asyncio.ensure_future(call())
+            try:
+                response, winner = await first_success([primary, hedge])
+            finally:
+                cancel_tasks([hedge])
+            if winner is hedge:
+                self.hedging.record_win(method)
+            # When the hedge wins this is a lower bound on the original call's latency.
+            self.hedging.record(kind, time.perf_counter() - start)
+            return response
+        finally:
+            cancel_tasks([primary])
+
+    async def _within_deadline(self, awaitable):
+        """Await under the current deadline, cancelling the awaitable when it passes."""
+        timeout = remaining_seconds()
+        if timeout is None:
+            return await awaitable
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            DEADLINE_STOPS.labels(current_method(), "cancelled").inc()
+            raise DeadlineExceeded("Deadline exceeded while waiting for the model")
+
+    async def _chunks_within_deadline(self, response):
+        """Iterate a streaming response, giving up on the next chunk when the deadline passes."""
+        chunks = response.__aiter__()
+        while True:
+            try:
+                chunk = await self._within_deadline(chunks.__anext__())
+            except StopAsyncIteration:
+                return
+            yield chunk
+
+    async def generate_candidates_async(self, prompt, count, temperature=GEMINI_SAMPLING_TEMPERATURE,
+                                        max_retries=5, delay=2, use_cache=True, generation_config=None):
+        """Async version of generate_candidates; fallback samples are requested concurrently."""
+        key = self._cache_key(prompt, self._sampling_config(count, temperature, generation_config)) if use_cache else None
+        cached = await self._cache_get_async(key)
+        if cached is not None:
+            return json.loads(cached)
+        texts = []
+        if count > 1 and self.candidate_count_supported:
+            try:
+                response = await self.generate_content_async(
+                    prompt, max_retries, delay, use_cache=False,
+                    generation_config=self._sampling_config(count, temperature, generation_config),
+                )
+                texts = candidate_texts(response)[:count]
+            except Exception as e:
+                self._disable_candidate_count(e)
+        single = {**(generation_config or {}), "temperature": temperature}
+        responses = await asyncio.gather(*(
+            self.generate_content_async(prompt, max_retries, delay, use_cache=False, generation_config=single)
+            for _ in range(count - len(texts))
+        ))
+        texts += [response.text for response in responses]
+        if key is not None and texts and all(texts):
+            await asyncio.to_thread(self.cache.set, key, json.dumps(texts))
+        return texts
+
+    async def stream_content_async(self, prompt, max_retries=5, delay=2, use_cache=True):
+        """
+        Async generator that yields response text chunks as the model produces them.
+        A cached response is yielded as a single chunk. Rate-limit errors are retried only
+        before the first chunk has been yielded. Under a request deadline, the rate-limit wait,
+        the call and each wait for a chunk are cancelled when it passes.
+        """
+        key = self._cache_key(prompt) if use_cache else None
+        cached = await self._cache_get_async(key)
+        if cached is not None:
+            yield cached
+            return
+        model, contents = await self._bind_context_async(prompt)
+        stage_name = self._deadline_stage(prompt)
+        attempts = 0
+        while True:
+            estimated = estimate_tokens(contents)
+            if self.rate_limiter is not None:
+                with stage("rate_limit_wait"):
+                    await self._within_deadline(self.rate_limiter.acquire_async(estimated))
+            ensure_time_for(stage_name)
+            chunks = []
+            last_chunk = None
+            try:
+                start = time.perf_counter()
+                with stage("model_call"):
+                    response = await self._within_deadline(model.generate_content_async(contents, stream=True))
+                    async for chunk in self._chunks_within_deadline(response):
+                        last_chunk = chunk
+                        if chunk.text:
+                            chunks.append(chunk.text)
+                            yield chunk.text
+            except Exception as e:
+                if chunks:
+                    raise
+                attempts += 1
+                wait = self._handle_error(e, attempts, max_retries, delay)
+                if wait:
+                    self._ensure_backoff_fits(wait)
+                    with stage("retry_backoff"):
+                        await asyncio.sleep(wait)
+                continue
+            stage_times.record(stage_name, time.perf_counter() - start)
+            # Usage metadata arrives with the final chunk.
+            self._record_success(estimated, last_chunk)
+            if key is not None and chunks:
+                await asyncio.to_thread(self.cache.set, key, "".join(chunks))
+            return
+
+def is_candidate_count_rejection(error):
+    """True for an invalid-argument error about candidate_count, as opposed to a transient or deadline failure."""
+    message = str(error).lower()
+    if "candidate_count" not in message and "candidatecount" not in message:
+        return False
+    invalid_argument = type(error).__name__ in ("InvalidArgument", "BadRequest", "ValueError", "TypeError")
+    return invalid_argument or "invalid argument" in message or message.startswith("400")
+
+def cancel_tasks(tasks):
+    """Cancel tasks still running; the error of one that already failed is retrieved, so it is not logged."""
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled():
+            task.exception()
+
+async def first_success(tasks):
     """
-    Configure the Gemini API and return a GeminiModelWrapper instance.
+    Wait for the first of several tasks to succeed and return (result, task).
+    If they all fail, the first task's error is raised. Tasks still running are left to the caller.
     """
+    pending = set(tasks)
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if not task.cancelled() and task.exception() is None:
+                return task.result(), task
+    return tasks[0].result(), tasks[0]
+
+def create_generative_model(backend=None):
+    """
+    Build the underlying model for the configured backend:
+    "live" talks to the Gemini API, "fake" returns synthetic responses offline,
+    "record" calls the API and saves responses to the cassette, "replay" serves them back.
+    """
+    backend = (backend or GEMINI_BACKEND).lower()
+    if backend == "fake":
+        from model.fake import FakeGenerativeModel
+        return FakeGenerativeModel(GEMINI_MODEL_NAME)
+    if backend == "replay":
+        from model.fake import CassetteModel
+        return CassetteModel(GEMINI_CASSETTE, mode="replay", model_name=GEMINI_MODEL_NAME)
+    if backend not in ("live", "record"):
+        raise ValueError(f"Unknown GEMINI_BACKEND: {backend}")
+    # Imported here: the SDK takes about half a second to import and offline backends never need it.
+    import google.generativeai as genai
     genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel('gemini-1.5-pro')
-    return GeminiModelWrapper(model)
+    model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+    if backend == "record":
+        from model.fake import CassetteModel
+        return CassetteModel(GEMINI_CASSETTE, mode="record", model=model)
+    return model
+
+_model_clients = {}
+_model_clients_lock = threading.Lock()
+
+def get_model_client(backend=None, async_client=True):
+    """
+    Return the process-wide model wrapper for a backend, creating it on first use.
+    Every service shares one client, so the SDK is configured once and the response cache,
+    context cache, rate limiter, hedge policy and candidate_count support are shared too.
+    """
+    backend = (backend or GEMINI_BACKEND).lower()
+    wrapper_class = AsyncGeminiModelWrapper if async_client else GeminiModelWrapper
+    with _model_clients_lock:
+        client = _model_clients.get((backend, async_client))
+        if client is None:
+            client = wrapper_class(
+                create_generative_model(backend),
+                cache=get_response_cache(),
+                rate_limiter=get_rate_limiter(),
+                context_cache=get_context_cache(),
+                hedging=get_hedge_policy() if async_client else None,
+            )
+            _model_clients[(backend, async_client)] = client
+        return client
+
+def init_gemini_model():
+    """
+    Return the shared GeminiModelWrapper, configuring the Gemini API on first use.
+    """
+    return get_model_client(async_client=False)
+
+def init_async_gemini_model():
+    """
+    Return the shared AsyncGeminiModelWrapper, configuring the Gemini API on first use.
+    """
+    return get_model_client()
@@ -0,0 +1,101 @@
+import os
+import threading
+from collections import deque
+from telemetry.tracing import HEDGED_CALLS
+
+# Hedged requests: when a model call is slower than most recent calls of its kind, a duplicate
+# is started and whichever answers first wins. Off unless GEMINI_HEDGING=1.
+HEDGING_ENABLED = os.getenv("GEMINI_HEDGING", "").lower() in ("1", "true", "yes")
+# Percentile of recent latencies after which a duplicate call is started.
+HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "90"))
+# Extra calls allowed, as a fraction of all calls (0.05 = at most 5% more calls).
+HEDGE_BUDGET = float(os.getenv("GEMINI_HEDGE_BUDGET", "0.05"))
+# Calls of a kind that must have finished before that kind is hedged.
+HEDGE_MIN_SAMPLES = int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WINDOW = int(os.getenv("GEMINI_HEDGE_WINDOW", "200"))
+# Cap on unspent budget carried over, so a quiet period cannot fund a burst of hedges.
+MAX_HEDGE_CREDITS = 10.0
+
+class HedgePolicy:
+    """
+    Decides when a model call gets a duplicate. Each kind of call (method and prompt template)
+    keeps a rolling window of its latencies; once a call has run past their percentile, it may
+    be hedged if the budget has a credit left. Every call adds `budget` credits and a hedge
+    costs one, so hedges stay within that fraction of all calls.
+    """
+
+    def __init__(self, percentile=HEDGE_PERCENTILE, budget=HEDGE_BUDGET,
+                 min_samples=HEDGE_MIN_SAMPLES, window=HEDGE_WINDOW):
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.window = window
+        self._latencies = {}
+        self._credits = 0.0
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedges = 0
+        self.wins = 0
+
+    def hedge_delay(self, kind):
+        """Seconds after which a call of this kind should be hedged, or None while there is too little history."""
+        with self._lock:
+            self.calls += 1
+            self._credits = min(MAX_HEDGE_CREDITS, self._credits + self.budget)
+            latencies = self._latencies.get(kind)
+            if latencies is None or len(latencies) < self.min_samples:
+                return None
+            ordered = sorted(latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))]
+
+    def record(self, kind, seconds):
+        with self._lock:
+            latencies = self._latencies.get(kind)
+            if latencies is None:
+                latencies = self._latencies[kind] = deque(maxlen=self.window)
+            latencies.append(seconds)
+
+    def try_hedge(self, method, rate_limiter=None, tokens=1):
+        """
+        Take a budget credit and a rate-limit slot for a duplicate call. Returns False, without
+        spending anything, if either is not available right now: a hedge never waits.
+        """
+        with self._lock:
+            if self._credits < 1:
+                HEDGED_CALLS.labels(method, "over_budget").inc()
+                return False
+            if rate_limiter is not None and not rate_limiter.try_reserve(tokens):
+                HEDGED_CALLS.labels(method, "rate_limited").inc()
+                return False
+            self._credits -= 1
+            self.hedges += 1
+        HEDGED_CALLS.labels(method, "started").inc()
+        return True
+
+    def record_win(self, method):
+        """The duplicate answered before the original call."""
+        with self._lock:
+            self.wins += 1
+        HEDGED_CALLS.labels(method, "won").inc()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hedges": self.hedges,
+                "wins": self.wins,
+                "hedge_rate": self.hedges / self.calls if self.calls else 0.0,
+            }
+
+_hedge_policy = None
+_hedge_policy_lock = threading.Lock()
+
+def get_hedge_policy():
+    """Return the process-wide HedgePolicy, or None when hedging is off."""
+    global _hedge_policy
+    if not HEDGING_ENABLED:
+        return None
+    with _hedge_policy_lock:
+        if _hedge_policy is None:
+            _hedge_policy = HedgePolicy()
+        return _hedge_policy
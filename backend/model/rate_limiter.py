@@ -0,0 +1,185 @@
+import os
+import re
+import time
+import asyncio
+import random
+import threading
+
+REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+TOKENS_PER_MINUTE = float(os.getenv("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+MAX_BACKOFF_SECONDS = float(os.getenv("GEMINI_MAX_BACKOFF_SECONDS", "60"))
+
+_RETRY_AFTER_PATTERNS = [
+    re.compile(r"retry in ([\d.]+)\s*s", re.IGNORECASE),
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE),
+    re.compile(r"retry-after:?\s*([\d.]+)", re.IGNORECASE),
+]
+
+def is_rate_limit_error(error):
+    """True if the exception looks like a 429 / quota error from the Gemini API."""
+    if getattr(error, "code", None) == 429:
+        return True
+    error_msg = str(error).lower()
+    return "429" in error_msg or "resource" in error_msg or "quota" in error_msg
+
+def parse_retry_after(error):
+    """Extract a server-provided retry delay in seconds from an exception, if any."""
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is not None:
+        try:
+            return float(retry_after)
+        except (TypeError, ValueError):
+            pass
+    message = str(error)
+    for pattern in _RETRY_AFTER_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return float(match.group(1))
+    return None
+
+def backoff_delay(attempt, base_delay=1.0, retry_after=None, max_delay=MAX_BACKOFF_SECONDS):
+    """
+    Exponential backoff with full jitter for the given 1-based attempt number.
+    A retry-after hint from the server is used as the lower bound.
+    """
+    ceiling = min(max_delay, base_delay * (2 ** (attempt - 1)))
+    delay = random.uniform(0, ceiling)
+    if retry_after is not None:
+        return max(delay, retry_after)
+    return delay
+
+def estimate_tokens(prompt):
+    """Cheap input token estimate (~4 characters per token) used to reserve TPM budget."""
+    return max(1, len(str(prompt)) // 4)
+
+def response_tokens(response):
+    """Total tokens reported in a response's usage metadata, or None if unavailable."""
+    usage = getattr(response, "usage_metadata", None)
+    total = getattr(usage, "total_token_count", None) if usage is not None else None
+    return total or None
+
+class _Bucket:
+    """Token bucket that may go negative; the deficit is how long later callers must wait."""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def reserve(self, amount, rate_per_minute, now):
+        if rate_per_minute <= 0:
+            return 0.0
+        rate = rate_per_minute / 60.0
+        self.level = min(self.capacity, self.level + (now - self.updated) * rate)
+        self.updated = now
+        self.level -= amount
+        return 0.0 if self.level >= 0 else -self.level / rate
+
+    def refund(self, amount):
+        self.level = min(self.capacity, self.level + amount)
+
+class RateLimiter:
+    """
+    Process-wide pacing for Gemini calls with requests-per-minute and tokens-per-minute budgets.
+
+    Callers reserve capacity before each call and sleep for the returned wait time, so
+    concurrent callers queue up in arrival order instead of bursting into a 429. When a 429
+    does happen, every caller is paused for the backoff period and the effective request
+    rate is cut, then recovers gradually as calls succeed.
+    """
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.effective_rpm = requests_per_minute
+        self._requests = _Bucket(requests_per_minute)
+        self._tokens = _Bucket(tokens_per_minute)
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.rate_limited_count = 0
+        self.total_wait_seconds = 0.0
+
+    def reserve(self, tokens=1):
+        """Reserve budget for one call and return how many seconds the caller must wait first."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(
+                self._requests.reserve(1, self.effective_rpm, now),
+                self._tokens.reserve(tokens, self.tokens_per_minute, now),
+                self._paused_until - now,
+                0.0,
+            )
+            self.total_wait_seconds += wait
+            return wait
+
+    def try_reserve(self, tokens=1):
+        """
+        Reserve budget for one call only if it is available right now, without queueing behind
+        other callers. Returns whether it was reserved. Used for optional calls such as hedges.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._paused_until > now:
+                return False
+            request_wait = self._requests.reserve(1, self.effective_rpm, now)
+            token_wait = self._tokens.reserve(tokens, self.tokens_per_minute, now)
+            if request_wait <= 0 and token_wait <= 0:
+                return True
+            if self.effective_rpm > 0:
+                self._requests.refund(1)
+            if self.tokens_per_minute > 0:
+                self._tokens.refund(tokens)
+            return False
+
+    def acquire(self, tokens=1):
+        """Blocking acquire for synchronous callers."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens=1):
+        """Non-blocking acquire for callers on an event loop."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def record_success(self, estimated_tokens, actual_tokens=None):
+        """Settle the token reservation against real usage and let the request rate recover."""
+        with self._lock:
+            if actual_tokens is not None:
+                self._tokens.refund(estimated_tokens - actual_tokens)
+            if self.requests_per_minute > 0 and self.effective_rpm < self.requests_per_minute:
+                self.effective_rpm = min(
+                    self.requests_per_minute, self.effective_rpm + max(1.0, self.requests_per_minute / 50)
+                )
+
+    def record_rate_limited(self, pause_seconds):
+        """Pause all callers for pause_seconds and cut the effective request rate."""
+        with self._lock:
+            self.rate_limited_count += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + pause_seconds)
+            if self.requests_per_minute > 0:
+                self.effective_rpm = max(1.0, self.effective_rpm * 0.7)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests_per_minute": self.requests_per_minute,
+                "effective_requests_per_minute": self.effective_rpm,
+                "tokens_per_minute": self.tokens_per_minute,
+                "rate_limited_count": self.rate_limited_count,
+                "total_wait_seconds": self.total_wait_seconds,
+            }
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter():
+    """Return the RateLimiter shared by every model wrapper in this process."""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter()
+        return _rate_limiter
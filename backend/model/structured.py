@@ -0,0 +1,52 @@
+import os
+import json
+from telemetry.tracing import PARSE_FAILURES, current_method
+
+# Ask the model for schema-constrained JSON instead of free text that has to be scraped.
+STRUCTURED_OUTPUT = os.getenv("GEMINI_STRUCTURED_OUTPUT", "").lower() in ("1", "true", "yes")
+
+ANSWER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "answer": {"type": "string", "description": "Just the final answer, e.g. 'Yes', 'No' or a number"},
+        "explanation": {"type": "string", "description": "Step-by-step explanation of how to arrive at the answer"},
+    },
+    "required": ["answer", "explanation"],
+}
+
+VERIFICATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "verification": {"type": "string", "description": "Check of each step of the solution"},
+        "final_answer": {"type": "string", "description": "Just the final verified answer"},
+    },
+    "required": ["verification", "final_answer"],
+}
+
+PROGRAM_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "code": {"type": "string", "description": "Complete Python program, without markdown fences"},
+    },
+    "required": ["code"],
+}
+
+class StructuredOutputError(ValueError):
+    """A JSON-mode response that is not valid JSON or lacks a required field."""
+
+def json_generation_config(schema):
+    """Generation config for a response constrained to the given schema."""
+    return {"response_mime_type": "application/json", "response_schema": schema}
+
+def parse_structured(text, schema):
+    """Parse a schema-constrained response into a dict with every required field as a string."""
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        PARSE_FAILURES.labels(current_method(), "json").inc()
+        raise StructuredOutputError(f"Response is not valid JSON: {e}") from e
+    missing = [field for field in schema.get("required", []) if not isinstance(data, dict) or field not in data]
+    if missing:
+        PARSE_FAILURES.labels(current_method(), "json").inc()
+        raise StructuredOutputError(f"Response is missing {', '.join(missing)}")
+    return {field: str(value) for field, value in data.items()}
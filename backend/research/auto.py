@@ -0,0 +1,171 @@
+import sys
+import os
+import re
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from research.simple_prompt import SimplePromptReasoningService
+from research.cot_prompt_verification import CotAndVerificationReasoningService
+from research.pal import PalReasoningService
+from telemetry.tracing import traced, current_trace
+from evaluator.grading import answers_match, normalize_answer
+
+# Problems that look like arithmetic or counting start at program-aided, which gets those right
+# for about the price of the simple prompt.
+NUMERIC_PROBLEM_RE = re.compile(
+    r"\d|\bhow (?:many|much|long|old|far)\b|\bcount\b|\bcalculate\b|\bcompute\b|\bsum\b|\btotal\b"
+    r"|\baverage\b|\bpercent(?:age)?\b|\bprobability\b",
+    re.IGNORECASE,
+)
+LOW_CONFIDENCE_RE = re.compile(
+    r"\bnot (?:entirely |completely )?(?:sure|certain)\b|\buncertain\b|\bunclear\b|\bambiguous\b"
+    r"|\bcannot (?:be )?determine|\bcan't (?:be )?determine|\bimpossible to (?:say|tell|know)\b"
+    r"|\bi think\b|\bprobably\b|\bpossibly\b|\bmight be\b|\bit depends\b|\binsufficient information\b",
+    re.IGNORECASE,
+)
+
+class AutoReasoningService:
+    """
+    Cascade over the three reasoning services that only pays for the expensive ones when needed.
+
+    A problem starts at the cheapest suitable tier: program-aided for numeric or counting
+    problems, the simple prompt otherwise. It escalates to CoT with verification when the
+    first answer fails to parse, errors, or is worded with low confidence. If two tiers then
+    disagree, the remaining service breaks the tie and the majority answer wins.
+    """
+
+    def __init__(self, simple_service=None, cot_service=None, pal_service=None):
+        self.tiers = {
+            "simple": (simple_service or SimplePromptReasoningService(),
+                       "evaluate_reasoning_with_explanation"),
+            "cot-verification": (cot_service or CotAndVerificationReasoningService(),
+                                 "evaluate_with_cot_and_verification"),
+            "program-aided": (pal_service or PalReasoningService(),
+                              "evaluate_with_program_aided"),
+        }
+
+    def evaluate_auto(self, statement, ground_answer=None):
+        """Evaluator entry point: (answer, explanation, is_correct) with the route in the explanation."""
+        return self._as_result(self.route(statement), ground_answer)
+
+    async def evaluate_auto_async(self, statement, ground_answer=None):
+        return self._as_result(await self.route_async(statement), ground_answer)
+
+    @traced("auto")
+    def route(self, statement):
+        """Solve a problem through the cascade and return the answer with its route and cost."""
+        start = time.perf_counter()
+        attempts = []
+        step = self._next_tier(statement, attempts)
+        while step is not None:
+            method, reason = step
+            service, eval_method = self.tiers[method]
+            answer, explanation, _ = getattr(service, eval_method)(statement, None)
+            attempts.append(self._attempt(method, reason, answer, explanation))
+            step = self._next_tier(statement, attempts)
+        return self._build_route(attempts, start)
+
+    @traced("auto")
+    async def route_async(self, statement):
+        start = time.perf_counter()
+        attempts = []
+        step = self._next_tier(statement, attempts)
+        while step is not None:
+            method, reason = step
+            service, eval_method = self.tiers[method]
+            answer, explanation, _ = await getattr(service, eval_method + "_async")(statement, None)
+            attempts.append(self._attempt(method, reason, answer, explanation))
+            step = self._next_tier(statement, attempts)
+        return self._build_route(attempts, start)
+
+    def _attempt(self, method, reason, answer, explanation):
+        failed = (
+            answer is None
+            or str(answer).startswith("Error:")
+            or str(explanation).startswith("Error:")
+            or not normalize_answer(answer)
+        )
+        low_confidence = not failed and bool(LOW_CONFIDENCE_RE.search(f"{answer}\n{explanation}"))
+        return {
+            "method": method,
+            "reason": reason,
+            "answer": answer,
+            "explanation": explanation,
+            "failed": failed,
+            "low_confidence": low_confidence,
+        }
+
+    def _next_tier(self, statement, attempts):
+        """Return (method, reason) for the next tier to try, or None to stop."""
+        if not attempts:
+            if NUMERIC_PROBLEM_RE.search(statement):
+                return "program-aided", "numeric or counting problem"
+            return "simple", "cheapest tier"
+
+        if len(attempts) == 1:
+            first = attempts[0]
+            if first["failed"]:
+                return "cot-verification", f"{first['method']} failed"
+            if first["low_confidence"]:
+                return "cot-verification", f"{first['method']} answer has low confidence"
+            return None
+
+        if len(attempts) == 2:
+            first, second = attempts
+            if first["failed"] or second["failed"]:
+                return None
+            if answers_match(first["answer"], second["answer"]):
+                return None
+            used = {attempt["method"] for attempt in attempts}
+            remaining = [method for method in ("program-aided", "simple") if method not in used]
+            return remaining[0], f"{first['method']} and {second['method']} disagree"
+
+        return None
+
+    def _pick_answer(self, attempts):
+        """Majority answer among the successful attempts; CoT wins ties, then the latest tier."""
+        usable = [attempt for attempt in attempts if not attempt["failed"]]
+        if not usable:
+            return attempts[-1]
+        votes = {}
+        for attempt in usable:
+            votes.setdefault(normalize_answer(attempt["answer"]), []).append(attempt)
+        best = max(len(group) for group in votes.values())
+        leaders = [group for group in votes.values() if len(group) == best]
+        for group in leaders:
+            for attempt in group:
+                if attempt["method"] == "cot-verification":
+                    return attempt
+        return max((group[-1] for group in leaders), key=usable.index)
+
+    def _build_route(self, attempts, start):
+        chosen = self._pick_answer(attempts)
+        trace = current_trace()
+        return {
+            "answer": chosen["answer"],
+            "explanation": chosen["explanation"],
+            "tier": chosen["method"],
+            "route": [{"method": attempt["method"], "reason": attempt["reason"], "answer": attempt["answer"]}
+                      for attempt in attempts],
+            "model_calls": trace.model_calls if trace is not None else None,
+            "tokens": trace.prompt_tokens + trace.output_tokens if trace is not None else None,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+            "partial": trace.partial if trace is not None else None,
+        }
+
+    def _as_result(self, route, ground_answer):
+        summary = " -> ".join(step["method"] for step in route["route"])
+        explanation = (
+            f"AUTO ROUTE: {summary} (answered by {route['tier']}, "
+            f"{route['model_calls']} model calls, {route['latency_ms']:.0f} ms)\n\n"
+            f"{route['explanation']}"
+        )
+        is_correct = answers_match(route["answer"], ground_answer) if ground_answer else False
+        return route["answer"], explanation, is_correct
+
+if __name__ == "__main__":
+    # Imported here so the API never loads pandas or the evaluator.
+    from evaluator.base_evaluator import BaseEvaluator, main
+    
+    reasoning_service = AutoReasoningService()
+    evaluator = BaseEvaluator(reasoning_service, eval_method="evaluate_auto")
+    main(evaluator, dataset_file="reasoning_problems.csv", results_file="auto_results.csv")
@@ -1,55 +1,189 @@
 import sys
 import os
+import asyncio
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from model.gemini import init_gemini_model
-from evaluator.base_evaluator import BaseEvaluator, main
+from model.gemini import init_async_gemini_model
+from model.structured import STRUCTURED_OUTPUT, VERIFICATION_SCHEMA, json_generation_config, parse_structured
+from model.deadline import DeadlineExceeded
+from telemetry.tracing import traced, timed_stage, map_in_threads, mark_partial, PARSE_FAILURES
+from evaluator.grading import answers_match
+from research.prompts import get_template
+from research.self_consistency import SELF_CONSISTENCY_SAMPLES, vote, as_evaluation, failed_vote
 
 class CotAndVerificationReasoningService:
-    def __init__(self):
+    def __init__(self, structured_output=STRUCTURED_OUTPUT):
         # Configure the Gemini API
-        self.model = init_gemini_model()
+        self.model = init_async_gemini_model()
+        # Request the verification as schema-constrained JSON instead of scraping FINAL VERIFIED ANSWER:
+        self.structured_output = structured_output
     
+    @traced("cot-verification")
     def evaluate_with_cot_and_verification(self, statement, ground_answer):
         try:
-            cot_prompt = (
-                f"Problem: {statement}\n\n"
-                "Let's think about this step by step:\n"
-                "1. First, understand what the problem is asking\n"
-                "2. Break down the information given\n"
-                "3. Apply logical reasoning to each component\n"
-                "4. Combine insights to determine the answer\n\n"
-                "Work through each step carefully before giving your answer."
-            )
-            cot_response = self.model.generate_content(cot_prompt)
+            cot_response = self.model.generate_content(self._build_cot_prompt(statement))
             cot_result = cot_response.text.strip()
             
-            verification_prompt = (
-                f"You solved this problem:\n'{statement}'\n\n"
-                f"Your solution was:\n{cot_result}\n\n"
-                "Now, carefully verify your solution:\n"
-                "After verification, provide your final answer with confidence:\n"
-                "FINAL VERIFIED ANSWER: [your answer]"
-            )
-            
-            verification_response = self.model.generate_content(verification_prompt)
+            verification_prompt = self._build_verification_prompt(statement, cot_result)
+            try:
+                verification_response = self.model.generate_content(verification_prompt, generation_config=self._generation_config())
+            except DeadlineExceeded as e:
+                return self._unverified_result(cot_result, ground_answer, e)
             verification_text = verification_response.text.strip()
             
-            if "FINAL VERIFIED ANSWER:" in verification_text:
-                parts = verification_text.split("FINAL VERIFIED ANSWER:")
-                answer = parts[1].strip()
-                explanation = cot_result + "\n\nVERIFICATION:\n" + parts[0].strip()
-            else:
-                answer = verification_text.split('\n')[-1].strip()
-                explanation = cot_result + "\n\nVERIFICATION:\n" + verification_text
-                
-            is_correct = (str(answer).strip().lower() == str(ground_answer).strip().lower())
+            return self._parse_verification(cot_result, verification_text, ground_answer)
+        
+        except Exception as e:
+            return f"Error: {str(e)}", "Error: Failed to get response from AI model", False
+
+    @traced("cot-verification")
+    async def evaluate_with_cot_and_verification_async(self, statement, ground_answer):
+        """Async version of evaluate_with_cot_and_verification for use from the API."""
+        try:
+            cot_response = await self.model.generate_content_async(self._build_cot_prompt(statement))
+            cot_result = cot_response.text.strip()
             
-            return answer, explanation, is_correct
+            verification_prompt = self._build_verification_prompt(statement, cot_result)
+            try:
+                verification_response = await self.model.generate_content_async(verification_prompt, generation_config=self._generation_config())
+            except DeadlineExceeded as e:
+                return self._unverified_result(cot_result, ground_answer, e)
+            verification_text = verification_response.text.strip()
+            
+            return self._parse_verification(cot_result, verification_text, ground_answer)
         
         except Exception as e:
             return f"Error: {str(e)}", "Error: Failed to get response from AI model", False
 
+    @traced("cot-verification")
+    def sample_with_self_consistency(self, statement, samples=SELF_CONSISTENCY_SAMPLES):
+        """
+        Self-consistency: sample several reasoning chains in one generation call, verify them
+        concurrently and majority-vote the verified answers. Returns the vote() result.
+        """
+        try:
+            chains = self.model.generate_candidates(self._build_cot_prompt(statement), samples)
+        except DeadlineExceeded as e:
+            return failed_vote(e, samples)
+        return vote(map_in_threads(lambda chain: self._verify_sample(statement, chain.strip()), chains))
+
+    @traced("cot-verification")
+    async def sample_with_self_consistency_async(self, statement, samples=SELF_CONSISTENCY_SAMPLES):
+        """Async version of sample_with_self_consistency for use from the API."""
+        try:
+            chains = await self.model.generate_candidates_async(self._build_cot_prompt(statement), samples)
+        except DeadlineExceeded as e:
+            return failed_vote(e, samples)
+        return vote(await asyncio.gather(*(self._verify_sample_async(statement, chain.strip()) for chain in chains)))
+
+    @traced("cot-verification")
+    def evaluate_with_self_consistency(self, statement, ground_answer, samples=SELF_CONSISTENCY_SAMPLES):
+        """Evaluator entry point for self-consistency; the vote distribution is in the explanation."""
+        try:
+            return as_evaluation(self.sample_with_self_consistency(statement, samples), ground_answer)
+        except Exception as e:
+            return f"Error: {str(e)}", "Error: Failed to get response from AI model", False
+
+    def _verify_sample(self, statement, cot_result):
+        """Verify one sampled chain; a failed verification yields an error answer that gets no vote."""
+        try:
+            verification_text = self.model.generate_content(
+                self._build_verification_prompt(statement, cot_result), generation_config=self._generation_config()
+            ).text.strip()
+        except Exception as e:
+            return f"Error: {str(e)}", cot_result
+        return self._parse_verification(cot_result, verification_text, None)[:2]
+
+    async def _verify_sample_async(self, statement, cot_result):
+        try:
+            response = await self.model.generate_content_async(
+                self._build_verification_prompt(statement, cot_result), generation_config=self._generation_config()
+            )
+        except Exception as e:
+            return f"Error: {str(e)}", cot_result
+        return self._parse_verification(cot_result, response.text.strip(), None)[:2]
+
+    @traced("cot-verification")
+    async def stream_with_cot_and_verification(self, statement, ground_answer):
+        """
+        Async generator of streaming events: "token" events for the step-by-step reasoning,
+        then for the verification phase, then a single "result" event with the parsed final
+        answer (or an "error" event). Streaming always uses the text format, so the tokens stay readable.
+        """
+        try:
+            yield {"event": "phase", "phase": "reasoning"}
+            chunks = []
+            async for text in self.model.stream_content_async(self._build_cot_prompt(statement)):
+                chunks.append(text)
+                yield {"event": "token", "phase": "reasoning", "text": text}
+            cot_result = "".join(chunks).strip()
+            
+            yield {"event": "phase", "phase": "verification"}
+            chunks = []
+            verification_prompt = self._build_verification_prompt(statement, cot_result, structured=False)
+            try:
+                async for text in self.model.stream_content_async(verification_prompt):
+                    chunks.append(text)
+                    yield {"event": "token", "phase": "verification", "text": text}
+            except DeadlineExceeded as e:
+                if chunks:
+                    raise
+                answer, explanation, is_correct = self._unverified_result(cot_result, ground_answer, e)
+            else:
+                answer, explanation, is_correct = self._parse_verification(
+                    cot_result, "".join(chunks).strip(), ground_answer, structured=False
+                )
+            yield {"event": "result", "answer": answer, "explanation": explanation, "correct": is_correct}
+        
+        except Exception as e:
+            yield {"event": "error", "detail": f"Error: {str(e)}"}
+
+    @timed_stage("prompt_construction")
+    def _build_cot_prompt(self, statement):
+        return get_template("cot").render(statement=statement)
+
+    def _generation_config(self):
+        return json_generation_config(VERIFICATION_SCHEMA) if self.structured_output else None
+
+    @timed_stage("prompt_construction")
+    def _build_verification_prompt(self, statement, cot_result, structured=None):
+        name = "cot-verification-json" if (self.structured_output if structured is None else structured) else "cot-verification"
+        return get_template(name).render(statement=statement, solution=cot_result)
+
+    @timed_stage("response_parsing")
+    def _unverified_result(self, cot_result, ground_answer, error):
+        """
+        Partial result when the deadline leaves no time to verify: the last line of the
+        step-by-step reasoning as the answer, with the explanation marked as unverified.
+        """
+        mark_partial("verification skipped: deadline")
+        lines = [line.strip() for line in cot_result.splitlines() if line.strip()]
+        answer = lines[-1] if lines else ""
+        explanation = cot_result + f"\n\nUNVERIFIED (PARTIAL) ANSWER: verification was skipped. {error}"
+        return answer, explanation, answers_match(answer, ground_answer)
+
+    @timed_stage("response_parsing")
+    def _parse_verification(self, cot_result, verification_text, ground_answer, structured=None):
+        if (self.structured_output if structured is None else structured):
+            data = parse_structured(verification_text, VERIFICATION_SCHEMA)
+            answer = data["final_answer"].strip()
+            explanation = cot_result + "\n\nVERIFICATION:\n" + data["verification"].strip()
+        elif "FINAL VERIFIED ANSWER:" in verification_text:
+            parts = verification_text.split("FINAL VERIFIED ANSWER:")
+            answer = parts[1].strip()
+            explanation = cot_result + "\n\nVERIFICATION:\n" + parts[0].strip()
+        else:
+            PARSE_FAILURES.labels("cot-verification", "text").inc()
+            answer = verification_text.split('\n')[-1].strip()
+            explanation = cot_result + "\n\nVERIFICATION:\n" + verification_text
+            
+        is_correct = answers_match(answer, ground_answer)
+        
+        return answer, explanation, is_correct
+
 if __name__ == "__main__":
+    # Imported here so the API never loads pandas or the evaluator.
+    from evaluator.base_evaluator import BaseEvaluator, main
+    
     reasoning_service = CotAndVerificationReasoningService()
     evaluator = BaseEvaluator(reasoning_service, eval_method="evaluate_with_cot_and_verification")
     main(evaluator, dataset_file="reasoning_problems.csv", results_file="cot_verification_results.csv")
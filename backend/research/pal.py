@@ -1,171 +1,281 @@
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from evaluator.base_evaluator import BaseEvaluator, main
-from model.gemini import init_gemini_model
-import contextlib
-import io
+from model.gemini import init_async_gemini_model
+from model.structured import STRUCTURED_OUTPUT, PROGRAM_SCHEMA, json_generation_config, parse_structured
+from research.sandbox import get_sandbox_pool
+from research.prompts import get_template
+from model.deadline import DeadlineExceeded, ensure_time_for, remaining_seconds, stage_times
+from telemetry.tracing import traced, timed_stage, stage, map_in_threads, mark_partial
+from evaluator.grading import answers_match
+from research.self_consistency import SELF_CONSISTENCY_SAMPLES, vote, as_evaluation, failed_vote
+import time
+import asyncio
+
+# Under a deadline, a program is not started with less time than this left: a run that times out
+# at once still costs a worker restart.
+PAL_MIN_PROGRAM_SECONDS = float(os.getenv("PAL_MIN_PROGRAM_SECONDS", "0.2"))
 
 class PalReasoningService:
-    def __init__(self):
+    def __init__(self, structured_output=STRUCTURED_OUTPUT):
         # Configure the Gemini API
-        self.model = init_gemini_model()
+        self.model = init_async_gemini_model()
+        # Request programs as schema-constrained JSON instead of digging them out of markdown fences
+        self.structured_output = structured_output
     
+    @traced("program-aided")
     def evaluate_with_program_aided(self, statement, ground_answer):
         """
         Generate code to solve the problem and execute it.
         """
         try:
             # Ask the model to generate Python code to solve the problem
-            code_prompt = (
-                f"Problem: {statement}\n\n"
-                "Write a Python function that solves this problem. The function should:\n"
-                "1. Take any necessary inputs\n"
-                "2. Implement a solution to the problem\n"
-                "3. Return the answer as the final output\n"
-                "4. Include comments explaining your approach\n\n"
-                "Name your function 'solve_problem' and make sure it can be executed without additional input.\n"
-                "Ensure the output of your function is the direct answer to the question (e.g., a number or a string).\n\n"
-                "After writing the code, add a line at the end to execute the function and print the result:\n"
-                "print(solve_problem())"
+            code_response = self.model.generate_content(
+                self._build_code_prompt(statement), generation_config=self._generation_config()
             )
+            code = self._extract_code(code_response.text.strip())
             
-            code_response = self.model.generate_content(code_prompt)
-            code = code_response.text.strip()
+            sandbox = get_sandbox_pool()
+            outcome = self._run_program(sandbox, code)
+            result, execution_output, error_messages = self._summarize_execution(outcome)
             
-            # Clean up the code (remove markdown if present)
-            if "```python" in code and "```" in code:
-                code = code.split("```python")[1].split("```")[0].strip()
-            elif "```" in code:
-                parts = code.split("```")
-                if len(parts) >= 3:  # Proper markdown with opening and closing ticks
-                    code = parts[1].strip()
+            # If no result found and errors exist, attempt to fix the code
+            if self._needs_fix(result, execution_output, error_messages):
+                try:
+                    with stage("fix_generation"):
+                        fix_response = self.model.generate_content(
+                            self._build_fix_prompt(statement, code, error_messages), generation_config=self._generation_config()
+                        )
+                    fixed_code = self._extract_fixed_code(fix_response.text.strip())
+                    outcome = self._run_program(sandbox, fixed_code)
+                except DeadlineExceeded as e:
+                    error_messages = self._skip_fix(error_messages, e)
                 else:
-                    # Try to find any code block
-                    for part in parts:
-                        if "def solve_problem" in part:
-                            code = part.strip()
-                            break
+                    code, result, execution_output, error_messages = self._merge_fixed_execution(
+                        outcome, code, fixed_code, result, execution_output, error_messages
+                    )
             
-            # Add defensive programming to catch potential issues
-            code_with_explanation = (
-                f"# Original problem: {statement}\n\n"
-                f"{code}"
+            return self._build_result(code, result, execution_output, error_messages, ground_answer)
+        
+        except Exception as e:
+            return f"Error: {str(e)}", f"Error generating or executing code: {str(e)}", False
+
+    @traced("program-aided")
+    async def evaluate_with_program_aided_async(self, statement, ground_answer):
+        """
+        Async version of evaluate_with_program_aided for use from the API.
+        Model calls are awaited and the generated code runs in the sandbox pool.
+        """
+        try:
+            code_response = await self.model.generate_content_async(
+                self._build_code_prompt(statement), generation_config=self._generation_config()
             )
+            code = self._extract_code(code_response.text.strip())
             
-            # Execute the code in a safe environment with all builtins
-            restricted_globals = {"__builtins__": __builtins__}
-            local_vars = {}
-            output = io.StringIO()
-            error_output = io.StringIO()
-            result = None
+            sandbox = await asyncio.to_thread(get_sandbox_pool)
+            outcome = await self._run_program_async(sandbox, code)
+            result, execution_output, error_messages = self._summarize_execution(outcome)
             
-            # Execute with captured output
-            with contextlib.redirect_stdout(output), contextlib.redirect_stderr(error_output):
+            if self._needs_fix(result, execution_output, error_messages):
                 try:
-                    exec(code, restricted_globals, local_vars)
-                    execution_output = output.getvalue().strip()
-                    error_messages = error_output.getvalue().strip()
-                    
-                    # Try to extract the result (last line of output)
-                    if execution_output:
-                        result_lines = execution_output.splitlines()
-                        result = result_lines[-1].strip() if result_lines else None
-                    
-                    # If no result from stdout, try calling the function directly
-                    if not result and 'solve_problem' in local_vars:
-                        try:
-                            result = str(local_vars['solve_problem']())
-                        except Exception as func_e:
-                            error_messages += f"\nError calling solve_problem(): {str(func_e)}"
-                except Exception as e:
-                    error_messages = f"{error_output.getvalue().strip()}\nExecution error: {str(e)}"
-            
-            # If no result found and errors exist, attempt to fix the code
-            if (not result or result == "None") and (error_messages or not execution_output):
-                fix_prompt = (
-                    f"The Python code you generated for this problem had errors:\n\n"
-                    f"Problem: {statement}\n\n"
-                    f"Original code:\n```python\n{code}\n```\n\n"
-                    f"Errors or issues:\n{error_messages if error_messages else 'The code ran but did not produce any output.'}\n\n"
-                    "Please fix the code. Make sure it:\n"
-                    "1. Correctly solves the problem\n"
-                    "2. Prints the final answer explicitly\n"
-                    "3. Handles any edge cases\n\n"
-                    "Provide the complete corrected code."
-                )
-                
-                fix_response = self.model.generate_content(fix_prompt)
-                fixed_code = fix_response.text.strip()
-                
-                # Clean up the fixed code
-                if "```python" in fixed_code and "```" in fixed_code:
-                    fixed_code = fixed_code.split("```python")[1].split("```")[0].strip()
-                elif "```" in fixed_code:
-                    fixed_code = fixed_code.split("```")[1].split("```")[0].strip()
-                
-                # Try executing the fixed code
-                output = io.StringIO()
-                error_output = io.StringIO()
-                with contextlib.redirect_stdout(output), contextlib.redirect_stderr(error_output):
-                    try:
-                        local_vars = {}
-                        exec(fixed_code, restricted_globals, local_vars)
-                        execution_output = output.getvalue().strip()
-                        result_lines = execution_output.splitlines()
-                        result = result_lines[-1].strip() if result_lines else None
-                        
-                        if not result and 'solve_problem' in local_vars:
-                            result = str(local_vars['solve_problem']())
-                        
-                        # Update code to the fixed version
-                        code = fixed_code
-                        code_with_explanation += f"\n\n# Fixed code after error:\n{fixed_code}"
-                    except Exception as e:
-                        error_messages += f"\n\nFixed code also had errors: {str(e)}"
-            
-            # Prepare explanation including the code and its execution details
-            explanation = (
-                f"PROGRAM-AIDED REASONING:\n\n"
-                f"I approached this problem by writing Python code to solve it systematically:\n\n"
-                f"```python\n{code}\n```\n\n"
-            )
-            if error_messages:
-                explanation += f"EXECUTION ERRORS:\n{error_messages}\n\n"
-            if execution_output:
-                explanation += f"EXECUTION OUTPUT:\n{execution_output}\n\n"
-            explanation += f"FINAL ANSWER: {result}"
-            
-            # Check if the answer matches ground truth
-            is_correct = self._check_equivalence(result, ground_answer)
+                    with stage("fix_generation"):
+                        fix_response = await self.model.generate_content_async(
+                            self._build_fix_prompt(statement, code, error_messages), generation_config=self._generation_config()
+                        )
+                    fixed_code = self._extract_fixed_code(fix_response.text.strip())
+                    outcome = await self._run_program_async(sandbox, fixed_code)
+                except DeadlineExceeded as e:
+                    error_messages = self._skip_fix(error_messages, e)
+                else:
+                    code, result, execution_output, error_messages = self._merge_fixed_execution(
+                        outcome, code, fixed_code, result, execution_output, error_messages
+                    )
             
-            return result, explanation, is_correct
+            return self._build_result(code, result, execution_output, error_messages, ground_answer)
         
         except Exception as e:
             return f"Error: {str(e)}", f"Error generating or executing code: {str(e)}", False
-    
-    def _check_equivalence(self, model_answer, ground_answer):
-        """Helper method to check if the model's answer is equivalent to the ground truth."""
+
+    @traced("program-aided")
+    def sample_with_self_consistency(self, statement, samples=SELF_CONSISTENCY_SAMPLES):
+        """
+        Self-consistency: sample several programs in one generation call, run them in parallel
+        in the sandbox pool and majority-vote their results. Returns the vote() result.
+        Failing programs are not repaired; they just get no vote.
+        """
+        try:
+            texts = self.model.generate_candidates(
+                self._build_code_prompt(statement), samples, generation_config=self._generation_config()
+            )
+            codes = [self._extract_code(text.strip()) for text in texts]
+            sandbox = get_sandbox_pool()
+            timeout = self._program_timeout(sandbox)
+            with stage("code_execution"):
+                outcomes = map_in_threads(lambda code: sandbox.run(code, timeout), codes)
+        except DeadlineExceeded as e:
+            return failed_vote(e, samples)
+        return vote([self._sample_result(code, outcome) for code, outcome in zip(codes, outcomes)])
+
+    @traced("program-aided")
+    async def sample_with_self_consistency_async(self, statement, samples=SELF_CONSISTENCY_SAMPLES):
+        """Async version of sample_with_self_consistency for use from the API."""
+        try:
+            texts = await self.model.generate_candidates_async(
+                self._build_code_prompt(statement), samples, generation_config=self._generation_config()
+            )
+            codes = [self._extract_code(text.strip()) for text in texts]
+            sandbox = await asyncio.to_thread(get_sandbox_pool)
+            timeout = self._program_timeout(sandbox)
+            with stage("code_execution"):
+                outcomes = await asyncio.gather(*(sandbox.run_async(code, timeout) for code in codes))
+        except DeadlineExceeded as e:
+            return failed_vote(e, samples)
+        return vote([self._sample_result(code, outcome) for code, outcome in zip(codes, outcomes)])
+
+    @traced("program-aided")
+    def evaluate_with_self_consistency(self, statement, ground_answer, samples=SELF_CONSISTENCY_SAMPLES):
+        """Evaluator entry point for self-consistency; the vote distribution is in the explanation."""
         try:
-            if model_answer is None:
-                return False
-            model_answer_str = str(model_answer).lower().strip()
-            ground_answer_str = str(ground_answer).lower().strip()
-            if model_answer_str == ground_answer_str:
-                return True
-            try:
-                if float(model_answer_str) == float(ground_answer_str):
-                    return True
-            except (ValueError, TypeError):
-                pass
-            if ground_answer_str in model_answer_str:
-                return True
-            return False
+            return as_evaluation(self.sample_with_self_consistency(statement, samples), ground_answer)
         except Exception as e:
-            print(f"Error in equivalence check: {e}")
-            return False
+            return f"Error: {str(e)}", f"Error generating or executing code: {str(e)}", False
+
+    def _program_timeout(self, sandbox):
+        """
+        Sandbox timeout for a program, capped at the deadline. Raises DeadlineExceeded instead when
+        runs usually take longer than the time left, or less than PAL_MIN_PROGRAM_SECONDS is left.
+        """
+        ensure_time_for("code_execution", PAL_MIN_PROGRAM_SECONDS)
+        return remaining_seconds(sandbox.timeout)
+
+    def _run_program(self, sandbox, code):
+        timeout = self._program_timeout(sandbox)
+        start = time.perf_counter()
+        with stage("code_execution"):
+            outcome = sandbox.run(code, timeout)
+        self._record_program_time(start, timeout)
+        return outcome
+
+    async def _run_program_async(self, sandbox, code):
+        timeout = self._program_timeout(sandbox)
+        start = time.perf_counter()
+        with stage("code_execution"):
+            outcome = await sandbox.run_async(code, timeout)
+        self._record_program_time(start, timeout)
+        return outcome
+
+    def _record_program_time(self, start, timeout):
+        # Runs cut off by their timeout say nothing about how long programs usually take.
+        elapsed = time.perf_counter() - start
+        if elapsed < timeout:
+            stage_times.record("code_execution", elapsed)
+
+    def _sample_result(self, code, outcome):
+        result, execution_output, error_messages = self._summarize_execution(outcome)
+        answer, explanation, _ = self._build_result(code, result, execution_output, error_messages, None)
+        return answer, explanation
+
+    def _generation_config(self):
+        return json_generation_config(PROGRAM_SCHEMA) if self.structured_output else None
+
+    @timed_stage("prompt_construction")
+    def _build_code_prompt(self, statement):
+        return get_template("pal-code").render(statement=statement)
+
+    @timed_stage("prompt_construction")
+    def _build_fix_prompt(self, statement, code, error_messages):
+        return get_template("pal-fix").render(
+            statement=statement,
+            code=code,
+            errors=error_messages if error_messages else "The code ran but did not produce any output.",
+        )
+
+    @timed_stage("response_parsing")
+    def _extract_code(self, code):
+        """Clean up the code (remove markdown if present)."""
+        if self.structured_output:
+            return parse_structured(code, PROGRAM_SCHEMA)["code"].strip()
+        if "```python" in code and "```" in code:
+            code = code.split("```python")[1].split("```")[0].strip()
+        elif "```" in code:
+            parts = code.split("```")
+            if len(parts) >= 3:  # Proper markdown with opening and closing ticks
+                code = parts[1].strip()
+            else:
+                # Try to find any code block
+                for part in parts:
+                    if "def solve_problem" in part:
+                        code = part.strip()
+                        break
+        return code
+
+    @timed_stage("response_parsing")
+    def _extract_fixed_code(self, fixed_code):
+        """Clean up the fixed code returned by the model."""
+        if self.structured_output:
+            return parse_structured(fixed_code, PROGRAM_SCHEMA)["code"].strip()
+        if "```python" in fixed_code and "```" in fixed_code:
+            fixed_code = fixed_code.split("```python")[1].split("```")[0].strip()
+        elif "```" in fixed_code:
+            fixed_code = fixed_code.split("```")[1].split("```")[0].strip()
+        return fixed_code
+
+    def _skip_fix(self, error_messages, error):
+        """The deadline leaves no time for a fix round: answer with the first program's outcome, marked partial."""
+        mark_partial("fix skipped: deadline")
+        return f"{error_messages}\n\nFix skipped (PARTIAL): {error}"
+
+    def _needs_fix(self, result, execution_output, error_messages):
+        return (not result or result == "None") and (error_messages or not execution_output)
+
+    def _summarize_execution(self, outcome):
+        """
+        Turn a sandbox outcome for the generated code into
+        (result, execution_output, error_messages).
+        """
+        execution_output = outcome["stdout"]
+        if outcome["exec_error"]:
+            return None, execution_output, f"{outcome['stderr']}\nExecution error: {outcome['exec_error']}"
+        error_messages = outcome["stderr"]
+        if outcome["call_error"]:
+            error_messages += f"\nError calling solve_problem(): {outcome['call_error']}"
+        return outcome["result"], execution_output, error_messages
+
+    def _merge_fixed_execution(self, outcome, code, fixed_code, result, execution_output, error_messages):
+        """
+        Fold the sandbox outcome for the fixed code into the previous state. On success the
+        fixed code replaces the original; on failure the previous result is kept and the
+        new error is appended. Returns (code, result, execution_output, error_messages).
+        """
+        error = outcome["exec_error"] or outcome["call_error"]
+        if error:
+            error_messages += f"\n\nFixed code also had errors: {error}"
+            return code, result, execution_output, error_messages
+        return fixed_code, outcome["result"], outcome["stdout"], error_messages
+
+    @timed_stage("response_parsing")
+    def _build_result(self, code, result, execution_output, error_messages, ground_answer):
+        # Prepare explanation including the code and its execution details
+        explanation = (
+            f"PROGRAM-AIDED REASONING:\n\n"
+            f"I approached this problem by writing Python code to solve it systematically:\n\n"
+            f"```python\n{code}\n```\n\n"
+        )
+        if error_messages:
+            explanation += f"EXECUTION ERRORS:\n{error_messages}\n\n"
+        if execution_output:
+            explanation += f"EXECUTION OUTPUT:\n{execution_output}\n\n"
+        explanation += f"FINAL ANSWER: {result}"
+        
+        # Check if the answer matches ground truth
+        is_correct = answers_match(result, ground_answer)
+        
+        return result, explanation, is_correct
 
 if __name__ == "__main__":
+    # Imported here so the API never loads pandas or the evaluator.
+    from evaluator.base_evaluator import BaseEvaluator, main
+    
     reasoning_service = PalReasoningService()
     evaluator = BaseEvaluator(reasoning_service, eval_method="evaluate_with_program_aided")
-    main(evaluator, dataset_file="reasoning_problems.csv", results_file="program_aided_results.csv")
\ No newline at end of file
+    main(evaluator, dataset_file="reasoning_problems.csv", results_file="program_aided_results.csv")
@@ -0,0 +1,150 @@
+import hashlib
+from string import Formatter
+from telemetry.tracing import current_trace
+
+class RenderedPrompt(str):
+    """
+    The full text of a prompt rendered from a template, usable anywhere a string prompt is.
+    It also carries the template's static prefix and the per-call text that follows it, so the
+    model wrapper can send the prefix through the context cache and only the rest with each call.
+    """
+
+    def __new__(cls, template, text):
+        prompt = super().__new__(cls, template.prefix + text)
+        prompt.template_id = template.id
+        prompt.prefix = template.prefix
+        prompt.prefix_digest = template.prefix_digest
+        prompt.text = text
+        return prompt
+
+class PromptTemplate:
+    """
+    A versioned prompt: a static prefix (instructions, then any few-shot exemplars) shared by
+    every call, followed by a per-call body with {placeholders}. The prefix is built and the
+    body parsed once, when the template is created. Bump the version whenever the wording
+    changes, so results produced with different prompts can be told apart.
+    """
+
+    def __init__(self, name, version, instructions, body, examples=()):
+        self.name = name
+        self.version = version
+        self.id = f"{name}@v{version}"
+        self.prefix = instructions.strip() + "\n\n"
+        for problem, solution in examples:
+            self.prefix += f"Example problem: {problem}\nExample solution:\n{solution.strip()}\n\n"
+        self.prefix_digest = hashlib.sha256(self.prefix.encode("utf-8")).hexdigest()[:16]
+        self._segments = []
+        for literal, field, format_spec, conversion in Formatter().parse(body):
+            if format_spec or conversion:
+                raise ValueError(f"Template {self.id}: format specs and conversions are not supported")
+            if literal:
+                self._segments.append((literal, None))
+            if field is not None:
+                self._segments.append((None, field))
+        self.fields = {field for _, field in self._segments if field is not None}
+
+    def render(self, **values):
+        """Fill in the body and record the template version on the current request."""
+        missing = self.fields - values.keys()
+        if missing:
+            raise KeyError(f"Template {self.id} is missing values for: {', '.join(sorted(missing))}")
+        text = "".join(literal if field is None else str(values[field]) for literal, field in self._segments)
+        trace = current_trace()
+        if trace is not None:
+            trace.add_template(self.id)
+        return RenderedPrompt(self, text)
+
+TEMPLATES = {}
+
+def register(template):
+    TEMPLATES[template.name] = template
+    return template
+
+def get_template(name):
+    """Return the registered template with this name."""
+    return TEMPLATES[name]
+
+# Version 1 of each prompt was the problem-first f-string the services used to build inline;
+# version 2 puts the static instructions first so they can be cached.
+register(PromptTemplate(
+    "simple", 2,
+    instructions=(
+        "For the reasoning problem below, provide:\n"
+        "1. The answer (just the final answer without explanation, e.g., 'Yes', 'No', or a number)\n"
+        "2. A detailed step-by-step explanation of how to arrive at this answer\n\n"
+        "Format your response exactly like this:\n"
+        "ANSWER: [your answer here]\n"
+        "EXPLANATION: [your detailed explanation here]"
+    ),
+    body="Problem: {statement}",
+))
+
+register(PromptTemplate(
+    "simple-json", 2,
+    instructions=(
+        "For the reasoning problem below, provide:\n"
+        "1. answer: just the final answer without explanation, e.g., 'Yes', 'No', or a number\n"
+        "2. explanation: a detailed step-by-step explanation of how to arrive at this answer"
+    ),
+    body="Problem: {statement}",
+))
+
+register(PromptTemplate(
+    "cot", 2,
+    instructions=(
+        "Solve the problem below. Let's think about this step by step:\n"
+        "1. First, understand what the problem is asking\n"
+        "2. Break down the information given\n"
+        "3. Apply logical reasoning to each component\n"
+        "4. Combine insights to determine the answer\n\n"
+        "Work through each step carefully before giving your answer."
+    ),
+    body="Problem: {statement}",
+))
+
+register(PromptTemplate(
+    "cot-verification", 2,
+    instructions=(
+        "Below is a problem you solved and your solution. Now, carefully verify your solution.\n"
+        "After verification, provide your final answer with confidence:\n"
+        "FINAL VERIFIED ANSWER: [your answer]"
+    ),
+    body="You solved this problem:\n'{statement}'\n\nYour solution was:\n{solution}",
+))
+
+register(PromptTemplate(
+    "cot-verification-json", 2,
+    instructions=(
+        "Below is a problem you solved and your solution. Now, carefully verify your solution. "
+        "Give your check of each step as verification and just the answer you are confident in as final_answer."
+    ),
+    body="You solved this problem:\n'{statement}'\n\nYour solution was:\n{solution}",
+))
+
+register(PromptTemplate(
+    "pal-code", 2,
+    instructions=(
+        "Write a Python function that solves the problem below. The function should:\n"
+        "1. Take any necessary inputs\n"
+        "2. Implement a solution to the problem\n"
+        "3. Return the answer as the final output\n"
+        "4. Include comments explaining your approach\n\n"
+        "Name your function 'solve_problem' and make sure it can be executed without additional input.\n"
+        "Ensure the output of your function is the direct answer to the question (e.g., a number or a string).\n\n"
+        "After writing the code, add a line at the end to execute the function and print the result:\n"
+        "print(solve_problem())"
+    ),
+    body="Problem: {statement}",
+))
+
+register(PromptTemplate(
+    "pal-fix", 2,
+    instructions=(
+        "The Python code you generated for the problem below had errors. Please fix the code. Make sure it:\n"
+        "1. Correctly solves the problem\n"
+        "2. Prints the final answer explicitly\n"
+        "3. Handles any edge cases\n\n"
+        "Provide the complete corrected code."
+    ),
+    body="Problem: {statement}\n\nOriginal code:\n```python\n{code}\n```\n\nErrors or issues:\n{errors}",
+))
@@ -0,0 +1,247 @@
+import os
+import io
+import time
+import queue
+import atexit
+import asyncio
+import threading
+import contextlib
+import multiprocessing
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, timeouts still apply
+    resource = None
+
+SANDBOX_WORKERS = int(os.getenv("PAL_SANDBOX_WORKERS", "4"))
+SANDBOX_TIMEOUT_SECONDS = float(os.getenv("PAL_TIMEOUT_SECONDS", "10"))
+SANDBOX_MEMORY_LIMIT_MB = int(os.getenv("PAL_MEMORY_LIMIT_MB", "512"))
+# Spawned workers re-import the parent's main module, so allow them time to start up.
+SANDBOX_STARTUP_TIMEOUT_SECONDS = 60
+MAX_CAPTURED_OUTPUT = 100_000
+# How often a running program checks whether its caller has gone.
+CANCEL_POLL_SECONDS = 0.05
+
+def execute_program(code):
+    """
+    Execute generated code in the current process with captured stdout/stderr.
+    If nothing is printed, solve_problem() is called directly to get a result.
+    Returns a dict with result, stdout, stderr, exec_error and call_error.
+    """
+    # Execute the code in a safe environment with all builtins
+    restricted_globals = {"__builtins__": __builtins__}
+    local_vars = {}
+    output = io.StringIO()
+    error_output = io.StringIO()
+    outcome = {"result": None, "stdout": "", "stderr": "", "exec_error": None, "call_error": None}
+
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(error_output):
+        try:
+            exec(code, restricted_globals, local_vars)
+            execution_output = output.getvalue().strip()
+
+            # Try to extract the result (last line of output)
+            if execution_output:
+                result_lines = execution_output.splitlines()
+                outcome["result"] = result_lines[-1].strip() if result_lines else None
+
+            # If no result from stdout, try calling the function directly
+            if not outcome["result"] and 'solve_problem' in local_vars:
+                try:
+                    outcome["result"] = str(local_vars['solve_problem']())
+                except Exception as func_e:
+                    outcome["call_error"] = str(func_e) or type(func_e).__name__
+        except Exception as e:
+            outcome["exec_error"] = str(e) or type(e).__name__
+
+    outcome["stdout"] = output.getvalue().strip()[-MAX_CAPTURED_OUTPUT:]
+    outcome["stderr"] = error_output.getvalue().strip()[-MAX_CAPTURED_OUTPUT:]
+    if outcome["result"] is not None:
+        outcome["result"] = outcome["result"][:MAX_CAPTURED_OUTPUT]
+    return outcome
+
+def _current_address_space():
+    """Virtual memory already mapped by this process (Linux only, 0 elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+def _apply_limits(memory_limit_mb, cpu_seconds):
+    if resource is None:
+        return
+    if memory_limit_mb:
+        # The limit is on top of what the interpreter and its imports already map.
+        limit = _current_address_space() + memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    if cpu_seconds:
+        # CPU time is cumulative for the process, so the limit is moved forward before every run.
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        used = int(usage.ru_utime + usage.ru_stime)
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        soft = used + int(cpu_seconds) + 1
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+def _worker_main(conn, memory_limit_mb, cpu_seconds):
+    """Loop in the sandbox process: receive code, run it, send back the outcome."""
+    conn.send("ready")
+    memory_applied = False
+    while True:
+        try:
+            code = conn.recv()
+        except EOFError:
+            break
+        if code is None:
+            break
+        if not memory_applied:
+            _apply_limits(memory_limit_mb, 0)
+            memory_applied = True
+        _apply_limits(0, cpu_seconds)
+        try:
+            outcome = execute_program(code)
+        except BaseException as e:  # MemoryError, SystemExit from generated code, ...
+            outcome = {"result": None, "stdout": "", "stderr": "", "exec_error": f"{type(e).__name__}: {e}", "call_error": None}
+        conn.send(outcome)
+
+class _Worker:
+    def __init__(self, context, memory_limit_mb, cpu_seconds):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, memory_limit_mb, cpu_seconds),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def wait_ready(self):
+        """Block until the worker has finished starting, so startup never counts against a run's timeout."""
+        if not self.ready:
+            if not self.conn.poll(SANDBOX_STARTUP_TIMEOUT_SECONDS) or self.conn.recv() != "ready":
+                raise OSError("Sandbox worker failed to start")
+            self.ready = True
+
+    def kill(self):
+        try:
+            self.conn.close()
+        finally:
+            if self.process.is_alive():
+                self.process.kill()
+            self.process.join(timeout=1)
+
+class SandboxPool:
+    """
+    Pool of pre-started worker processes that execute PAL programs.
+    Each run gets its own captured stdout/stderr, a wall-clock timeout and CPU/memory
+    rlimits. A worker that times out or dies is killed and replaced, so a runaway
+    program only costs its own slot.
+    """
+
+    def __init__(self, size=SANDBOX_WORKERS, timeout=SANDBOX_TIMEOUT_SECONDS,
+                 memory_limit_mb=SANDBOX_MEMORY_LIMIT_MB, cpu_seconds=None):
+        self.size = size
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.cpu_seconds = cpu_seconds if cpu_seconds is not None else timeout
+        # spawn avoids forking a process that already runs threads (uvicorn, grpc).
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self.timeouts = 0
+        self.crashes = 0
+        self.cancellations = 0
+        for _ in range(size):
+            self._idle.put(self._spawn())
+        # Pre-warm: wait for every worker to finish starting before serving runs.
+        for worker in list(self._idle.queue):
+            worker.wait_ready()
+
+    def _spawn(self):
+        return _Worker(self._context, self.memory_limit_mb, self.cpu_seconds)
+
+    def run(self, code, timeout=None, cancelled=None):
+        """
+        Execute code in a sandbox worker and return the execute_program outcome dict.
+        Setting the cancelled event (a threading.Event) stops the run: its worker is killed and replaced.
+        """
+        if self._closed:
+            raise RuntimeError("Sandbox pool is closed")
+        timeout = self.timeout if timeout is None else timeout
+        worker = self._idle.get()
+        try:
+            worker.wait_ready()
+            worker.conn.send(code)
+            if not self._wait_for_outcome(worker, timeout, cancelled):
+                stopped = cancelled is not None and cancelled.is_set()
+                with self._lock:
+                    if stopped:
+                        self.cancellations += 1
+                    else:
+                        self.timeouts += 1
+                worker.kill()
+                worker = self._spawn()
+                message = "Execution cancelled" if stopped else f"Execution timed out after {timeout:g} seconds"
+                return {"result": None, "stdout": "", "stderr": "", "exec_error": message, "call_error": None}
+            return worker.conn.recv()
+        except (EOFError, OSError, BrokenPipeError):
+            # The worker was killed, most likely by the CPU or memory limit.
+            with self._lock:
+                self.crashes += 1
+            worker.kill()
+            worker = self._spawn()
+            return {"result": None, "stdout": "", "stderr": "",
+                    "exec_error": "Sandbox process exited unexpectedly (CPU or memory limit exceeded?)", "call_error": None}
+        finally:
+            self._idle.put(worker)
+
+    def _wait_for_outcome(self, worker, timeout, cancelled):
+        """Wait until the worker has an outcome; False on timeout or cancellation."""
+        if cancelled is None:
+            return worker.conn.poll(timeout)
+        end = time.monotonic() + timeout
+        while not cancelled.is_set():
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return False
+            if worker.conn.poll(min(remaining, CANCEL_POLL_SECONDS)):
+                return True
+        return False
+
+    async def run_async(self, code, timeout=None):
+        """Run code without blocking the event loop. Cancelling the caller also stops the program."""
+        cancelled = threading.Event()
+        try:
+            return await asyncio.to_thread(self.run, code, timeout, cancelled)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                worker.conn.send(None)
+            except (OSError, BrokenPipeError):
+                pass
+            worker.kill()
+
+_sandbox_pool = None
+_sandbox_pool_lock = threading.Lock()
+
+def get_sandbox_pool():
+    """Return the process-wide SandboxPool, starting its workers on first use."""
+    global _sandbox_pool
+    with _sandbox_pool_lock:
+        if _sandbox_pool is None:
+            _sandbox_pool = SandboxPool()
+            atexit.register(_sandbox_pool.close)
+        return _sandbox_pool
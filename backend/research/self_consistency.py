@@ -0,0 +1,54 @@
+import os
+from evaluator.grading import answers_match, normalize_answer
+
+# Samples drawn per problem in self-consistency mode; candidate_count allows at most 8.
+SELF_CONSISTENCY_SAMPLES = int(os.getenv("SELF_CONSISTENCY_SAMPLES", "5"))
+MAX_SELF_CONSISTENCY_SAMPLES = 8
+
+def vote(samples):
+    """
+    Majority vote over sampled (answer, explanation) pairs.
+    Answers are compared after normalisation and failed samples (no answer, or an "Error:"
+    answer) get no vote. Returns a dict with the winning answer and explanation, the vote
+    count for each distinct answer, and confidence = winning votes / samples drawn.
+    """
+    groups = []
+    for answer, explanation in samples:
+        if answer is None or str(answer).startswith("Error:") or not normalize_answer(answer):
+            continue
+        for group in groups:
+            if answers_match(answer, group["answer"]):
+                group["votes"] += 1
+                break
+        else:
+            groups.append({"answer": answer, "explanation": explanation, "votes": 1})
+
+    if not groups:
+        answer, explanation = samples[0] if samples else ("Error: No samples were drawn", "")
+        return {"answer": answer, "explanation": explanation, "confidence": 0.0, "votes": {}, "samples": len(samples)}
+
+    # max() keeps the earliest of equally voted answers.
+    winner = max(groups, key=lambda group: group["votes"])
+    return {
+        "answer": winner["answer"],
+        "explanation": winner["explanation"],
+        "confidence": round(winner["votes"] / len(samples), 3),
+        "votes": {str(group["answer"]): group["votes"] for group in groups},
+        "samples": len(samples),
+    }
+
+def failed_vote(error, samples=0):
+    """A vote() result for sampling that failed before any sample could vote, e.g. on a deadline."""
+    return {"answer": f"Error: {error}", "explanation": "", "confidence": 0.0, "votes": {}, "samples": samples}
+
+def as_evaluation(result, ground_answer):
+    """Turn a vote() result into the (answer, explanation, is_correct) tuple used by the evaluator."""
+    votes = ", ".join(f"{answer} x{count}" for answer, count in result["votes"].items()) or "none"
+    winning_votes = round(result["confidence"] * result["samples"])
+    explanation = (
+        f"SELF-CONSISTENCY: {winning_votes}/{result['samples']} samples agree "
+        f"(confidence {result['confidence']:.2f}; votes: {votes})\n\n"
+        f"{result['explanation']}"
+    )
+    is_correct = answers_match(result["answer"], ground_answer) if ground_answer else False
+    return result["answer"], explanation, is_correct
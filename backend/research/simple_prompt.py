@@ -1,61 +1,98 @@
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from model.gemini import init_gemini_model
-from evaluator.base_evaluator import BaseEvaluator, main
+from model.gemini import init_async_gemini_model
+from model.structured import STRUCTURED_OUTPUT, ANSWER_SCHEMA, json_generation_config, parse_structured
+from telemetry.tracing import traced, timed_stage, PARSE_FAILURES
+from research.prompts import get_template
+from evaluator.grading import answers_match
 
 class SimplePromptReasoningService:
-    def __init__(self):
+    def __init__(self, structured_output=STRUCTURED_OUTPUT):
         # Configure the Gemini API
-        self.model = init_gemini_model()
+        self.model = init_async_gemini_model()
+        # Request schema-constrained JSON instead of the ANSWER:/EXPLANATION: text format
+        self.structured_output = structured_output
         
+    @traced("simple")
     def evaluate_reasoning_with_explanation(self, statement, ground_answer=None):
         try:
-            prompt = (
-                f"For the reasoning problem '{statement}', provide:\n"
-                "1. The answer (just the final answer without explanation, e.g., 'Yes', 'No', or a number)\n"
-                "2. A detailed step-by-step explanation of how to arrive at this answer\n"
-                f"3. Check if your answer '{ground_answer}' is numerically or semantically equivalent to the ground truth answer. Only respond with 'Yes' if they are EXACTLY equivalent, otherwise respond with 'No'.\n\n"
-                "Format your response exactly like this:\n"
-                "ANSWER: [your answer here]\n"
-                "EXPLANATION: [your detailed explanation here]\n"
-                "EQUIVALENT: [Yes or No - is your answer equivalent to the provided ground truth?]"
-            )
-            response = self.model.generate_content(prompt)
-            response_text = response.text.strip()
+            prompt = self._build_prompt(statement)
+            response = self.model.generate_content(prompt, generation_config=self._generation_config())
+            return self._parse_response(response.text.strip(), ground_answer)
             
-            # Parse response.
-            answer_part = response_text.split("ANSWER:", 1)
-            if len(answer_part) < 2:
-                return "Error: Invalid response format", "Error: Missing ANSWER section", False
-            
-            remaining = answer_part[1]
-            explanation_part = remaining.split("EXPLANATION:", 1)
-            if len(explanation_part) < 2:
-                return explanation_part[0].strip(), "Error: Missing EXPLANATION section", False
-            
-            answer = explanation_part[0].strip()
-            remaining = explanation_part[1]
-            
-            is_correct = False
-            if ground_answer:
-                equivalent_part = remaining.split("EQUIVALENT:", 1)
-                if len(equivalent_part) < 2:
-                    explanation = equivalent_part[0].strip()
-                    is_correct = False
-                else:
-                    explanation = equivalent_part[0].strip()
-                    equivalence_result = equivalent_part[1].strip().lower()
-                    is_correct = equivalence_result == "yes"
-            else:
-                explanation = remaining.strip()
-            
-            return answer, explanation, is_correct
+        except Exception as e:
+            return f"Error: {str(e)}", "Error: Failed to get response from AI model", False
+
+    @traced("simple")
+    async def evaluate_reasoning_with_explanation_async(self, statement, ground_answer=None):
+        """Async version of evaluate_reasoning_with_explanation for use from the API."""
+        try:
+            prompt = self._build_prompt(statement)
+            response = await self.model.generate_content_async(prompt, generation_config=self._generation_config())
+            return self._parse_response(response.text.strip(), ground_answer)
             
         except Exception as e:
             return f"Error: {str(e)}", "Error: Failed to get response from AI model", False
 
+    @traced("simple")
+    async def stream_reasoning_with_explanation(self, statement, ground_answer=None):
+        """
+        Async generator of streaming events: the raw response as "token" events while it is
+        generated, then a single "result" event with the parsed answer (or an "error" event).
+        Streaming always uses the text format, so the tokens stay readable.
+        """
+        try:
+            prompt = self._build_prompt(statement, structured=False)
+            yield {"event": "phase", "phase": "answer"}
+            chunks = []
+            async for text in self.model.stream_content_async(prompt):
+                chunks.append(text)
+                yield {"event": "token", "phase": "answer", "text": text}
+            answer, explanation, is_correct = self._parse_response("".join(chunks).strip(), ground_answer, structured=False)
+            yield {"event": "result", "answer": answer, "explanation": explanation, "correct": is_correct}
+            
+        except Exception as e:
+            yield {"event": "error", "detail": f"Error: {str(e)}"}
+
+    def _generation_config(self):
+        return json_generation_config(ANSWER_SCHEMA) if self.structured_output else None
+
+    @timed_stage("prompt_construction")
+    def _build_prompt(self, statement, structured=None):
+        name = "simple-json" if (self.structured_output if structured is None else structured) else "simple"
+        return get_template(name).render(statement=statement)
+
+    @timed_stage("response_parsing")
+    def _parse_response(self, response_text, ground_answer, structured=None):
+        if (self.structured_output if structured is None else structured):
+            data = parse_structured(response_text, ANSWER_SCHEMA)
+            answer, explanation = data["answer"].strip(), data["explanation"].strip()
+            is_correct = answers_match(answer, ground_answer) if ground_answer else False
+            return answer, explanation, is_correct
+        
+        # Parse response.
+        answer_part = response_text.split("ANSWER:", 1)
+        if len(answer_part) < 2:
+            PARSE_FAILURES.labels("simple", "text").inc()
+            return "Error: Invalid response format", "Error: Missing ANSWER section", False
+        
+        remaining = answer_part[1]
+        explanation_part = remaining.split("EXPLANATION:", 1)
+        if len(explanation_part) < 2:
+            PARSE_FAILURES.labels("simple", "text").inc()
+            return explanation_part[0].strip(), "Error: Missing EXPLANATION section", False
+        
+        answer = explanation_part[0].strip()
+        explanation = explanation_part[1].strip()
+        is_correct = answers_match(answer, ground_answer) if ground_answer else False
+        
+        return answer, explanation, is_correct
+
 if __name__ == "__main__":
+    # Imported here so the API never loads pandas or the evaluator.
+    from evaluator.base_evaluator import BaseEvaluator, main
+    
     reasoning_service = SimplePromptReasoningService()
     evaluator = BaseEvaluator(reasoning_service, eval_method="evaluate_reasoning_with_explanation")
     main(evaluator, dataset_file="reasoning_problems.csv", results_file="reasoning_results.csv")
@@ -0,0 +1,262 @@
+import time
+import inspect
+import threading
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram
+
+LATENCY_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+
+REQUESTS = Counter(
+    "reasoning_requests_total", "Reasoning requests handled", ["method", "outcome"]
+)
+REQUEST_SECONDS = Histogram(
+    "reasoning_request_seconds", "End-to-end reasoning request latency", ["method", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "reasoning_stage_seconds", "Time spent in each stage of a reasoning request", ["method", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+TOKENS = Counter(
+    "reasoning_tokens_total", "Model tokens used, from response usage metadata", ["method", "kind"]
+)
+PARSE_FAILURES = Counter(
+    "reasoning_parse_failures_total", "Model responses that did not match the expected format", ["method", "format"]
+)
+COALESCED = Counter(
+    "reasoning_coalesced_requests_total", "Requests served by joining an identical in-flight request", ["method"]
+)
+DEADLINE_STOPS = Counter(
+    "reasoning_deadline_stops_total",
+    "Work stopped early: stages skipped or cancelled at the deadline, partial answers, client disconnects",
+    ["method", "reason"]
+)
+HEDGED_CALLS = Counter(
+    "reasoning_hedged_calls_total",
+    "Duplicate model calls for slow calls: started, won (answered first), or not started (over_budget, rate_limited)",
+    ["method", "outcome"]
+)
+ADMISSION_ACTIVE = Gauge(
+    "reasoning_admission_active_requests", "Admitted requests currently running", ["method"]
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "reasoning_admission_queue_depth", "Requests waiting for a free slot", ["method"]
+)
+ADMISSION_WAIT_SECONDS = Histogram(
+    "reasoning_admission_wait_seconds", "Time admitted requests spent waiting for a slot", ["method"],
+    buckets=LATENCY_BUCKETS,
+)
+ADMISSION_REJECTED = Counter(
+    "reasoning_admission_rejected_total", "Requests rejected by admission control", ["method", "reason"]
+)
+RESPONSE_CACHE_LOOKUPS = Counter(
+    "reasoning_response_cache_lookups_total", "Response cache lookups by the tier that answered (memory, disk) or miss",
+    ["result"]
+)
+
+class RequestTrace:
+    """Timing spans and token counts collected for one reasoning request."""
+
+    def __init__(self, method):
+        self.method = method
+        self.started = time.perf_counter()
+        self.duration = None
+        self.outcome = None
+        self.stages = {}
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.cached_tokens = 0
+        self.model_calls = 0
+        self.templates = {}
+        # Why the answer is partial (a stage was skipped to meet the deadline), or None.
+        self.partial = None
+        # Threads started by map_in_threads share the trace, so updates go through the lock.
+        self._lock = threading.Lock()
+
+    def add_stage(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_template(self, template_id):
+        # A dict keeps the templates in first-use order without duplicates.
+        with self._lock:
+            self.templates[template_id] = None
+
+    def add_usage(self, prompt_tokens, output_tokens, cached_tokens):
+        """Count one model call and its tokens."""
+        with self._lock:
+            self.model_calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.output_tokens += output_tokens
+            self.cached_tokens += cached_tokens
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "method": self.method,
+                "outcome": self.outcome,
+                "latency_ms": round((self.duration or 0.0) * 1000, 1),
+                "prompt_tokens": self.prompt_tokens,
+                "output_tokens": self.output_tokens,
+                "cached_tokens": self.cached_tokens,
+                "model_calls": self.model_calls,
+                "prompt_templates": list(self.templates),
+                "partial": self.partial,
+                "stage_ms": {name: round(seconds * 1000, 1) for name, seconds in self.stages.items()},
+            }
+
+_current_trace = contextvars.ContextVar("reasoning_trace", default=None)
+_last_trace = contextvars.ContextVar("reasoning_last_trace", default=None)
+
+def current_trace():
+    return _current_trace.get()
+
+def last_trace():
+    """The most recently finished trace in this thread/task, or None."""
+    return _last_trace.get()
+
+def current_method():
+    trace = _current_trace.get()
+    return trace.method if trace is not None else "unknown"
+
+@contextmanager
+def stage(name):
+    """Time a block as a named stage of the current request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        trace = _current_trace.get()
+        STAGE_SECONDS.labels(current_method(), name).observe(elapsed)
+        if trace is not None:
+            trace.add_stage(name, elapsed)
+
+def timed_stage(name):
+    """Decorator form of stage() for synchronous helpers."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def map_in_threads(func, items, max_workers=None):
+    """
+    Run func over items concurrently on a thread pool and return the results in order.
+    Each call runs in a copy of the caller's context, so its stages and token counts are
+    recorded against the caller's request.
+    """
+    items = list(items)
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=max_workers or len(items)) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, func, item) for item in items]
+        return [future.result() for future in futures]
+
+def mark_partial(reason):
+    """Record that the current request is answered without one of its stages, and why."""
+    DEADLINE_STOPS.labels(current_method(), "partial").inc()
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.partial = reason
+
+def record_usage(response):
+    """
+    Count one model call and its token usage against the current request.
+    Prompt tokens served from a cached prefix are counted as cached, not as prompt tokens.
+    """
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = (getattr(usage, "prompt_token_count", 0) or 0) if usage is not None else 0
+    output_tokens = (getattr(usage, "candidates_token_count", 0) or 0) if usage is not None else 0
+    cached_tokens = (getattr(usage, "cached_content_token_count", 0) or 0) if usage is not None else 0
+    prompt_tokens = max(0, prompt_tokens - cached_tokens)
+    method = current_method()
+    TOKENS.labels(method, "prompt").inc(prompt_tokens)
+    TOKENS.labels(method, "output").inc(output_tokens)
+    TOKENS.labels(method, "cached").inc(cached_tokens)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_usage(prompt_tokens, output_tokens, cached_tokens)
+
+def _outcome(result):
+    answer = result[0] if isinstance(result, tuple) and result else result
+    return "error" if isinstance(answer, str) and answer.startswith("Error:") else "success"
+
+def _start(method):
+    trace = RequestTrace(method)
+    _last_trace.set(None)
+    return trace, _current_trace.set(trace)
+
+def _finish(trace, token, outcome):
+    trace.duration = time.perf_counter() - trace.started
+    trace.outcome = outcome
+    try:
+        _current_trace.reset(token)
+    except ValueError:
+        # An async generator closed from another context; nothing to restore there.
+        pass
+    _last_trace.set(trace)
+    REQUESTS.labels(trace.method, outcome).inc()
+    REQUEST_SECONDS.labels(trace.method, outcome).observe(trace.duration)
+
+def traced(method):
+    """
+    Decorator that records a service entry point as one request of the given method.
+    Works for plain functions, coroutines and async generators (streaming). Calls made while
+    a request is already being traced are folded into that request.
+    """
+    def decorator(func):
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def async_gen_wrapper(*args, **kwargs):
+                if _current_trace.get() is not None:
+                    async for event in func(*args, **kwargs):
+                        yield event
+                    return
+                trace, token = _start(method)
+                outcome = "exception"
+                try:
+                    async for event in func(*args, **kwargs):
+                        if event.get("event") == "error":
+                            outcome = "error"
+                        elif event.get("event") == "result":
+                            outcome = _outcome(event.get("answer"))
+                        yield event
+                finally:
+                    _finish(trace, token, outcome)
+            return async_gen_wrapper
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _current_trace.get() is not None:
+                    return await func(*args, **kwargs)
+                trace, token = _start(method)
+                outcome = "exception"
+                try:
+                    result = await func(*args, **kwargs)
+                    outcome = _outcome(result)
+                    return result
+                finally:
+                    _finish(trace, token, outcome)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is not None:
+                return func(*args, **kwargs)
+            trace, token = _start(method)
+            outcome = "exception"
+            try:
+                result = func(*args, **kwargs)
+                outcome = _outcome(result)
+                return result
+            finally:
+                _finish(trace, token, outcome)
+        return wrapper
+    return decorator
@@ -0,0 +1,12 @@
+import os
+import sys
+
+# Tests run offline against the fake backend, without the response cache or API quotas.
+os.environ.setdefault("GEMINI_BACKEND", "fake")
+os.environ.setdefault("FAKE_LATENCY", "fixed:0")
+os.environ.setdefault("GEMINI_CACHE_DISABLED", "1")
+os.environ.setdefault("GEMINI_CONTEXT_CACHE_DISABLED", "1")
+os.environ.setdefault("GEMINI_REQUESTS_PER_MINUTE", "0")
+os.environ.setdefault("GEMINI_TOKENS_PER_MINUTE", "0")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
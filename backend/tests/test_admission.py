@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from main import AdmissionController, parse_method_limits
+
+def test_parse_method_limits():
+    assert parse_method_limits("program-aided=4, Auto=8,") == {"program-aided": 4, "auto": 8}
+    assert parse_method_limits("") == {}
+
+def test_requests_beyond_the_limit_wait_and_get_the_released_slot_in_order():
+    async def run():
+        admission = AdmissionController(limit=1, method_limits={}, queue_size=4, max_queue_seconds=5)
+        release = await admission.acquire("simple")
+        order = []
+
+        async def queued(name):
+            release_next = await admission.acquire("simple")
+            order.append(name)
+            return release_next
+
+        first = asyncio.ensure_future(queued("first"))
+        second = asyncio.ensure_future(queued("second"))
+        await asyncio.sleep(0.01)
+        assert not order
+        release()
+        release_first = await first
+        assert order == ["first"]
+        release_first()
+        (await second)()
+        return admission, order
+
+    admission, order = asyncio.run(run())
+    assert order == ["first", "second"]
+    assert admission._active["simple"] == 0
+
+def test_a_full_queue_is_rejected_with_429():
+    async def run():
+        admission = AdmissionController(limit=1, method_limits={}, queue_size=1, max_queue_seconds=5)
+        await admission.acquire("simple")
+        waiting = asyncio.ensure_future(admission.acquire("simple"))
+        await asyncio.sleep(0)
+        try:
+            with pytest.raises(HTTPException) as rejected:
+                await admission.acquire("simple")
+        finally:
+            waiting.cancel()
+        return rejected.value
+
+    rejected = asyncio.run(run())
+    assert rejected.status_code == 429
+    assert int(rejected.headers["Retry-After"]) >= 1
+
+def test_a_long_expected_wait_is_rejected_with_503():
+    async def run():
+        admission = AdmissionController(limit=1, method_limits={}, queue_size=8, max_queue_seconds=1)
+        admission._service_seconds["simple"] = 3.0
+        await admission.acquire("simple")
+        with pytest.raises(HTTPException) as rejected:
+            await admission.acquire("simple")
+        return rejected.value
+
+    rejected = asyncio.run(run())
+    assert rejected.status_code == 503
+    assert rejected.headers["Retry-After"] == "3"
+
+def test_a_request_still_queued_after_max_wait_is_rejected_and_leaves_the_queue():
+    async def run():
+        admission = AdmissionController(limit=1, method_limits={}, queue_size=8, max_queue_seconds=5)
+        release = await admission.acquire("simple")
+        with pytest.raises(HTTPException) as rejected:
+            await admission.acquire("simple", max_wait=0.02)
+        assert not admission._waiters["simple"]
+        release()
+        return admission, rejected.value
+
+    admission, rejected = asyncio.run(run())
+    assert rejected.status_code == 503
+    assert admission._active["simple"] == 0
+
+def test_methods_have_separate_limits():
+    async def run():
+        admission = AdmissionController(limit=1, method_limits={"auto": 2}, queue_size=0, max_queue_seconds=5)
+        await admission.acquire("auto")
+        await admission.acquire("auto")
+        await admission.acquire("simple")
+        with pytest.raises(HTTPException):
+            await admission.acquire("auto")
+
+    asyncio.run(run())
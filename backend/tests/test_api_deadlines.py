@@ -0,0 +1,53 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+client = TestClient(main.app)
+
+@pytest.fixture
+def slow_model(monkeypatch):
+    """Make every fake model call take half a second."""
+    model = main.get_service("simple").model.model
+    monkeypatch.setattr(model, "_sample_latency", lambda rng: 0.5)
+    return model
+
+@pytest.mark.parametrize("method", ["cot-verification", "program-aided"])
+def test_self_consistency_past_its_deadline_is_a_504(slow_model, method):
+    response = client.post(f"/reasoning/{method}", json={
+        "statement": f"How many legs do {method} spiders have?", "samples": 3, "deadline_ms": 50,
+    })
+    assert response.status_code == 504
+    assert response.json()["detail"].startswith("Error: Deadline exceeded")
+
+@pytest.mark.parametrize("deadline_ms", [0, -5])
+def test_deadline_must_be_positive(deadline_ms):
+    response = client.post("/reasoning/simple", json={"statement": "Two plus two?", "deadline_ms": deadline_ms})
+    assert response.status_code == 422
+    response = client.post("/reasoning/compare", json={"statement": "Two plus two?", "deadline_ms": deadline_ms})
+    assert response.status_code == 422
+    response = client.get("/reasoning/simple/Two plus two?", params={"deadline_ms": deadline_ms})
+    assert response.status_code == 422
+
+def sse_events(response):
+    return [block.split("\n", 1)[0].removeprefix("event: ") for block in response.text.strip().split("\n\n")]
+
+def test_stream_ends_with_an_error_when_the_deadline_passes(slow_model):
+    response = client.post("/reasoning/simple/stream", json={"statement": "Slow stream?", "deadline_ms": 50})
+    assert response.status_code == 200
+    assert sse_events(response)[-1] == "error"
+    assert "Deadline exceeded" in response.text
+
+def test_stream_without_a_deadline_finishes():
+    response = client.post("/reasoning/simple/stream", json={"statement": "Two plus two?"})
+    assert sse_events(response)[-1] == "result"
+
+def test_stream_is_cut_off_between_chunks(slow_model):
+    response = client.post("/reasoning/simple/stream", json={"statement": "Long stream?", "deadline_ms": 400})
+    events = sse_events(response)
+    assert "token" in events
+    assert events[-1] == "error"
+
+def test_stream_within_its_deadline_finishes():
+    response = client.post("/reasoning/simple/stream", json={"statement": "Three plus three?", "deadline_ms": 5000})
+    assert sse_events(response)[-1] == "result"
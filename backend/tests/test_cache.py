@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+from model.cache import ResponseCache
+from model.fake import FakeGenerativeModel
+from model.gemini import AsyncGeminiModelWrapper
+
+def make_cache(tmp_path, **kwargs):
+    return ResponseCache(path=str(tmp_path / "responses.sqlite3"), **kwargs)
+
+def test_memory_tier_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(path=None, max_memory_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    make_cache(tmp_path).set("key", "answer")
+    cache = make_cache(tmp_path)
+    assert cache.get_memory("key") is None
+    assert cache.get("key") == "answer"
+    assert cache.stats()["disk_hits"] == 1
+    assert cache.get("key") == "answer"
+    assert cache.stats()["memory_hits"] == 1
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = make_cache(tmp_path, ttl_seconds=0.05)
+    cache.set("key", "answer")
+    time.sleep(0.1)
+    assert cache.get("key") is None
+    assert cache.stats()["misses"] == 1
+
+def test_disk_tier_is_trimmed_every_evict_interval_writes(tmp_path):
+    cache = make_cache(tmp_path, max_memory_entries=1, max_disk_entries=3, evict_interval=5)
+    for i in range(4):
+        cache.set(f"k{i}", str(i))
+    count = lambda: cache._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+    # Not trimmed yet: eviction only runs on every fifth write.
+    assert count() == 4
+    cache.set("k4", "4")
+    assert count() == 3
+    assert cache.get("k0") is None
+    assert cache.get("k4") == "4"
+
+def test_async_client_serves_repeated_prompts_from_the_cache(tmp_path):
+    cache = make_cache(tmp_path)
+    model = FakeGenerativeModel(latency="fixed:0")
+    client = AsyncGeminiModelWrapper(model, cache=cache)
+
+    async def ask_twice():
+        first = await client.generate_content_async("How many legs does a spider have?")
+        second = await client.generate_content_async("How many legs does a spider have?")
+        return first, second
+
+    first, second = asyncio.run(ask_twice())
+    assert second.text == first.text
+    assert getattr(second, "cached", False)
+    assert sum(model._calls.values()) == 1
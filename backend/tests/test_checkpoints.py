@@ -0,0 +1,78 @@
+import json
+import threading
+
+import pandas as pd
+
+from evaluator.base_evaluator import RESULT_COLUMNS, BaseEvaluator, iter_checkpoint, problem_hash
+
+class CountingService:
+    """Answers every problem with its ground truth and records which statements it was asked."""
+
+    def __init__(self):
+        self.asked = []
+        self._lock = threading.Lock()
+
+    def evaluate(self, statement, ground_answer):
+        with self._lock:
+            self.asked.append(statement)
+        return ground_answer, "Worked it out.", True
+
+def write_dataset(path, rows):
+    pd.DataFrame(rows, columns=["statement", "answer"]).to_csv(path, index=False)
+    return str(path)
+
+def test_evaluate_dataset_returns_a_dataframe(tmp_path):
+    dataset = write_dataset(tmp_path / "problems.csv", [("One plus one?", "2"), ("Two plus two?", "4")])
+    results = BaseEvaluator(CountingService(), "evaluate").evaluate_dataset(
+        dataset, results_file=str(tmp_path / "results.csv")
+    )
+    assert isinstance(results, pd.DataFrame)
+    assert list(results.columns) == RESULT_COLUMNS
+    assert results["correct"].tolist() == [True, True]
+
+def test_default_checkpoint_is_named_after_the_results_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "results_checkpoint.jsonl").write_text("someone else's run\n")
+    dataset = write_dataset(tmp_path / "problems.csv", [("One plus one?", "2")])
+    checkpoint = BaseEvaluator(CountingService(), "evaluate").evaluate_to_checkpoint(dataset, results_file="pal_results.csv")
+    assert checkpoint == "pal_results_checkpoint.jsonl"
+    assert (tmp_path / "results_checkpoint.jsonl").read_text() == "someone else's run\n"
+
+def test_resume_skips_problems_already_in_the_checkpoint(tmp_path):
+    checkpoint = str(tmp_path / "results_checkpoint.jsonl")
+    first = [("One plus one?", "2"), ("Two plus two?", "4")]
+    BaseEvaluator(CountingService(), "evaluate").evaluate_to_checkpoint(
+        write_dataset(tmp_path / "first.csv", first), checkpoint_file=checkpoint
+    )
+    service = CountingService()
+    BaseEvaluator(service, "evaluate", concurrency=4).evaluate_to_checkpoint(
+        write_dataset(tmp_path / "all.csv", first + [("Three plus three?", "6")]), checkpoint_file=checkpoint, resume=True
+    )
+    assert service.asked == ["Three plus three?"]
+    assert [record["ground_answer"] for record in iter_checkpoint(checkpoint)] == [2, 4, 6]
+
+def test_checkpoint_keeps_the_latest_copy_and_skips_a_truncated_line(tmp_path):
+    checkpoint = tmp_path / "checkpoint.jsonl"
+    records = [{"index": 1, "problem_hash": "b", "ai_answer": "old"}, {"index": 0, "problem_hash": "a", "ai_answer": "x"},
+               {"index": 1, "problem_hash": "b", "ai_answer": "new"}]
+    checkpoint.write_text("".join(json.dumps(record) + "\n" for record in records) + '{"index": 2, "probl')
+    assert [record["ai_answer"] for record in iter_checkpoint(str(checkpoint))] == ["x", "new"]
+
+def test_duplicate_statements_are_kept_apart(tmp_path):
+    rows = [("How many?", "3"), ("How many?", "5"), ("How many?", "3")]
+    service = CountingService()
+    results = BaseEvaluator(service, "evaluate").evaluate_dataset(
+        write_dataset(tmp_path / "problems.csv", rows), results_file=str(tmp_path / "results.csv")
+    )
+    assert len(service.asked) == 3
+    assert results["problem_hash"].nunique() == 3
+    assert problem_hash("How many?", "3") != problem_hash("How many?", "5")
+
+def test_evaluate_dataset_leaves_the_working_directory_alone(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "results_checkpoint.jsonl").write_text("someone else's run\n")
+    dataset = write_dataset(tmp_path / "problems.csv", [("One plus one?", "2")])
+    results = BaseEvaluator(CountingService(), "evaluate").evaluate_dataset(dataset)
+    assert results["correct"].tolist() == [True]
+    assert (tmp_path / "results_checkpoint.jsonl").read_text() == "someone else's run\n"
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["problems.csv", "results_checkpoint.jsonl"]
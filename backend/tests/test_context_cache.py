@@ -0,0 +1,54 @@
+import asyncio
+import threading
+
+from model.context_cache import ContextCache
+from model.fake import FakeGenerativeModel
+
+class SlowCachingModel:
+    """Stand-in whose prefix caching blocks until released, like a network call."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.created = 0
+
+    def with_cached_prefix(self, prefix):
+        self.release.wait(5)
+        self.created += 1
+        return ("cached", prefix)
+
+def test_prefix_is_cached_once_and_reused():
+    cache = ContextCache()
+    model = FakeGenerativeModel(latency="fixed:0")
+    first = cache.model_for(model, "Instructions.", "d1")
+    assert first is not None
+    assert cache.model_for(model, "Instructions.", "d1") is first
+    assert cache.stats() == {"hits": 1, "misses": 1, "prefixes": 1}
+
+def test_models_that_cannot_cache_send_prefixes_inline():
+    cache = ContextCache()
+    model = object()
+    assert cache.model_for(model, "Instructions.", "d1") is None
+    assert cache.model_for(model, "Instructions.", "d1") is None
+    assert cache.stats()["misses"] == 0
+
+def test_creation_runs_off_the_event_loop_without_holding_the_lock():
+    cache = ContextCache()
+    model = SlowCachingModel()
+
+    async def run():
+        creating = asyncio.ensure_future(cache.model_for_async(model, "Instructions.", "d1"))
+        await asyncio.sleep(0.05)
+        # The loop is free and other callers get an answer at once: send the prefix inline for now.
+        assert await cache.model_for_async(model, "Instructions.", "d1") is None
+        model.release.set()
+        return await creating
+
+    assert asyncio.run(run()) == ("cached", "Instructions.")
+    assert model.created == 1
+    assert cache.model_for(model, "Instructions.", "d1") == ("cached", "Instructions.")
+
+def test_live_prefixes_below_the_minimum_are_not_sent_to_the_api():
+    cache = ContextCache(min_tokens=32768)
+    LiveModel = type("GenerativeModel", (), {"__module__": "google.generativeai.generative_models"})
+    # A short prefix never reaches CachedContent.create (which would fail without an API key).
+    assert cache.model_for(LiveModel(), "Short instructions.", "d1") is None
@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+from model.deadline import Deadline, DeadlineExceeded, StageTimes, deadline_scope, ensure_time_for, remaining_seconds, stage_times
+from research.pal import PalReasoningService
+
+class RecordingSandbox:
+    timeout = 5.0
+
+    def __init__(self):
+        self.timeouts = []
+
+    def run(self, code, timeout=None, cancelled=None):
+        self.timeouts.append(timeout)
+        time.sleep(0.01)
+        return {"result": "4", "stdout": "4\n", "stderr": "", "exec_error": None, "call_error": None}
+
+def test_no_deadline_means_no_limit():
+    assert remaining_seconds() is None
+    assert remaining_seconds(3.0) == 3.0
+    ensure_time_for("never_recorded_stage")
+
+def test_remaining_time_is_capped_by_the_deadline():
+    with deadline_scope(Deadline.after_ms(200)):
+        assert 0 < remaining_seconds(5.0) <= 0.2
+        assert remaining_seconds(0.05) == 0.05
+    assert remaining_seconds() is None
+
+def test_stage_is_skipped_when_it_usually_takes_longer_than_the_time_left():
+    stage_times.record("test_slow_stage", 1.0)
+    with deadline_scope(Deadline.after_ms(100)):
+        ensure_time_for("test_fast_stage")
+        with pytest.raises(DeadlineExceeded):
+            ensure_time_for("test_slow_stage")
+        with pytest.raises(DeadlineExceeded):
+            ensure_time_for("test_fast_stage", min_seconds=0.5)
+
+def test_stage_times_are_a_moving_average():
+    times = StageTimes(weight=0.5)
+    assert times.expected("stage") == 0.0
+    times.record("stage", 1.0)
+    times.record("stage", 3.0)
+    assert times.expected("stage") == 2.0
+
+def test_program_runs_are_timed_and_capped_at_the_deadline():
+    service = PalReasoningService.__new__(PalReasoningService)
+    sandbox = RecordingSandbox()
+    stage_times._seconds.pop("code_execution", None)
+    service._run_program(sandbox, "def solve_problem():\n    return 4")
+    assert sandbox.timeouts == [5.0]
+    assert stage_times.expected("code_execution") > 0
+    with deadline_scope(Deadline.after_ms(1000)):
+        service._run_program(sandbox, "def solve_problem():\n    return 4")
+    assert sandbox.timeouts[1] <= 1.0
+
+def test_program_is_not_started_with_almost_no_time_left():
+    service = PalReasoningService.__new__(PalReasoningService)
+    sandbox = RecordingSandbox()
+    with deadline_scope(Deadline.after_ms(50)):
+        with pytest.raises(DeadlineExceeded):
+            service._run_program(sandbox, "def solve_problem():\n    return 4")
+    assert sandbox.timeouts == []
@@ -0,0 +1,62 @@
+import time
+import threading
+
+import pandas as pd
+
+from evaluator.base_evaluator import BaseEvaluator
+
+class SlowService:
+    """Takes a little while per problem, records peak concurrency and fails on request."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def evaluate(self, statement, ground_answer):
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            if "fail" in statement:
+                raise RuntimeError("model unavailable")
+            return ground_answer, "Worked it out.", True
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+def write_dataset(path, count):
+    pd.DataFrame({"statement": [f"Problem {i}?" for i in range(count)], "answer": [str(i) for i in range(count)]}).to_csv(path, index=False)
+    return str(path)
+
+def test_concurrency_bounds_problems_in_flight(tmp_path):
+    service = SlowService()
+    dataset = write_dataset(tmp_path / "problems.csv", 10)
+    results = BaseEvaluator(service, "evaluate", concurrency=3).evaluate_dataset(
+        dataset, results_file=str(tmp_path / "results.csv")
+    )
+    assert service.peak == 3
+    assert len(results) == 10
+    assert results["correct"].all()
+
+def test_concurrency_of_one_solves_sequentially(tmp_path):
+    service = SlowService(delay=0.01)
+    dataset = write_dataset(tmp_path / "problems.csv", 4)
+    results = BaseEvaluator(service, "evaluate", concurrency=1).evaluate_dataset(
+        dataset, results_file=str(tmp_path / "results.csv")
+    )
+    assert service.peak == 1
+    assert results["problem"].tolist() == [f"Problem {i}?" for i in range(4)]
+
+def test_a_failing_problem_does_not_abort_the_run(tmp_path):
+    dataset = tmp_path / "problems.csv"
+    pd.DataFrame({"statement": ["Problem 0?", "Please fail?", "Problem 2?"], "answer": ["0", "1", "2"]}).to_csv(dataset, index=False)
+    results = BaseEvaluator(SlowService(delay=0), "evaluate", concurrency=2).evaluate_dataset(
+        str(dataset), results_file=str(tmp_path / "results.csv")
+    )
+    assert len(results) == 3
+    failed = results[results["problem"] == "Please fail?"].iloc[0]
+    assert failed["ai_answer"].startswith("Error: model unavailable")
+    assert not failed["correct"]
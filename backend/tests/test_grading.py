@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+
+from evaluator.base_evaluator import BaseEvaluator, merge_checkpoints, iter_checkpoint
+from evaluator.grading import answers_match, grade_frame, normalize_answer
+
+@pytest.mark.parametrize("answer, ground", [
+    ("Seven", "7"),
+    ("7 horses", "7"),
+    ("The answer is 4.", "4"),
+    ("**4**", "4"),
+    ("$1,200", "1200"),
+    ("3/4", "0.75"),
+    ("True", "Yes"),
+    ("No, it does not follow.", "no"),
+    ("4 times", "4"),
+])
+def test_equivalent_answers_match(answer, ground):
+    assert answers_match(answer, ground)
+
+@pytest.mark.parametrize("answer, ground", [
+    ("4 is not correct", "4"),
+    ("4 or 5", "4"),
+    ("5", "4"),
+    ("", ""),
+    (None, "4"),
+    ("Not necessarily", "Yes"),
+])
+def test_different_answers_do_not_match(answer, ground):
+    assert not answers_match(answer, ground)
+
+def test_trailing_unit_words_are_dropped_but_statements_are_kept():
+    assert normalize_answer("7 vegetables in total") == "7"
+    assert normalize_answer("4 is wrong") == "4 is wrong"
+
+def test_vectorised_grading_agrees_with_the_scalar_rule():
+    pairs = [("Seven", 7), ("4 or 5", "4"), ("0.1", "1/10"), (None, "4"), ("yes", "True"), ("five", "6"), ("x", "x")]
+    frame = pd.DataFrame(pairs, columns=["ai_answer", "ground_answer"])
+    assert grade_frame(frame).tolist() == [answers_match(a, g) for a, g in pairs]
+
+class OverconfidentService:
+    """Claims every answer is right, so grading has to come from the evaluator."""
+
+    def evaluate(self, statement, ground_answer):
+        return "4 apples" if "apples" in statement else "no idea", "Guessed.", True
+
+def test_evaluate_dataset_grades_results_in_one_pass(tmp_path):
+    dataset = tmp_path / "problems.csv"
+    pd.DataFrame({"statement": ["How many apples?", "How many pears?"], "answer": ["4", "3"]}).to_csv(dataset, index=False)
+    results = BaseEvaluator(OverconfidentService(), "evaluate").evaluate_dataset(
+        str(dataset), results_file=str(tmp_path / "results.csv")
+    )
+    assert results["correct"].tolist() == [True, False]
+
+def test_merge_regrades_records(tmp_path):
+    dataset = tmp_path / "problems.csv"
+    pd.DataFrame({"statement": ["How many apples?", "How many pears?"], "answer": ["4", "3"]}).to_csv(dataset, index=False)
+    checkpoint = BaseEvaluator(OverconfidentService(), "evaluate").evaluate_to_checkpoint(
+        str(dataset), checkpoint_file=str(tmp_path / "shard_checkpoint.jsonl")
+    )
+    merged = merge_checkpoints([checkpoint], str(tmp_path / "merged.jsonl"))
+    assert [record["correct"] for record in iter_checkpoint(merged)] == [True, False]
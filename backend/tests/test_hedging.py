@@ -0,0 +1,77 @@
+import asyncio
+
+from model.fake import FakeResponse
+from model.gemini import AsyncGeminiModelWrapper
+from model.hedging import HedgePolicy
+from model.rate_limiter import RateLimiter
+
+KIND = ("unknown", "model_call")
+
+def warmed_policy(latency=0.01, samples=10, **kwargs):
+    policy = HedgePolicy(percentile=90, min_samples=samples, **kwargs)
+    for _ in range(samples):
+        policy.record(KIND, latency)
+    return policy
+
+class ScriptedModel:
+    """Async model whose calls take the given latencies in turn; records calls and cancellations."""
+
+    def __init__(self, *latencies):
+        self.latencies = list(latencies)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def generate_content_async(self, prompt, **kwargs):
+        latency = self.latencies[min(self.calls, len(self.latencies) - 1)]
+        self.calls += 1
+        try:
+            await asyncio.sleep(latency)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return FakeResponse(f"answer after {latency}s", prompt)
+
+def test_no_hedging_until_there_is_enough_history():
+    policy = HedgePolicy(min_samples=3)
+    policy.record(KIND, 0.1)
+    assert policy.hedge_delay(KIND) is None
+    policy.record(KIND, 0.2)
+    policy.record(KIND, 0.3)
+    assert policy.hedge_delay(KIND) == 0.3
+    assert policy.hedge_delay(("unknown", "other")) is None
+
+def test_hedges_stay_within_the_budget():
+    policy = warmed_policy(budget=0.25)
+    started = 0
+    for _ in range(100):
+        policy.hedge_delay(KIND)
+        started += policy.try_hedge("simple")
+    assert started == 25
+    assert policy.stats()["hedge_rate"] == 0.25
+
+def test_a_hedge_needs_a_free_rate_limit_slot():
+    policy = warmed_policy(budget=1.0)
+    limiter = RateLimiter(requests_per_minute=1, tokens_per_minute=0)
+    limiter.reserve()
+    policy.hedge_delay(KIND)
+    assert not policy.try_hedge("simple", limiter)
+    # The credit was not spent, so the hedge can go ahead once the limiter allows it.
+    assert policy.try_hedge("simple", RateLimiter(requests_per_minute=0, tokens_per_minute=0))
+
+def test_a_slow_call_is_hedged_and_the_faster_answer_wins():
+    model = ScriptedModel(2.0, 0.01)
+    policy = warmed_policy(budget=1.0)
+    client = AsyncGeminiModelWrapper(model, hedging=policy)
+    response = asyncio.run(asyncio.wait_for(client.generate_content_async("Slow prompt", use_cache=False), 1.0))
+    assert response.text == "answer after 0.01s"
+    assert model.calls == 2
+    assert model.cancelled == 1
+    assert policy.stats()["hedges"] == 1 and policy.stats()["wins"] == 1
+
+def test_a_fast_call_is_not_hedged():
+    model = ScriptedModel(0.001)
+    policy = warmed_policy(latency=0.5, budget=1.0)
+    client = AsyncGeminiModelWrapper(model, hedging=policy)
+    asyncio.run(client.generate_content_async("Fast prompt", use_cache=False))
+    assert model.calls == 1
+    assert policy.stats()["hedges"] == 0
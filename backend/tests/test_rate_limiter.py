@@ -0,0 +1,54 @@
+import pytest
+
+from model.rate_limiter import RateLimiter, backoff_delay, is_rate_limit_error, parse_retry_after
+
+def test_requests_beyond_the_budget_are_paced():
+    limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=0)
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == 0
+    # The bucket is empty: the next call waits for one request's worth of refill (30s at 2 RPM).
+    assert limiter.reserve() == pytest.approx(30, abs=0.1)
+    assert limiter.reserve() == pytest.approx(60, abs=0.1)
+
+def test_token_budget_is_settled_against_real_usage():
+    limiter = RateLimiter(requests_per_minute=0, tokens_per_minute=600)
+    assert limiter.reserve(tokens=600) == 0
+    assert limiter.reserve(tokens=60) == pytest.approx(6, abs=0.1)
+    # The call really used 10 tokens, so 50 go back and the next small call need not wait as long.
+    limiter.record_success(60, actual_tokens=10)
+    assert limiter.reserve(tokens=10) == pytest.approx(2, abs=0.1)
+
+def test_rate_limited_pauses_every_caller_and_cuts_the_rate():
+    limiter = RateLimiter(requests_per_minute=100, tokens_per_minute=0)
+    limiter.record_rate_limited(5)
+    assert limiter.reserve() == pytest.approx(5, abs=0.1)
+    assert limiter.effective_rpm == pytest.approx(70)
+    assert limiter.stats()["rate_limited_count"] == 1
+    for _ in range(20):
+        limiter.record_success(1)
+    assert limiter.effective_rpm == 100
+
+def test_try_reserve_refunds_when_budget_is_not_available():
+    limiter = RateLimiter(requests_per_minute=1, tokens_per_minute=0)
+    assert limiter.try_reserve()
+    assert not limiter.try_reserve()
+    assert not limiter.try_reserve()
+    # Failed attempts must not queue up: a regular caller still waits a single interval.
+    assert limiter.reserve() == pytest.approx(60, abs=0.1)
+
+def test_try_reserve_fails_while_paused():
+    limiter = RateLimiter(requests_per_minute=0, tokens_per_minute=0)
+    assert limiter.try_reserve()
+    limiter.record_rate_limited(5)
+    assert not limiter.try_reserve()
+
+def test_retry_hints_and_backoff():
+    error = Exception("429 Resource has been exhausted. Please retry in 7.5s")
+    assert is_rate_limit_error(error)
+    assert not is_rate_limit_error(ValueError("bad prompt"))
+    assert parse_retry_after(error) == 7.5
+    assert parse_retry_after(Exception("retry_delay { seconds: 12 }")) == 12
+    assert parse_retry_after(Exception("boom")) is None
+    for attempt in range(1, 6):
+        assert 0 <= backoff_delay(attempt, base_delay=1.0, max_delay=8) <= min(8, 2 ** (attempt - 1))
+    assert backoff_delay(1, base_delay=1.0, retry_after=10) >= 10
@@ -0,0 +1,55 @@
+import json
+import sqlite3
+
+import pytest
+
+from evaluator.results_store import ResultsStore, RunExistsError
+
+def write_checkpoint(path, answers):
+    with open(path, "w", encoding="utf-8") as f:
+        for index, (answer, correct) in enumerate(answers):
+            f.write(json.dumps({
+                "index": index, "method": "simple", "problem_hash": f"h{index}", "problem": f"Problem {index}",
+                "ground_answer": "4", "ai_answer": answer, "correct": correct,
+                "ai_explanation": "Counted them.", "ground_explanation": "There are four.",
+            }) + "\n")
+    return str(path)
+
+def test_import_adds_a_run_with_its_accuracy(tmp_path):
+    store = ResultsStore(":memory:")
+    run_id = store.import_checkpoint(write_checkpoint(tmp_path / "a.jsonl", [("4", True), ("5", False)]))
+    [run] = store.runs()
+    assert run["run_id"] == run_id and run["problems"] == 2 and run["correct"] == 1
+    assert [row["ai_explanation"] for row in store.iter_run(run_id)] == ["Counted them.", "Counted them."]
+
+def test_an_existing_run_id_is_rejected_and_left_unchanged(tmp_path):
+    store = ResultsStore(":memory:")
+    store.import_checkpoint(write_checkpoint(tmp_path / "a.jsonl", [("4", True)]), run_id="nightly")
+    with pytest.raises(RunExistsError):
+        store.import_checkpoint(write_checkpoint(tmp_path / "b.jsonl", [("5", False), ("6", False)]), run_id="nightly")
+    [run] = store.runs()
+    assert (run["problems"], run["correct"]) == (1, 1)
+    assert [row["ai_answer"] for row in store.iter_run("nightly")] == ["4"]
+
+def test_duplicate_result_rows_fail_loudly():
+    store = ResultsStore(":memory:")
+    row = store._row("run", "simple", {"problem_hash": "h0", "problem": "p", "correct": True})
+    with pytest.raises(sqlite3.IntegrityError):
+        store._insert([row, row])
+
+def test_regressions_lists_problems_that_became_wrong(tmp_path):
+    store = ResultsStore(":memory:")
+    base = store.import_checkpoint(write_checkpoint(tmp_path / "a.jsonl", [("4", True), ("4", True)]))
+    new = store.import_checkpoint(write_checkpoint(tmp_path / "b.jsonl", [("4", True), ("3", False)]))
+    assert [row["problem"] for row in store.regressions(base, new)] == ["Problem 1"]
+
+def test_runs_are_read_back_a_batch_at_a_time(tmp_path, monkeypatch):
+    monkeypatch.setattr("evaluator.results_store.FETCH_BATCH_SIZE", 2)
+    store = ResultsStore(":memory:")
+    run_id = store.import_checkpoint(write_checkpoint(tmp_path / "a.jsonl", [(str(i), i % 2 == 0) for i in range(5)]))
+    rows = store.iter_run(run_id)
+    assert next(rows)["ai_answer"] == "0"
+    # Another query on the shared connection while the run is being read.
+    assert store.has_run(run_id)
+    assert [row["ai_answer"] for row in rows] == ["1", "2", "3", "4"]
+    assert store.export_csv(run_id, str(tmp_path / "run.csv")) == 5
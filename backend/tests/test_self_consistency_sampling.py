@@ -0,0 +1,47 @@
+import pytest
+
+from model.deadline import DeadlineExceeded
+from model.fake import FakeGenerativeModel
+from model.gemini import GeminiModelWrapper, is_candidate_count_rejection
+
+class InvalidArgument(Exception):
+    pass
+
+class RejectingModel(FakeGenerativeModel):
+    """Fake model that fails every call asking for several candidates with the given error."""
+
+    def __init__(self, error):
+        super().__init__(latency="fixed:0")
+        self.error = error
+
+    def generate_content(self, prompt, generation_config=None, **kwargs):
+        if (generation_config or {}).get("candidate_count", 1) > 1:
+            raise self.error
+        return super().generate_content(prompt, generation_config=generation_config, **kwargs)
+
+def test_candidates_come_from_one_call():
+    model = FakeGenerativeModel(latency="fixed:0")
+    client = GeminiModelWrapper(model)
+    assert len(client.generate_candidates("Pick a digit.", 4)) == 4
+    assert sum(model._calls.values()) == 1
+
+def test_invalid_candidate_count_falls_back_to_separate_calls_for_good():
+    client = GeminiModelWrapper(RejectingModel(InvalidArgument("400 candidate_count must be 1 for this model")))
+    assert len(client.generate_candidates("Pick a digit.", 3)) == 3
+    assert client.candidate_count_supported is False
+
+@pytest.mark.parametrize("error", [
+    DeadlineExceeded("Deadline exceeded: 10 ms left"),
+    Exception("503 The service is currently unavailable."),
+    ConnectionError("Connection reset by peer"),
+])
+def test_other_errors_do_not_disable_candidate_count(error):
+    client = GeminiModelWrapper(RejectingModel(error))
+    with pytest.raises(type(error)):
+        client.generate_candidates("Pick a digit.", 3)
+    assert client.candidate_count_supported is True
+
+def test_rejection_needs_an_invalid_argument_naming_candidate_count():
+    assert is_candidate_count_rejection(InvalidArgument("Unsupported candidateCount"))
+    assert not is_candidate_count_rejection(InvalidArgument("400 prompt is empty"))
+    assert not is_candidate_count_rejection(TimeoutError("candidate_count request timed out"))
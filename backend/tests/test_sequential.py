@@ -0,0 +1,82 @@
+import random
+
+import pandas as pd
+import pytest
+
+from evaluator.base_evaluator import BaseEvaluator, iter_checkpoint
+from evaluator.sequential import accuracy_interval, difference_interval, mcnemar_p_value, stratified_order
+
+def problems(counts):
+    labelled = [(f"{category}-{i}", category) for category, count in counts.items() for i in range(count)]
+    return [(index, digest, category) for index, (digest, category) in enumerate(labelled)]
+
+def test_stratified_order_keeps_categories_in_proportion():
+    rows = problems({"counting": 30, "logic": 10})
+    order = stratified_order(rows, seed=1)
+    assert sorted(order) == list(range(40))
+    categories = [rows[index][2] for index in order]
+    for drawn in (4, 8, 20):
+        assert categories[:drawn].count("logic") == drawn // 4
+
+def test_stratified_order_is_seeded_and_independent_of_row_order():
+    rows = problems({"counting": 12, "logic": 5})
+    digests = lambda order, table: [table[index][1] for index in order]
+    shuffled = rows[:]
+    random.Random(3).shuffle(shuffled)
+    shuffled = [(position, digest, category) for position, (_, digest, category) in enumerate(shuffled)]
+    assert digests(stratified_order(rows, 7), rows) == digests(stratified_order(shuffled, 7), shuffled)
+    assert stratified_order(rows, 7) != stratified_order(rows, 8)
+
+def test_interval_narrows_to_zero_once_the_dataset_is_exhausted():
+    outcomes = [("a", True), ("a", False), ("b", True), ("b", True)]
+    partial = accuracy_interval(outcomes, {"a": 4, "b": 4})
+    full = accuracy_interval(outcomes, {"a": 2, "b": 2})
+    assert full["estimate"] == pytest.approx(0.75)
+    assert full["half_width"] == 0
+    assert partial["half_width"] > 0
+    assert not accuracy_interval([("a", True)], {"a": 4, "b": 4})["complete"]
+
+def test_paired_difference_and_mcnemar():
+    pairs = [("a", True, False)] * 5 + [("a", True, True)] * 5
+    result = difference_interval(pairs)
+    assert result["estimate"] == pytest.approx(0.5)
+    assert (result["only_first"], result["only_second"]) == (5, 0)
+    assert result["p_value"] == pytest.approx(0.0625)
+    assert mcnemar_p_value(0, 0) == 1.0
+    assert mcnemar_p_value(3, 3) == 1.0
+
+class RightService:
+    def evaluate(self, statement, ground_answer):
+        return ground_answer, "Worked it out.", True
+
+class WrongOnLogicService:
+    def evaluate(self, statement, ground_answer):
+        return ("wrong" if "logic" in statement else ground_answer), "Guessed.", "logic" not in statement
+
+def write_dataset(path, counts):
+    rows = [(f"{category} problem {i}?", str(i), category) for category, count in counts.items() for i in range(count)]
+    pd.DataFrame(rows, columns=["statement", "answer", "category"]).to_csv(path, index=False)
+    return str(path)
+
+def test_sequential_run_stops_once_the_interval_is_narrow_enough(tmp_path):
+    dataset = write_dataset(tmp_path / "problems.csv", {"counting": 150, "logic": 50})
+    result = BaseEvaluator(RightService(), "evaluate", concurrency=1).evaluate_sequential(
+        dataset, half_width=0.1, min_problems=10, results_file=str(tmp_path / "results.csv")
+    )
+    assert 10 <= result["problems"] < 200
+    assert result["half_width"] <= 0.1
+    assert result["estimate"] == 1.0
+    assert len(list(iter_checkpoint(str(tmp_path / "results_checkpoint.jsonl")))) == result["problems"]
+
+def test_sequential_comparison_runs_both_methods_on_the_same_problems(tmp_path):
+    dataset = write_dataset(tmp_path / "problems.csv", {"counting": 30, "logic": 10})
+    result = BaseEvaluator(RightService(), "evaluate", concurrency=2).evaluate_sequential(
+        dataset, half_width=0.0, compare_with=BaseEvaluator(WrongOnLogicService(), "evaluate"),
+        results_file=str(tmp_path / "results.csv")
+    )
+    assert result["problems"] == 40
+    assert result["estimate"] == pytest.approx(0.25)
+    assert (result["only_first"], result["only_second"]) == (10, 0)
+    first = [record["problem_hash"] for record in iter_checkpoint(str(tmp_path / "results_checkpoint.jsonl"))]
+    second = [record["problem_hash"] for record in iter_checkpoint(str(tmp_path / "results_compared_checkpoint.jsonl"))]
+    assert first == second
@@ -0,0 +1,53 @@
+import argparse
+
+import pandas as pd
+import pytest
+
+from evaluator.base_evaluator import (
+    BaseEvaluator, in_shard, iter_checkpoint, merge_checkpoints, parse_shard, shard_checkpoint_path,
+)
+
+STATEMENTS = [f"What is {i} plus {i}?" for i in range(40)]
+
+class EchoService:
+    def evaluate(self, statement, ground_answer):
+        return ground_answer, "Added them.", True
+
+def test_every_problem_lands_in_exactly_one_shard():
+    for statement in STATEMENTS:
+        assert sum(in_shard(statement, (index, 4)) for index in range(4)) == 1
+    assert all(in_shard(statement, None) for statement in STATEMENTS)
+
+def test_worker_subshards_split_their_parent_shard():
+    # Worker w of shard i/N runs shard i+N*w of N*K; together they hold exactly shard i/N.
+    index, count, workers = 1, 3, 2
+    for statement in STATEMENTS:
+        in_subshards = [in_shard(statement, (index + count * w, count * workers)) for w in range(workers)]
+        assert sum(in_subshards) == in_shard(statement, (index, count))
+
+def test_parse_shard():
+    assert parse_shard("2/4") == (2, 4)
+    for value in ("4/4", "-1/4", "0/0", "a/b", "3"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_shard(value)
+
+def test_merged_shards_match_a_single_run_in_dataset_order(tmp_path):
+    dataset = tmp_path / "problems.csv"
+    pd.DataFrame({"statement": STATEMENTS, "answer": [str(2 * i) for i in range(40)]}).to_csv(dataset, index=False)
+    results_file = str(tmp_path / "results.csv")
+    evaluator = BaseEvaluator(EchoService(), "evaluate", concurrency=4)
+    checkpoints = [
+        evaluator.evaluate_to_checkpoint(
+            str(dataset), checkpoint_file=shard_checkpoint_path(results_file, (index, 2)), shard=(index, 2)
+        )
+        for index in range(2)
+    ]
+    merged = list(iter_checkpoint(merge_checkpoints(checkpoints, str(tmp_path / "merged.jsonl"))))
+    assert [record["problem"] for record in merged] == STATEMENTS
+    assert [record["index"] for record in merged] == list(range(40))
+    assert all(record["correct"] for record in merged)
+
+def test_merge_refuses_missing_shards(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        merge_checkpoints([str(tmp_path / "results_shard0of2_checkpoint.jsonl")], str(tmp_path / "merged.jsonl"))
+    assert not (tmp_path / "merged.jsonl").exists()
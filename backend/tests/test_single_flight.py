@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from main import SingleFlight
+
+def test_concurrent_calls_with_the_same_key_share_one_computation():
+    calls = []
+
+    async def solve():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "4"
+
+    async def run():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("same", solve) for _ in range(5)))
+        return flight, results
+
+    flight, results = asyncio.run(run())
+    assert len(calls) == 1
+    assert [answer for answer, _ in results] == ["4"] * 5
+    assert sorted(coalesced for _, coalesced in results) == [False] + [True] * 4
+    assert len(flight) == 0
+
+def test_different_keys_and_later_calls_run_separately():
+    calls = []
+
+    async def solve():
+        calls.append(1)
+        await asyncio.sleep(0)
+        return len(calls)
+
+    async def run():
+        flight = SingleFlight()
+        await asyncio.gather(flight.do("a", solve), flight.do("b", solve))
+        return await flight.do("a", solve)
+
+    assert asyncio.run(run()) == (3, False)
+
+def test_errors_reach_every_waiter():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("model unavailable")
+
+    async def run():
+        flight = SingleFlight()
+        return await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(run()))
+
+def test_shared_work_is_cancelled_only_when_every_caller_has_gone():
+    cancelled = []
+
+    async def run():
+        flight = SingleFlight()
+        gate = asyncio.Event()
+
+        async def solve():
+            try:
+                await gate.wait()
+                return "done"
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+
+        first = asyncio.ensure_future(flight.do("k", solve))
+        second = asyncio.ensure_future(flight.do("k", solve))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        assert not cancelled
+        gate.set()
+        assert await second == ("done", True)
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+        gate.clear()
+        third = asyncio.ensure_future(flight.do("other", solve))
+        await asyncio.sleep(0)
+        third.cancel()
+        await asyncio.sleep(0.01)
+        return flight
+
+    flight = asyncio.run(run())
+    assert cancelled == [1]
+    assert len(flight) == 0
@@ -0,0 +1,26 @@
+from types import SimpleNamespace
+
+from telemetry.tracing import last_trace, map_in_threads, record_usage, stage, traced
+
+def response(prompt_tokens, output_tokens):
+    return SimpleNamespace(usage_metadata=SimpleNamespace(
+        prompt_token_count=prompt_tokens, candidates_token_count=output_tokens, cached_content_token_count=0
+    ))
+
+@traced("self-consistency-test")
+def verify_concurrently(samples, calls_per_sample):
+    def verify(_):
+        for _ in range(calls_per_sample):
+            with stage("verification"):
+                record_usage(response(3, 2))
+    map_in_threads(verify, range(samples))
+    return "4", "Counted them.", True
+
+def test_threads_sharing_a_trace_do_not_lose_counts():
+    verify_concurrently(16, 500)
+    usage = last_trace().as_dict()
+    assert usage["model_calls"] == 16 * 500
+    assert usage["prompt_tokens"] == 3 * 16 * 500
+    assert usage["output_tokens"] == 2 * 16 * 500
+    assert usage["outcome"] == "success"
+    assert "verification" in usage["stage_ms"]
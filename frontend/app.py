@@ -1,12 +1,232 @@
 import streamlit as st
 import requests
 import os
-import urllib.parse
+import json
+import threading
+from collections import OrderedDict
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 
 # Load environment variables
 load_dotenv()
 API_URL = os.getenv("API_URL", "http://localhost:8000")
+# Seconds to wait for the backend (for streams: between chunks) before giving up.
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "120"))
+# Solved problems kept in memory so reruns and repeat clicks do not call the backend again.
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "128"))
+
+# Methods whose reasoning is streamed token by token from /reasoning/{method}/stream
+STREAMING_METHODS = ["simple", "cot-verification"]
+# Methods shown side by side in compare mode
+COMPARE_METHODS = ["simple", "cot-verification", "program-aided"]
+METHOD_TITLES = {
+    "simple": "Simple",
+    "cot-verification": "CoT Verification",
+    "program-aided": "Program-Aided",
+    "auto": "Auto"
+}
+PHASE_TITLES = {
+    "answer": "Model Response",
+    "reasoning": "Step-by-Step Reasoning",
+    "verification": "Verification"
+}
+
+@st.cache_resource
+def get_session():
+    """One pooled HTTP session shared by every rerun and browser session."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+class ResultCache:
+    """Small thread-safe LRU of solved results, keyed on (method, problem, ground truth)."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def set(self, key, result):
+        # Failed solves are never cached, so trying again really retries.
+        if result.get("answer") and str(result["answer"]).startswith("Error:"):
+            return
+        with self.lock:
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+@st.cache_resource
+def get_result_cache():
+    return ResultCache(RESULT_CACHE_SIZE)
+
+def error_detail(response):
+    """The API's error detail, or the raw body if it is not JSON."""
+    try:
+        return response.json().get("detail", response.text)
+    except ValueError:
+        return response.text
+
+def iter_sse_events(response):
+    """Parse a text/event-stream response into (event, data) pairs."""
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+
+def render_result(result, ground_truth):
+    """Display a solved problem: answer, ground truth comparison and explanation."""
+    st.success("Problem solved!")
+    
+    # Problem and answer
+    st.markdown("### Problem")
+    st.write(result['problem'])
+    
+    st.markdown("### AI's Answer")
+    st.write(result['answer'])
+    if result.get('tier'):
+        route = " → ".join(step['method'] for step in result.get('route', []))
+        st.caption(f"Answered by {result['tier']} (route: {route}; {result.get('model_calls')} model calls, {result.get('latency_ms', 0):.0f} ms)")
+    
+    # Only show ground truth comparison if we have one
+    if ground_truth:
+        st.markdown("### Ground Truth")
+        st.write(ground_truth)
+        
+        if result.get('correct') is not None:
+            if result['correct']:
+                st.success("✓ AI's answer matches ground truth")
+            else:
+                st.error("✗ AI's answer does not match ground truth")
+    
+    # Show the explanation
+    st.markdown("### Explanation")
+    # Use a container with scrolling for long explanations
+    with st.container():
+        st.markdown(f"<div style='height: 300px; overflow-y: scroll;'>{result['explanation']}</div>", unsafe_allow_html=True)
+
+def solve_streaming(method, problem, ground_truth):
+    """Solve via the SSE endpoint, rendering each phase's text as it arrives. Returns the final result."""
+    post_data = {
+        "statement": problem,
+        "ground_truth": ground_truth if ground_truth else None
+    }
+    response = get_session().post(f"{API_URL}/reasoning/{method}/stream", json=post_data, stream=True, timeout=API_TIMEOUT)
+    if response.status_code != 200:
+        st.error(f"Error {response.status_code}: {error_detail(response)}")
+        return None
+    
+    placeholders = {}
+    texts = {}
+    for event, data in iter_sse_events(response):
+        if event == "phase":
+            phase = data["phase"]
+            st.markdown(f"#### {PHASE_TITLES.get(phase, phase.title())}")
+            placeholders[phase] = st.empty()
+            texts[phase] = ""
+        elif event == "token":
+            phase = data["phase"]
+            texts[phase] = texts.get(phase, "") + data["text"]
+            if phase in placeholders:
+                placeholders[phase].markdown(texts[phase])
+        elif event == "result":
+            if data["answer"] and str(data["answer"]).startswith("Error:"):
+                st.error(data["answer"])
+            else:
+                render_result(data, ground_truth)
+            return data
+        elif event == "error":
+            st.error(data["detail"])
+    return None
+
+def render_compare_column(result, ground_truth):
+    """Display one method's result inside its comparison column."""
+    if "error" in result:
+        st.error(result["error"])
+        return
+    st.write(result["answer"])
+    if ground_truth and result.get("correct") is not None:
+        if result["correct"]:
+            st.success("✓ Matches ground truth")
+        else:
+            st.error("✗ Does not match")
+    if result.get("latency_ms") is not None:
+        st.caption(f"{result['latency_ms']:.0f} ms · {result.get('model_calls')} model calls · "
+                   f"{(result.get('prompt_tokens') or 0) + (result.get('output_tokens') or 0)} tokens")
+    with st.expander("Explanation"):
+        st.markdown(result["explanation"])
+
+def solve_compare(problem, ground_truth, cache):
+    """
+    Run every method on the problem side by side. The backend solves them concurrently and
+    streams each result as it finishes; each column is filled in as soon as its method is done.
+    Methods already in the result cache are not sent again.
+    """
+    columns = dict(zip(COMPARE_METHODS, st.columns(len(COMPARE_METHODS))))
+    placeholders = {}
+    pending = []
+    for method, column in columns.items():
+        column.markdown(f"#### {METHOD_TITLES[method]}")
+        placeholders[method] = column.empty()
+        result = cache.get((method, problem, ground_truth))
+        if result is not None:
+            with placeholders[method].container():
+                render_compare_column(result, ground_truth)
+        else:
+            placeholders[method].info("Thinking...")
+            pending.append(method)
+    if not pending:
+        return
+    
+    post_data = {
+        "statement": problem,
+        "ground_truth": ground_truth if ground_truth else None,
+        "methods": pending
+    }
+    response = get_session().post(f"{API_URL}/reasoning/compare", json=post_data, stream=True, timeout=API_TIMEOUT)
+    if response.status_code != 200:
+        st.error(f"Error {response.status_code}: {error_detail(response)}")
+        return
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            continue
+        result = json.loads(line)
+        with placeholders[result["method"]].container():
+            render_compare_column(result, ground_truth)
+        if "error" not in result:
+            cache.set((result["method"], problem, ground_truth), result)
+
+def solve(method, problem, ground_truth):
+    """Solve with a single POST; returns the result, or None after showing the error."""
+    post_data = {
+        "statement": problem,
+        "ground_truth": ground_truth if ground_truth else None
+    }
+    with st.spinner("Thinking..."):
+        response = get_session().post(f"{API_URL}/reasoning/{method}", json=post_data, timeout=API_TIMEOUT)
+    if response.status_code != 200:
+        st.error(f"Error {response.status_code}: {error_detail(response)}")
+        return None
+    result = response.json()
+    render_result(result, ground_truth)
+    return result
 
 st.title("Reasoning Methods Evaluator")
 st.markdown("Test different reasoning approaches on logical reasoning problems")
@@ -15,9 +235,11 @@ st.markdown("Test different reasoning approaches on logical reasoning problems")
 st.sidebar.header("Reasoning Method")
 method = st.sidebar.radio(
     "Select a reasoning method:",
-    ["simple", "cot-verification", "program-aided"]
+    ["simple", "cot-verification", "program-aided", "auto"]
 )
 
+compare_all = st.sidebar.checkbox("Compare all methods side by side")
+
 # Display description based on selection
 if method == "simple":
     st.sidebar.info("Basic prompting that directly asks for an answer and explanation.")
@@ -25,6 +247,8 @@ elif method == "cot-verification":
     st.sidebar.info("Chain-of-Thought with Verification: Step-by-step reasoning followed by self-verification to catch errors.")
 elif method == "program-aided":
     st.sidebar.info("Program-Aided: Uses code generation and execution to solve the problem programmatically.")
+elif method == "auto":
+    st.sidebar.info("Auto: Starts with the cheapest suitable method and escalates to CoT or Program-Aided only when the answer looks unreliable.")
 
 # Example problems in session state for persistence
 if 'problem' not in st.session_state:
@@ -61,88 +285,35 @@ ground_truth = ""
 if st.button("Solve Problem"):
     if problem:
         try:
-            with st.spinner("Thinking..."):
-                # Create the API URL with the encoded problem
-                encoded_problem = urllib.parse.quote(problem)
-                
-                # Set ground truth based on the problem if it's one of our examples
-                if "CRANBERRY" in problem:
-                    ground_truth = "3"
-                elif "six horses" in problem:
-                    ground_truth = "Race them on a single race track with at least six lanes"
-                elif "cats are mammals" in problem:
-                    ground_truth = "No"
-                elif "potatoes" in problem and "cauliflower" in problem and "vegetables" in problem:
-                    ground_truth = "7"
-                
-                # Try the GET endpoint first (as per original code)
-                if ground_truth:
-                    url = f"{API_URL}/reasoning/{method}/{encoded_problem}?ground_truth={urllib.parse.quote(ground_truth)}"
+            # Set ground truth based on the problem if it's one of our examples
+            if "CRANBERRY" in problem:
+                ground_truth = "3"
+            elif "six horses" in problem:
+                ground_truth = "Race them on a single race track with at least six lanes"
+            elif "cats are mammals" in problem:
+                ground_truth = "No"
+            elif "potatoes" in problem and "cauliflower" in problem and "vegetables" in problem:
+                ground_truth = "7"
+            
+            cache = get_result_cache()
+            if compare_all:
+                solve_compare(problem, ground_truth, cache)
+            else:
+                key = (method, problem, ground_truth)
+                result = cache.get(key)
+                if result is not None:
+                    render_result(result, ground_truth)
+                elif method in STREAMING_METHODS:
+                    result = solve_streaming(method, problem, ground_truth)
                 else:
-                    url = f"{API_URL}/reasoning/{method}/{encoded_problem}"
-                
-                try:
-                    # Try GET request
-                    response = requests.get(url)
-                    
-                    # If GET fails, fall back to POST
-                    if response.status_code >= 400:
-                        # Prepare POST data
-                        post_url = f"{API_URL}/reasoning/{method}"
-                        post_data = {
-                            "statement": problem,
-                            "ground_truth": ground_truth if ground_truth else None
-                        }
-                        
-                        # Make POST request
-                        response = requests.post(post_url, json=post_data)
-                except Exception as e:
-                    st.error(f"GET request failed: {str(e)}, trying POST...")
-                    
-                    # Prepare POST data
-                    post_url = f"{API_URL}/reasoning/{method}"
-                    post_data = {
-                        "statement": problem,
-                        "ground_truth": ground_truth if ground_truth else None
-                    }
-                    
-                    # Make POST request
-                    response = requests.post(post_url, json=post_data)
-                
-                # Check if the request was successful
-                if response.status_code == 200:
-                    result = response.json()
-                    
-                    # Display results
-                    st.success("Problem solved!")
-                    
-                    # Problem and answer
-                    st.markdown("### Problem")
-                    st.write(result['problem'])
-                    
-                    st.markdown("### AI's Answer")
-                    st.write(result['answer'])
-                    
-                    # Only show ground truth comparison if we have one
-                    if ground_truth:
-                        st.markdown("### Ground Truth")
-                        st.write(ground_truth)
-                        
-                        if result.get('correct') is not None:
-                            if result['correct']:
-                                st.success("✓ AI's answer matches ground truth")
-                            else:
-                                st.error("✗ AI's answer does not match ground truth")
-                    
-                    # Show the explanation
-                    st.markdown("### Explanation")
-                    # Use a container with scrolling for long explanations
-                    with st.container():
-                        st.markdown(f"<div style='height: 300px; overflow-y: scroll;'>{result['explanation']}</div>", unsafe_allow_html=True)
-                else:
-                    error_msg = response.json().get("detail") if response.headers.get("content-type") == "application/json" else response.text
-                    st.error(f"Error {response.status_code}: {error_msg}")
+                    result = solve(method, problem, ground_truth)
+                if result is not None:
+                    cache.set(key, result)
         
+        except requests.Timeout:
+            st.error(f"The backend did not answer within {API_TIMEOUT:.0f} seconds. Try again or raise API_TIMEOUT.")
+        except requests.ConnectionError:
+            st.error(f"Could not connect to the backend at {API_URL}.")
         except Exception as e:
             st.error(f"Error: {str(e)}")
     else:
@@ -157,6 +328,8 @@ st.sidebar.markdown("""
 **CoT Verification**: Step-by-step reasoning followed by self-verification to catch errors.
 
 **Program-Aided**: Uses code generation and execution to solve the problem programmatically.
+
+**Auto**: Tries the cheapest suitable method first and escalates only on a failed, low-confidence or disputed answer.
 """)
 
 # Footer